@@ -29,6 +29,71 @@ ALLOWED_HOSTS = []
 
 EMAIL_TO_FIND_URL = 'https://api.hunter.io/v2/email-verifier?email={}&api_key=193c6f011b6a0a5ff458748b4ff2913ab536049c'
 
+# Email verification used on sign up, see starnavi_blog_api.email_verification
+# FAIL_OPEN accepts emails while upstream is unavailable, ASYNC creates users
+# right away and deactivates them if background verification finds the email
+# invalid. While upstream is unavailable they stay active and are verified
+# again RETRIES times, RETRY_DELAY seconds later and doubling
+
+EMAIL_VERIFICATION = {
+    'BACKEND': 'starnavi_blog_api.email_verification.HunterEmailVerifier',
+    'CONNECT_TIMEOUT': 2,
+    'READ_TIMEOUT': 5,
+    'POOL_SIZE': 10,
+    'CACHE_TIMEOUT': 24 * 60 * 60,
+    'FAILURE_THRESHOLD': 5,
+    'RECOVERY_TIMEOUT': 30,
+    'FAIL_OPEN': False,
+    'ASYNC': False,
+    'RETRIES': 5,
+    'RETRY_DELAY': 30,
+}
+
+# Maximum number of like/unlike operations accepted by one bulk request
+
+LIKES_BULK_MAX_OPERATIONS = 500
+
+# Number of rows each day of like analytics rollup is split into
+
+LIKES_ROLLUP_SHARDS = 8
+
+LIKES_ANALYTICS_MAX_DAYS = 3660
+
+# Write-behind likes: likes are acknowledged once recorded in like_intents
+# and applied in batches by flush_like_intents, see starnavi_blog_api.write_behind.
+# Projected counts live in CACHE_ALIAS, which has to be shared by all workers.
+
+LIKES_WRITE_BEHIND = {
+    'ENABLED': False,
+    'CACHE_ALIAS': 'default',
+    'BATCH_SIZE': 5000,
+    'INTERVAL': 1,
+}
+
+# Bulk post creation: maximum posts per request and rows per INSERT
+
+POSTS_BULK_CREATE_MAX_ITEMS = 1000
+
+POSTS_BULK_CREATE_BATCH_SIZE = 200
+
+# Trending posts: a like loses half of its weight every TRENDING_HALF_LIFE
+# seconds. Top TRENDING_CACHE_SIZE posts are kept in memory of each worker
+# for TRENDING_CACHE_TIMEOUT seconds.
+
+TRENDING_HALF_LIFE = 6 * 60 * 60
+
+TRENDING_CACHE_SIZE = 100
+
+TRENDING_CACHE_TIMEOUT = 10
+
+# Authors with at least TIMELINE_PULL_THRESHOLD followers are merged into
+# timelines on read instead of fanned out on write. New followers get up to
+# TIMELINE_BACKFILL_SIZE latest posts of a push-mode author.
+
+TIMELINE_PULL_THRESHOLD = 10000
+
+TIMELINE_BACKFILL_SIZE = 100
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -44,11 +109,16 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'starnavi_blog_api.authentication.CachedJWTAuthentication',
     ),
+    'DEFAULT_PAGINATION_CLASS': 'starnavi_blog_api.pagination.KeysetPagination',
+    'PAGE_SIZE': 20,
 }
 
 MIDDLEWARE = [
+    'starnavi_blog_api.metrics.RequestMetricsMiddleware',
+    'starnavi_blog_api.profiling.QueryInspectorMiddleware',
+    'starnavi_blog_api.routers.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -56,8 +126,50 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'starnavi_blog_api.activity.UserActivityMiddleware',
 ]
 
+# Latency, DB, serializer and external HTTP time of every request are
+# aggregated per view and served at /metrics to scrapers sending TOKEN as a
+# bearer token, or to staff users without a TOKEN, see starnavi_blog_api.metrics
+
+REQUEST_METRICS = {
+    'ENABLED': True,
+    'SERVER_TIMING': DEBUG,
+    'TOKEN': os.environ.get('METRICS_TOKEN'),
+}
+
+# Requests issuing REPEAT_THRESHOLD queries of the same shape (N+1), more
+# than MAX_QUERIES queries or slow queries are logged, STRICT raises instead,
+# see starnavi_blog_api.profiling
+
+QUERY_INSPECTOR = {
+    'ENABLED': DEBUG,
+    'STRICT': False,
+    'MAX_QUERIES': None,
+    'REPEAT_THRESHOLD': 5,
+    'SLOW_QUERY_MS': 100,
+}
+
+# Users resolved from JWT are cached per worker for TIMEOUT seconds,
+# see starnavi_blog_api.authentication
+
+AUTH_USER_CACHE = {
+    'MAX_SIZE': 1024,
+    'TIMEOUT': 30,
+}
+
+# Last login and last request times are buffered per worker and written
+# in batches every FLUSH_INTERVAL seconds, see starnavi_blog_api.activity
+# A killed worker loses at most FLUSH_INTERVAL seconds of activity
+
+USER_ACTIVITY = {
+    'FLUSH_INTERVAL': 60,
+    'MAX_PENDING': 10000,
+    'BATCH_SIZE': 500,
+    'BACKGROUND_FLUSH': True,
+}
+
 ROOT_URLCONF = 'starnavi.urls'
 
 TEMPLATES = [
@@ -78,6 +190,8 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'starnavi.wsgi.application'
 
+ASGI_APPLICATION = 'starnavi.asgi.application'
+
 
 # Database
 # https://docs.djangoproject.com/en/2.1/ref/settings/#databases
@@ -93,6 +207,42 @@ DATABASES = {
     }
 }
 
+DATABASE_ROUTERS = ['starnavi_blog_api.routers.ReplicaRouter']
+
+# Reads of GET requests go to replicas listed in WEIGHTS as {alias: weight},
+# each replica needs its own DATABASES entry. Users stay on primary for
+# STICKY_TIMEOUT seconds after a write, see starnavi_blog_api.routers
+
+READ_REPLICAS = {
+    'WEIGHTS': {},
+    'STICKY_TIMEOUT': 5,
+    'CACHE_ALIAS': 'default',
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/2.1/topics/cache/
+# Feed versions, likes patches, rebuild locks and sticky writers are shared
+# between workers, so the default cache has to be shared as well
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_URL', 'redis://localhost:6379/0'),
+    }
+}
+
+# Post feed page cache, see starnavi_blog_api.cache
+# Stale pages are served for STALE_TIMEOUT more seconds while one request rebuilds them
+
+POSTS_FEED_CACHE = {
+    'ALIAS': 'default',
+    'ENABLED': True,
+    'TIMEOUT': 30,
+    'STALE_TIMEOUT': 30,
+    'LOCK_TIMEOUT': 5,
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
@@ -0,0 +1,37 @@
+"""
+Settings for running tests without PostgreSQL:
+
+    python manage.py test --settings=starnavi.test_settings
+
+Two SQLite databases stand in for the primary and a read replica. Routing
+to the replica is off unless a test turns it on with READ_REPLICAS.
+Tests run in a single process with a process memory cache. Activity is
+not flushed in the background, the test database is gone by the time the
+process exits.
+
+Every request of the test client is held to the query budget in strict
+mode, so an endpoint test fails on N+1 queries or a budget overrun.
+"""
+from starnavi.settings import *  # noqa: F401,F403
+from starnavi.settings import BASE_DIR, QUERY_INSPECTOR, USER_ACTIVITY, os
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'replica.sqlite3'),
+    },
+}
+
+USER_ACTIVITY = {**USER_ACTIVITY, 'BACKGROUND_FLUSH': False}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+QUERY_INSPECTOR = {**QUERY_INSPECTOR, 'ENABLED': True, 'STRICT': True, 'MAX_QUERIES': 20}
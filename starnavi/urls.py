@@ -15,16 +15,15 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-    TokenRefreshView
-)
-from starnavi_blog_api.views import UserCreateAPIView
+from rest_framework_simplejwt.views import TokenRefreshView
+from starnavi_blog_api.metrics import metrics_view
+from starnavi_blog_api.views import SignInAPIView, UserCreateAPIView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/v1/', include('starnavi_blog_api.urls')),
-    path('sign-in/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('sign-in/', SignInAPIView.as_view(), name='token_obtain_pair'),
     path('sign-up/', UserCreateAPIView.as_view(), name='sign-up'),
-    path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh')
+    path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('metrics', metrics_view, name='metrics')
 ]
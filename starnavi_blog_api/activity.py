@@ -0,0 +1,221 @@
+import atexit
+import logging
+import threading
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import DatabaseError, connections, router
+from django.utils import timezone
+from starnavi_blog_api.bulk import chunked
+from starnavi_blog_api.models import UserActivity
+from starnavi_blog_api.routers import aget_request_user
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'FLUSH_INTERVAL': 60,
+    'MAX_PENDING': 10000,
+    'BATCH_SIZE': 500,
+    'BACKGROUND_FLUSH': True,
+}
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, 'USER_ACTIVITY', {})}
+
+
+class ActivityBuffer:
+    """
+    Collects last login and last request times per user in memory and
+    writes them with batched upserts every ``FLUSH_INTERVAL`` seconds.
+
+    Repeated activity of a user is coalesced into one pending entry. Upserts
+    only ever move timestamps forward, so workers may flush in any order.
+
+    With ``BACKGROUND_FLUSH`` a daemon thread, started by the first recorded
+    activity of the process, flushes every ``FLUSH_INTERVAL`` seconds even
+    when the worker is idle, and pending entries are flushed when the
+    process exits. A killed worker loses at most the last ``FLUSH_INTERVAL``
+    seconds of its activity. Without it entries are only flushed by the
+    first request after the interval.
+    """
+
+    def __init__(self):
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.last_flush = time.monotonic()
+        self.thread = None
+        self.stopping = None
+        self.exit_hook = False
+
+    def record(self, user_id, last_login=None, last_request=None):
+        if self.add(user_id, last_login, last_request):
+            self.flush()
+
+    def add(self, user_id, last_login=None, last_request=None):
+        """
+        Records activity without flushing, returns whether a flush is due
+        """
+        options = get_options()
+        if options['BACKGROUND_FLUSH']:
+            self.start()
+        with self.lock:
+            self._merge(user_id, last_login, last_request)
+            return (
+                len(self.pending) >= options['MAX_PENDING'] or
+                time.monotonic() - self.last_flush >= options['FLUSH_INTERVAL']
+            )
+
+    def start(self):
+        """
+        Starts background flushing unless it runs, including after a fork
+        """
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.stopping = threading.Event()
+            self.thread = threading.Thread(
+                target=self._flush_periodically,
+                args=(self.stopping,),
+                name='user-activity-flush',
+                daemon=True
+            )
+            self.thread.start()
+            if not self.exit_hook:
+                atexit.register(self._flush_at_exit)
+                self.exit_hook = True
+
+    def stop(self):
+        with self.lock:
+            thread, self.thread = self.thread, None
+        if thread is not None:
+            self.stopping.set()
+            thread.join()
+
+    def _flush_periodically(self, stopping):
+        while True:
+            delay = self.last_flush + get_options()['FLUSH_INTERVAL'] - time.monotonic()
+            if delay > 0:
+                if stopping.wait(delay):
+                    return
+                continue
+            try:
+                self.flush()
+            finally:
+                connections.close_all()
+
+    def _flush_at_exit(self):
+        # Only processes flushing in the background, a stopped buffer may outlive its database.
+        if self.thread is not None and self.thread.is_alive():
+            self.flush()
+
+    def get_pending(self, user_id):
+        with self.lock:
+            return tuple(self.pending.get(user_id, (None, None)))
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.last_flush = time.monotonic()
+        if not pending:
+            return
+        try:
+            write_activity(pending)
+        except DatabaseError:
+            logger.exception('Failed to flush activity of %s users', len(pending))
+            with self.lock:
+                for user_id, (last_login, last_request) in pending.items():
+                    self._merge(user_id, last_login, last_request)
+
+    def _merge(self, user_id, last_login, last_request):
+        current_login, current_request = self.pending.get(user_id, (None, None))
+        self.pending[user_id] = (_latest(current_login, last_login), _latest(current_request, last_request))
+
+
+def _latest(first, second):
+    if first is None or second is None:
+        return first or second
+    return max(first, second)
+
+
+def write_activity(entries):
+    """
+    Upserts ``{user_id: (last_login, last_request)}`` without moving any
+    stored timestamp back
+    """
+    using = router.db_for_write(UserActivity)
+    connection = connections[using]
+    existing_user_ids = set(
+        User.objects.using(using).filter(pk__in=list(entries)).values_list('pk', flat=True)
+    )
+    rows = [
+        (user_id, last_login, last_request)
+        for user_id, (last_login, last_request) in entries.items()
+        if user_id in existing_user_ids
+    ]
+    table = connection.ops.quote_name(UserActivity._meta.db_table)
+    greatest = 'GREATEST' if connection.vendor == 'postgresql' else 'MAX'
+    adapt = connection.ops.adapt_datetimefield_value
+    with connection.cursor() as cursor:
+        for batch in chunked(rows, get_options()['BATCH_SIZE']):
+            values = ', '.join(['(%s, %s, %s)'] * len(batch))
+            cursor.execute(
+                f'''
+                INSERT INTO {table} (user_id, last_login, last_request)
+                VALUES {values}
+                ON CONFLICT (user_id) DO UPDATE SET
+                    last_login = {greatest}(
+                        COALESCE({table}.last_login, EXCLUDED.last_login),
+                        COALESCE(EXCLUDED.last_login, {table}.last_login)
+                    ),
+                    last_request = {greatest}(
+                        COALESCE({table}.last_request, EXCLUDED.last_request),
+                        COALESCE(EXCLUDED.last_request, {table}.last_request)
+                    )
+                ''',
+                [
+                    param for user_id, last_login, last_request in batch
+                    for param in (user_id, adapt(last_login), adapt(last_request))
+                ]
+            )
+
+
+def get_activity(user_id):
+    """
+    Returns ``(last_login, last_request)`` of user including pending activity
+    """
+    stored = UserActivity.objects.filter(user_id=user_id).values_list('last_login', 'last_request').first()
+    stored = stored or (None, None)
+    pending = buffer.get_pending(user_id)
+    return tuple(_latest(stored_time, pending_time) for stored_time, pending_time in zip(stored, pending))
+
+
+class UserActivityMiddleware:
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            buffer.record(user.pk, last_request=timezone.now())
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        user = await aget_request_user(request)
+        if user is not None and buffer.add(user.pk, last_request=timezone.now()):
+            await sync_to_async(buffer.flush)()
+        return response
+
+
+buffer = ActivityBuffer()
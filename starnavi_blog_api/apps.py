@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class StarnaviBlogApiConfig(AppConfig):
     name = 'starnavi_blog_api'
+
+    def ready(self):
+        from starnavi_blog_api import signals  # noqa: F401
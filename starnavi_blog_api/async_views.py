@@ -0,0 +1,140 @@
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import AuthenticationFailed, MethodNotAllowed, NotAuthenticated, NotFound
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import status
+from starnavi_blog_api import cache as feed_cache
+from starnavi_blog_api import routers
+from starnavi_blog_api.authentication import CachedJWTAuthentication
+from starnavi_blog_api.models import Post
+from starnavi_blog_api.pagination import KeysetPagination
+from starnavi_blog_api.renderers import FastJSONRenderer
+from starnavi_blog_api.views import toggle_like
+import starnavi_blog_api.serializers as post_serializers
+
+
+class AsyncAPIView(View):
+    """
+    Async counterpart of DRF ``APIView`` for endpoints served over ASGI.
+
+    DRF views are sync, under ASGI each of them holds a thread for the whole
+    request. Handlers of these views are coroutines taking a DRF ``Request``
+    and returning a DRF ``Response``. Requests are authenticated with
+    ``CachedJWTAuthentication`` and must have a user, responses are rendered
+    as JSON and errors go through DRF exception handler, so that responses
+    match the sync views.
+    """
+
+    # Django's OPTIONS handler is sync, and these views have no schema to describe.
+    http_method_names = ['get', 'post', 'put', 'patch', 'delete', 'head']
+    authenticator = CachedJWTAuthentication()
+    renderer = FastJSONRenderer()
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = Request(
+            request,
+            parsers=[parser() for parser in api_settings.DEFAULT_PARSER_CLASSES],
+            authenticators=()
+        )
+        self.request = request
+        try:
+            user_auth = await self.authenticator.aauthenticate(request._request)
+            if user_auth is None:
+                raise NotAuthenticated()
+            request.user, request.auth = user_auth
+            if request.method.lower() not in self.http_method_names:
+                raise MethodNotAllowed(request.method)
+            handler = getattr(self, request.method.lower(), None)
+            if handler is None:
+                raise MethodNotAllowed(request.method)
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        return self.finalize_response(request, response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+            exc.auth_header = self.authenticator.authenticate_header(self.request)
+        context = {'view': self, 'args': self.args, 'kwargs': self.kwargs, 'request': self.request}
+        response = api_settings.EXCEPTION_HANDLER(exc, context)
+        if response is None:
+            raise exc
+        return response
+
+    def finalize_response(self, request, response):
+        # Rendered here, a deferred render would cost another thread switch in the handler.
+        content = self.renderer.render(
+            response.data,
+            self.renderer.media_type,
+            {'view': self, 'request': request, 'response': response}
+        )
+        rendered = HttpResponse(content, status=response.status_code, headers=response.headers)
+        rendered['Content-Type'] = self.renderer.media_type
+        rendered['Allow'] = ', '.join(self._allowed_methods())
+        patch_vary_headers(rendered, ('Accept',))
+        return rendered
+
+
+class AsyncPostListAPIView(AsyncAPIView):
+    """
+    Async post feed, same pages, caching and conditional requests as
+    ``PostListCreateAPIView.list``
+    """
+
+    queryset = Post.objects.all()
+    pagination_class = KeysetPagination
+
+    async def get(self, request, format=None):
+        url = request.build_absolute_uri()
+        stamp = await feed_cache.aget_feed_stamp()
+        headers = feed_cache.feed_headers(stamp, url)
+        if routers.is_pinned():
+            return Response(await self.list(request), headers=headers)
+        if get_conditional_response(
+            request,
+            etag=headers['ETag'],
+            last_modified=feed_cache.feed_last_modified(stamp)
+        ):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        page = await feed_cache.aget_feed_page(url, lambda: self.list(request))
+        return Response(page, headers=headers)
+
+    async def list(self, request):
+        paginator = self.pagination_class()
+        queryset = self.queryset.values(*post_serializers.PostValuesSerializer.values_fields)
+        page = await paginator.apaginate_queryset(queryset, request, view=self)
+        return paginator.get_paginated_response(post_serializers.PostValuesSerializer(page).data).data
+
+
+class AsyncPostLikesAPIView(AsyncAPIView):
+    """
+    Async like toggle, same as ``PostLikesAPIView``.
+
+    Toggling is one transaction, or one statement on PostgreSQL, and Django
+    has no async transactions or cursors, so it runs in a single thread
+    switch.
+    """
+
+    async def post(self, request, format=None):
+        toggle_serializer = post_serializers.PostLikeToggleSerializer(data=request.data)
+        if not toggle_serializer.is_valid():
+            return Response(data={'error': 'Bad request.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            post = await sync_to_async(toggle_like)(request.user, toggle_serializer.validated_data['post'])
+        except Post.DoesNotExist:
+            raise NotFound('Post does not exist')
+        data = post_serializers.PostModelSerializer(post).data
+        data['liked'] = post.liked
+        return Response(data, status=status.HTTP_201_CREATED)
@@ -0,0 +1,135 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from starnavi_blog_api import routers
+
+DEFAULTS = {
+    'MAX_SIZE': 1024,
+    'TIMEOUT': 30,
+}
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, 'AUTH_USER_CACHE', {})}
+
+
+class UserCache:
+    """
+    Size bounded LRU of users with a time to live, local to the process.
+
+    Entries are evicted when the user is saved or deleted, other processes
+    pick the change up when their entry expires.
+    """
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, user_id):
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None:
+                return None
+            user, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self.entries[user_id]
+                return None
+            self.entries.move_to_end(user_id)
+            return user
+
+    def set(self, user_id, user):
+        options = get_options()
+        if options['TIMEOUT'] <= 0 or options['MAX_SIZE'] <= 0:
+            return
+        with self.lock:
+            self.entries[user_id] = (user, time.monotonic() + options['TIMEOUT'])
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > options['MAX_SIZE']:
+                self.entries.popitem(last=False)
+
+    def evict(self, user_id):
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+user_cache = UserCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication which resolves users from the token user id through
+    ``user_cache``, so authenticated requests skip the ``auth_user`` query.
+    """
+
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is not None:
+            routers.note_user(result[0].pk)
+        return result
+
+    async def aauthenticate(self, request):
+        """
+        Async counterpart of ``authenticate`` for views served over ASGI
+        """
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        user = await self.aget_user(validated_token)
+        await routers.anote_user(user.pk)
+        return user, validated_token
+
+    def get_user(self, validated_token):
+        user_id, user = self.get_cached_user(validated_token)
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(user_id, user)
+        # Views get their own copy, so nothing they set on the user leaks into the cache.
+        return copy.copy(user)
+
+    async def aget_user(self, validated_token):
+        user_id, user = self.get_cached_user(validated_token)
+        if user is None:
+            # Misses are rare, they reuse the lookup and checks of simplejwt.
+            user = await sync_to_async(super().get_user)(validated_token)
+            user_cache.set(user_id, user)
+        return copy.copy(user)
+
+    def get_cached_user(self, validated_token):
+        """
+        Returns ``(user_id, user)`` of the token, user is None on a cache miss
+        """
+        try:
+            user_id = str(validated_token[api_settings.USER_ID_CLAIM])
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        user = user_cache.get(user_id)
+        if user is not None and api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        return user_id, user
+
+
+@receiver(setting_changed)
+def reset_user_cache(setting, **kwargs):
+    if setting in ('AUTH_USER_CACHE', 'SIMPLE_JWT'):
+        user_cache.clear()
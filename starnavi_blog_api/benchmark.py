@@ -0,0 +1,307 @@
+import json
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from django.contrib.auth.models import User
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from starnavi_blog_api import seeding
+from starnavi_blog_api.models import Post
+
+USERNAME_PREFIX = 'benchmark_user_'
+
+PASSWORD = 'benchmark-password'
+
+_query_counts = ContextVar('benchmark_query_counts', default=None)
+
+SCENARIOS = ('sign_in', 'post_list', 'post_create', 'like_toggle', 'post_list_async', 'like_toggle_async')
+
+# Async scenarios and the sync scenarios they are compared with.
+ASYNC_SCENARIOS = {
+    'post_list_async': 'post_list',
+    'like_toggle_async': 'like_toggle',
+}
+
+# Metrics compared against a baseline and whether a higher value is worse.
+COMPARED_METRICS = {
+    'p50_ms': True,
+    'p95_ms': True,
+    'p99_ms': True,
+    'rps': False,
+    'queries_per_request': True,
+}
+
+
+def seed(users=50, posts=500, likes=2000, random_seed=0, batch_size=10000):
+    """
+    Adds benchmark users, posts and likes and returns ids of new users
+    """
+    user_ids, _ = seeding.seed_blog(
+        users=users,
+        posts=posts,
+        likes=likes,
+        random_seed=random_seed,
+        batch_size=batch_size,
+        username_prefix=USERNAME_PREFIX,
+        password=PASSWORD
+    )
+    return user_ids
+
+
+def percentile(values, percent):
+    """
+    Nearest-rank percentile of ``values``
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def count_query(execute, sql, params, many, context):
+    queries = _query_counts.get()
+    if queries is not None:
+        queries[0] += 1
+    return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_counter(connection, **kwargs):
+    """
+    Wraps ``connection`` for the request counted in context, so queries
+    async views run in worker threads are counted too
+    """
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+class InProcessTransport:
+    """
+    Sends requests through Django test client, counting queries per request
+    """
+
+    def __init__(self):
+        self.client = APIClient()
+
+    def request(self, method, path, data=None, token=None):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if token else {}
+        # Connections opened before this module was imported missed the signal.
+        for opened in connections.all(initialized_only=True):
+            install_query_counter(opened)
+        queries = [0]
+        counting = _query_counts.set(queries)
+        try:
+            response = getattr(self.client, method)(path, data=data, format='json', **headers)
+        finally:
+            _query_counts.reset(counting)
+        return response.status_code, queries[0]
+
+    def close(self):
+        pass
+
+
+class HttpTransport:
+    """
+    Sends requests to a running server, query counts are not available
+    """
+
+    def __init__(self, base_url):
+        import requests
+
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+
+    def request(self, method, path, data=None, token=None):
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        response = self.session.request(method.upper(), f'{self.base_url}{path}', json=data, headers=headers)
+        return response.status_code, None
+
+    def close(self):
+        self.session.close()
+
+
+class Scenario:
+    """
+    Builds requests of one benchmarked endpoint
+    """
+
+    def __init__(self, name, usernames, post_ids, random_seed=0):
+        self.name = name
+        self.usernames = usernames
+        self.user_ids = list(usernames)
+        self.post_ids = post_ids
+        self.random_seed = random_seed
+        self.tokens = {}
+        self.lock = threading.Lock()
+
+    def get_token(self, user_id):
+        with self.lock:
+            if user_id not in self.tokens:
+                self.tokens[user_id] = str(RefreshToken.for_user(User(pk=user_id)).access_token)
+            return self.tokens[user_id]
+
+    def build_request(self, rng, number):
+        user_id = rng.choice(self.user_ids)
+        if self.name == 'sign_in':
+            return 'post', '/sign-in/', {'username': self.usernames[user_id], 'password': PASSWORD}, None
+        token = self.get_token(user_id)
+        if self.name == 'post_list':
+            return 'get', '/api/v1/posts/', None, token
+        if self.name == 'post_create':
+            return 'post', '/api/v1/posts/', {'title': f'Benchmark title {number}', 'content': 'Benchmark'}, token
+        if self.name == 'like_toggle':
+            return 'post', '/api/v1/posts/like/', {'post': rng.choice(self.post_ids)}, token
+        if self.name == 'post_list_async':
+            return 'get', '/api/v1/async/posts/', None, token
+        if self.name == 'like_toggle_async':
+            return 'post', '/api/v1/async/posts/like/', {'post': rng.choice(self.post_ids)}, token
+        raise ValueError(f'Unknown scenario: {self.name}')
+
+
+def run_scenario(scenario, make_transport, clients=4, requests=200, warmup=10):
+    """
+    Runs ``requests`` requests of ``scenario`` from ``clients`` concurrent
+    clients and returns latency, throughput and query count summary.
+
+    Every client sends ``warmup`` unmeasured requests first, the clock
+    starts once all of them are done.
+    """
+    prepared = []
+    for client_number in range(clients):
+        rng = random.Random(scenario.random_seed * 1000 + client_number)
+        count = warmup + requests // clients + (client_number < requests % clients)
+        prepared.append([scenario.build_request(rng, f'{client_number}-{number}') for number in range(count)])
+    latencies = []
+    query_counts = []
+    errors = [0]
+    lock = threading.Lock()
+    started = [None]
+    barrier = threading.Barrier(clients, action=lambda: started.__setitem__(0, time.perf_counter()))
+
+    def run_client(client_requests):
+        transport = make_transport()
+        try:
+            for method, path, data, token in client_requests[:warmup]:
+                transport.request(method, path, data, token)
+            barrier.wait()
+            for method, path, data, token in client_requests[warmup:]:
+                request_started = time.perf_counter()
+                status_code, queries = transport.request(method, path, data, token)
+                elapsed = time.perf_counter() - request_started
+                with lock:
+                    latencies.append(elapsed)
+                    if queries is not None:
+                        query_counts.append(queries)
+                    if status_code >= 400:
+                        errors[0] += 1
+        except Exception:
+            # Don't leave other clients waiting for this one at the barrier.
+            barrier.abort()
+            raise
+        finally:
+            transport.close()
+            if clients > 1:
+                connection.close()
+
+    if clients == 1:
+        run_client(prepared[0])
+    else:
+        with ThreadPoolExecutor(max_workers=clients) as executor:
+            for future in [executor.submit(run_client, client_requests) for client_requests in prepared]:
+                future.result()
+    duration = time.perf_counter() - started[0]
+
+    def to_ms(value):
+        return None if value is None else round(value * 1000, 3)
+
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'rps': round(len(latencies) / duration, 2) if duration else None,
+        'p50_ms': to_ms(percentile(latencies, 50)),
+        'p95_ms': to_ms(percentile(latencies, 95)),
+        'p99_ms': to_ms(percentile(latencies, 99)),
+        'queries_per_request': round(sum(query_counts) / len(query_counts), 2) if query_counts else None,
+    }
+
+
+def run(scenarios=SCENARIOS, base_url=None, clients=4, requests=200, warmup=10, random_seed=0):
+    """
+    Runs scenarios against benchmark users and existing posts
+    """
+    usernames = dict(
+        User.objects.filter(username__startswith=USERNAME_PREFIX).order_by('pk').values_list('pk', 'username')
+    )
+    post_ids = list(Post.objects.values_list('pk', flat=True))
+    if not usernames or not post_ids:
+        raise ValueError('Database has no benchmark users or posts, seed it first')
+    if base_url:
+        def make_transport():
+            return HttpTransport(base_url)
+    else:
+        make_transport = InProcessTransport
+    results = {}
+    for name in scenarios:
+        scenario = Scenario(name, usernames, post_ids, random_seed)
+        results[name] = run_scenario(scenario, make_transport, clients, requests, warmup)
+    return results
+
+
+def compare(results, baseline, tolerance=0.2):
+    """
+    Returns regressions of ``results`` against ``baseline`` as
+    ``[(scenario, metric, baseline_value, value)]``.
+
+    Latencies and throughput may move by ``tolerance`` before they count,
+    query counts are deterministic and may not grow at all.
+    """
+    regressions = []
+    for scenario, metrics in results.items():
+        for metric, higher_is_worse in COMPARED_METRICS.items():
+            base_value = baseline.get(scenario, {}).get(metric)
+            value = metrics.get(metric)
+            if base_value is None or value is None:
+                continue
+            allowed = 0 if metric == 'queries_per_request' else tolerance
+            if higher_is_worse:
+                regressed = value > base_value * (1 + allowed)
+            else:
+                regressed = value < base_value * (1 - allowed)
+            if regressed:
+                regressions.append((scenario, metric, base_value, value))
+    return regressions
+
+
+def compare_async(results):
+    """
+    Returns ``{async_scenario: {metric: ratio}}`` of async scenarios to the
+    sync scenarios they replace, for scenarios run both ways. Ratios above
+    one mean the async scenario has higher values.
+    """
+    ratios = {}
+    for async_name, sync_name in ASYNC_SCENARIOS.items():
+        if async_name not in results or sync_name not in results:
+            continue
+        ratios[async_name] = {}
+        for metric in COMPARED_METRICS:
+            async_value, sync_value = results[async_name].get(metric), results[sync_name].get(metric)
+            if async_value is not None and sync_value:
+                ratios[async_name][metric] = round(async_value / sync_value, 2)
+    return ratios
+
+
+def load_results(path):
+    with open(path, encoding='utf-8') as results_file:
+        return json.load(results_file)['results']
+
+
+def save_results(path, results, meta):
+    with open(path, 'w', encoding='utf-8') as results_file:
+        json.dump({'meta': meta, 'results': results}, results_file, indent=2, sort_keys=True)
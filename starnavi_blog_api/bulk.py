@@ -0,0 +1,78 @@
+import io
+from itertools import islice
+from django.db import connections, router
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def insert_objects(model, objs, using=None):
+    """
+    Inserts model instances with a single ``COPY`` on PostgreSQL and
+    ``bulk_create`` elsewhere. Primary keys are not set on instances
+    written with ``COPY``.
+    """
+    using = using or router.db_for_write(model)
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return model.objects.using(using).bulk_create(objs)
+
+    fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+    insert_rows(
+        model,
+        [field.column for field in fields],
+        (
+            [field.get_db_prep_save(field.pre_save(obj, add=True), connection) for field in fields]
+            for obj in objs
+        ),
+        using
+    )
+    return objs
+
+
+def insert_rows(model, columns, rows, using=None):
+    """
+    Inserts ``rows`` of ready database values into ``columns`` of
+    ``model`` table, skipping model instances altogether. Uses a single
+    ``COPY`` on PostgreSQL and ``executemany`` elsewhere.
+    """
+    using = using or router.db_for_write(model)
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+    table = quote_name(model._meta.db_table)
+    column_list = ', '.join(quote_name(column) for column in columns)
+    if connection.vendor != 'postgresql':
+        sql = f'INSERT INTO {table} ({column_list}) VALUES ({", ".join(["%s"] * len(columns))})'
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+        return
+
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(','.join(_copy_value(value) for value in row))
+        buffer.write('\n')
+    buffer.seek(0)
+
+    sql = f'COPY {table} ({column_list}) FROM STDIN WITH (FORMAT csv)'
+    with connection.cursor() as cursor:
+        raw_cursor = cursor.cursor
+        if hasattr(raw_cursor, 'copy_expert'):
+            raw_cursor.copy_expert(sql, buffer)
+        else:
+            with raw_cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+
+
+def _copy_value(value):
+    # In COPY csv format an unquoted empty value is NULL, anything quoted is data.
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return '"{}"'.format(str(value).replace('"', '""'))
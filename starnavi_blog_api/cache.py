@@ -0,0 +1,301 @@
+import asyncio
+import hashlib
+import math
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.http import http_date
+
+DEFAULTS = {
+    'ALIAS': 'default',
+    'ENABLED': True,
+    'TIMEOUT': 30,
+    'STALE_TIMEOUT': 30,
+    'LOCK_TIMEOUT': 5,
+}
+
+FEED_VERSION_KEY = 'posts:feed:version'
+
+FEED_STAMP_KEY = 'posts:feed:stamp'
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, 'POSTS_FEED_CACHE', {})}
+
+
+def get_cache():
+    return caches[get_options()['ALIAS']]
+
+
+class LocalAsyncCache:
+    """
+    Async API of a process memory cache. Django runs async cache calls in a
+    thread, which only costs time when the cache never blocks.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    async def aget(self, key, default=None):
+        return self.cache.get(key, default)
+
+    async def aget_many(self, keys):
+        return self.cache.get_many(keys)
+
+    async def aadd(self, key, value, timeout):
+        return self.cache.add(key, value, timeout)
+
+    async def aset(self, key, value, timeout):
+        self.cache.set(key, value, timeout)
+
+    async def adelete(self, key):
+        return self.cache.delete(key)
+
+
+def get_async_cache():
+    cache = get_cache()
+    return LocalAsyncCache(cache) if isinstance(cache, LocMemCache) else cache
+
+
+def get_feed_version():
+    cache = get_cache()
+    version = cache.get(FEED_VERSION_KEY)
+    if version is None:
+        cache.add(FEED_VERSION_KEY, 1, timeout=None)
+        version = cache.get(FEED_VERSION_KEY, 1)
+    return version
+
+
+async def aget_feed_version():
+    cache = get_async_cache()
+    version = await cache.aget(FEED_VERSION_KEY)
+    if version is None:
+        await cache.aadd(FEED_VERSION_KEY, 1, timeout=None)
+        version = await cache.aget(FEED_VERSION_KEY, 1)
+    return version
+
+
+def get_feed_stamp():
+    """
+    Returns time of the last post or like change as unix timestamp.
+
+    If the stamp was evicted it restarts from now, which costs clients one
+    full response instead of a scan over posts.
+    """
+    cache = get_cache()
+    stamp = cache.get(FEED_STAMP_KEY)
+    if stamp is None:
+        cache.add(FEED_STAMP_KEY, time.time(), timeout=None)
+        stamp = cache.get(FEED_STAMP_KEY, time.time())
+    return stamp
+
+
+async def aget_feed_stamp():
+    cache = get_async_cache()
+    stamp = await cache.aget(FEED_STAMP_KEY)
+    if stamp is None:
+        await cache.aadd(FEED_STAMP_KEY, time.time(), timeout=None)
+        stamp = await cache.aget(FEED_STAMP_KEY, time.time())
+    return stamp
+
+
+def touch_feed():
+    get_cache().set(FEED_STAMP_KEY, time.time(), timeout=None)
+
+
+def feed_etag(stamp, url):
+    url_hash = hashlib.md5(f'{stamp}:{url}'.encode()).hexdigest()
+    return f'"{url_hash}"'
+
+
+def feed_last_modified(stamp):
+    """
+    Returns whole-second modification time of feed changed at ``stamp``,
+    rounded up so that it never predates the change
+    """
+    return math.ceil(stamp)
+
+
+def feed_headers(stamp, url):
+    """
+    Returns validators of feed page ``url`` as of ``stamp``.
+
+    Last-Modified is only sent once the second it names is over. A change
+    later in the same second would leave it as is, and clients sending only
+    If-Modified-Since would get a 304 for the stale page.
+    """
+    headers = {'ETag': feed_etag(stamp, url)}
+    if time.time() >= feed_last_modified(stamp):
+        headers['Last-Modified'] = http_date(feed_last_modified(stamp))
+    return headers
+
+
+def invalidate_feed():
+    """
+    Drops every cached feed page by moving feed to a new version
+    """
+    touch_feed()
+    cache = get_cache()
+    try:
+        cache.incr(FEED_VERSION_KEY)
+    except ValueError:
+        cache.add(FEED_VERSION_KEY, 2, timeout=None)
+
+
+def feed_page_key(url, version=None):
+    url_hash = hashlib.md5(url.encode()).hexdigest()
+    return f'posts:feed:{version or get_feed_version()}:{url_hash}'
+
+
+def likes_key(post_id, version):
+    return f'posts:likes:{version}:{post_id}'
+
+
+def set_likes_count(counts):
+    """
+    Patches likes of posts in already cached pages, ``counts`` is
+    ``{post_id: (likes_count, updated)}`` with ``updated`` of the post row
+    the count comes from.
+
+    Patches are written after commit, so a count can arrive after a newer
+    one. It is dropped then, a patch never replaces one from a newer row.
+    """
+    if not counts:
+        return
+    touch_feed()
+    options = get_options()
+    if not options['ENABLED']:
+        return
+    cache = get_cache()
+    # Under the feed version, so invalidating the feed drops patches along with pages.
+    version = get_feed_version()
+    counts = {likes_key(post_id, version): count for post_id, count in counts.items()}
+    current = cache.get_many(list(counts))
+    written_at = time.time()
+    patches = {
+        key: (likes_count, updated.timestamp(), written_at)
+        for key, (likes_count, updated) in counts.items()
+        if key not in current or current[key][1] <= updated.timestamp()
+    }
+    # Patches outlive every page cached before them, so a page never shows an older count.
+    timeout = options['TIMEOUT'] + options['STALE_TIMEOUT']
+    cache.set_many(patches, timeout)
+
+
+def get_feed_page(url, build_page):
+    """
+    Returns feed page for ``url`` from cache, building it with ``build_page``
+    on a miss.
+
+    Pages are kept ``STALE_TIMEOUT`` seconds after they go stale. Only the
+    request that takes the rebuild lock rebuilds a stale page, the others
+    keep serving the stale copy, so an expiring hot page doesn't send every
+    request to the database at once.
+    """
+    options = get_options()
+    if not options['ENABLED']:
+        return build_page()
+
+    cache = get_cache()
+    version = get_feed_version()
+    page_key = feed_page_key(url, version)
+    lock_key = f'{page_key}:lock'
+
+    entry = cache.get(page_key)
+    if entry is not None:
+        page, fresh_until, built_at = entry
+        if fresh_until > time.time() or not cache.add(lock_key, 1, options['LOCK_TIMEOUT']):
+            return patch_likes(page, version, built_at)
+    elif not cache.add(lock_key, 1, options['LOCK_TIMEOUT']):
+        entry = _wait_for_page(cache, page_key, options['LOCK_TIMEOUT'])
+        return patch_likes(entry[0], version, entry[2]) if entry is not None else build_page()
+
+    try:
+        built_at = time.time()
+        page = build_page()
+        cache.set(
+            page_key,
+            (page, built_at + options['TIMEOUT'], built_at),
+            options['TIMEOUT'] + options['STALE_TIMEOUT']
+        )
+    finally:
+        cache.delete(lock_key)
+    return page
+
+
+async def aget_feed_page(url, build_page):
+    """
+    Async counterpart of ``get_feed_page``, ``build_page`` is a coroutine function
+    """
+    options = get_options()
+    if not options['ENABLED']:
+        return await build_page()
+
+    cache = get_async_cache()
+    version = await aget_feed_version()
+    page_key = feed_page_key(url, version)
+    lock_key = f'{page_key}:lock'
+
+    entry = await cache.aget(page_key)
+    if entry is not None:
+        page, fresh_until, built_at = entry
+        if fresh_until > time.time() or not await cache.aadd(lock_key, 1, options['LOCK_TIMEOUT']):
+            return await apatch_likes(page, version, built_at)
+    elif not await cache.aadd(lock_key, 1, options['LOCK_TIMEOUT']):
+        entry = await _await_page(cache, page_key, options['LOCK_TIMEOUT'])
+        return await apatch_likes(entry[0], version, entry[2]) if entry is not None else await build_page()
+
+    try:
+        built_at = time.time()
+        page = await build_page()
+        await cache.aset(
+            page_key,
+            (page, built_at + options['TIMEOUT'], built_at),
+            options['TIMEOUT'] + options['STALE_TIMEOUT']
+        )
+    finally:
+        await cache.adelete(lock_key)
+    return page
+
+
+def patch_likes(page, version, built_at):
+    results = page['results'] if isinstance(page, dict) else page
+    keys = {likes_key(post['id'], version): post for post in results}
+    patches = get_cache().get_many(list(keys))
+    return _apply_patches(page, keys, patches, built_at)
+
+
+async def apatch_likes(page, version, built_at):
+    results = page['results'] if isinstance(page, dict) else page
+    keys = {likes_key(post['id'], version): post for post in results}
+    patches = await get_async_cache().aget_many(list(keys))
+    return _apply_patches(page, keys, patches, built_at)
+
+
+def _apply_patches(page, keys, patches, built_at):
+    for key, (likes_count, _, written_at) in patches.items():
+        # Counts patched before the page was built are in it already, or newer ones are.
+        if written_at >= built_at:
+            keys[key]['likes'] = likes_count
+    return page
+
+
+def _wait_for_page(cache, page_key, lock_timeout):
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(page_key)
+        if entry is not None:
+            return entry
+    return None
+
+
+async def _await_page(cache, page_key, lock_timeout):
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+        entry = await cache.aget(page_key)
+        if entry is not None:
+            return entry
+    return None
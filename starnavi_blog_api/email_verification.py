@@ -0,0 +1,232 @@
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+import requests
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db import close_old_connections
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+from starnavi_blog_api import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'BACKEND': 'starnavi_blog_api.email_verification.HunterEmailVerifier',
+    'CONNECT_TIMEOUT': 2,
+    'READ_TIMEOUT': 5,
+    'POOL_SIZE': 10,
+    'CACHE_ALIAS': 'default',
+    'CACHE_TIMEOUT': 24 * 60 * 60,
+    'FAILURE_THRESHOLD': 5,
+    'RECOVERY_TIMEOUT': 30,
+    'FAIL_OPEN': False,
+    'ASYNC': False,
+    'WORKERS': 2,
+    'RETRIES': 5,
+    'RETRY_DELAY': 30,
+}
+
+
+class EmailVerificationUnavailable(Exception):
+    """
+    Raised when upstream can't give a verdict and backend fails closed
+    """
+
+
+class CircuitBreaker:
+    """
+    Stops calling upstream after ``failure_threshold`` consecutive failures
+    and lets a single trial call through once ``recovery_timeout`` passed.
+    """
+
+    def __init__(self, failure_threshold, recovery_timeout):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def allow_request(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.recovery_timeout:
+                # Half-open: let this call through, keep others out until it reports back.
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class BaseEmailVerifier:
+
+    def __init__(self, options):
+        self.options = options
+        self.cache = caches[options['CACHE_ALIAS']]
+        self.circuit_breaker = CircuitBreaker(
+            options['FAILURE_THRESHOLD'],
+            options['RECOVERY_TIMEOUT']
+        )
+
+    def verify(self, email):
+        """
+        Returns whether email is valid, serving cached verdicts first
+        """
+        email = email.lower()
+        domain = email.rpartition('@')[2]
+        email_key = self.cache_key('email', hashlib.sha1(email.encode()).hexdigest())
+        domain_key = self.cache_key('domain', domain)
+        cached = self.cache.get_many([email_key, domain_key])
+        if cached.get(domain_key) is False:
+            return False
+        if email_key in cached:
+            return cached[email_key]
+
+        if not self.circuit_breaker.allow_request():
+            return self.unavailable(email)
+        try:
+            with metrics.timed('external_http'):
+                email_valid, domain_valid = self.fetch_verdict(email)
+        except (requests.RequestException, ValueError, KeyError):
+            logger.warning('Email verification failed for domain %s', domain, exc_info=True)
+            self.circuit_breaker.record_failure()
+            return self.unavailable(email)
+        self.circuit_breaker.record_success()
+
+        timeout = self.options['CACHE_TIMEOUT']
+        self.cache.set_many({email_key: email_valid, domain_key: domain_valid}, timeout)
+        return email_valid
+
+    def fetch_verdict(self, email):
+        """
+        Returns ``(email_valid, domain_valid)`` from upstream
+        """
+        raise NotImplementedError
+
+    def unavailable(self, email):
+        if self.options['FAIL_OPEN']:
+            return True
+        raise EmailVerificationUnavailable(email)
+
+    def cache_key(self, kind, value):
+        return f'email-verification:{kind}:{value}'
+
+
+class HunterEmailVerifier(BaseEmailVerifier):
+
+    def __init__(self, options):
+        super().__init__(options)
+        self.url = options.get('URL', settings.EMAIL_TO_FIND_URL)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=options['POOL_SIZE'],
+            pool_maxsize=options['POOL_SIZE'],
+            max_retries=0
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def fetch_verdict(self, email):
+        response = self.session.get(
+            self.url.format(quote(email, safe='@')),
+            timeout=(self.options['CONNECT_TIMEOUT'], self.options['READ_TIMEOUT'])
+        )
+        response.raise_for_status()
+        data = response.json()['data']
+        domain_valid = bool(data['webmail'])
+        return domain_valid and not data['gibberish'], domain_valid
+
+
+_verifier = None
+_verifier_lock = threading.Lock()
+_executor = None
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, 'EMAIL_VERIFICATION', {})}
+
+
+def get_email_verifier():
+    global _verifier
+    with _verifier_lock:
+        if _verifier is None:
+            options = get_options()
+            _verifier = import_string(options['BACKEND'])(options)
+        return _verifier
+
+
+def verify_user(user_id, attempt=0):
+    """
+    Deactivates user whose email turns out to be invalid.
+
+    Without a verdict the user stays active and verification is retried
+    ``RETRIES`` times, ``RETRY_DELAY`` seconds later and twice as late each
+    time. Retries wait in process memory, a restart drops them.
+    """
+    user = User.objects.filter(pk=user_id).first()
+    if user is None:
+        return
+    try:
+        email_valid = get_email_verifier().verify(user.email)
+    except EmailVerificationUnavailable:
+        options = get_options()
+        if attempt < options['RETRIES']:
+            verify_user_in_background(user_id, attempt + 1, options['RETRY_DELAY'] * 2 ** attempt)
+        else:
+            logger.warning('Email of user %s could not be verified, leaving the user active', user_id)
+        return
+    if not email_valid:
+        # Saved rather than updated, so cached authentication drops the user.
+        user.is_active = False
+        user.save(update_fields=['is_active'])
+
+
+def _verify_user_in_worker(user_id, attempt):
+    close_old_connections()
+    try:
+        verify_user(user_id, attempt)
+    except Exception:
+        logger.exception('Background email verification failed for user %s', user_id)
+    finally:
+        close_old_connections()
+
+
+def verify_user_in_background(user_id, attempt=0, delay=0):
+    global _executor
+    if delay:
+        timer = threading.Timer(delay, verify_user_in_background, (user_id, attempt))
+        timer.daemon = True
+        timer.start()
+        return
+    with _verifier_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=get_options()['WORKERS'],
+                thread_name_prefix='email-verification'
+            )
+    _executor.submit(_verify_user_in_worker, user_id, attempt)
+
+
+@receiver(setting_changed)
+def reset_email_verifier(setting, **kwargs):
+    global _verifier
+    if setting in ('EMAIL_VERIFICATION', 'EMAIL_TO_FIND_URL', 'CACHES'):
+        _verifier = None
@@ -0,0 +1,126 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_databases, teardown_databases
+from starnavi_blog_api import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks sign in, post list, post create and like toggle, and the '
+        'async post list and like toggle against their sync versions. By default '
+        'seeds a throwaway test database and drives the API in-process, with '
+        '--url it drives a running server instead. Concurrency gains of async '
+        'views only show against an ASGI server with many --clients.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50, help='Benchmark users to seed')
+        parser.add_argument('--posts', type=int, default=500, help='Posts to seed')
+        parser.add_argument('--likes', type=int, default=2000, help='Likes to seed')
+        parser.add_argument('--clients', type=int, default=4, help='Concurrent clients')
+        parser.add_argument('--requests', type=int, default=200, help='Measured requests per scenario')
+        parser.add_argument('--warmup', type=int, default=10, help='Unmeasured requests per client')
+        parser.add_argument('--random-seed', type=int, default=0, help='Seed of generated data and requests')
+        parser.add_argument(
+            '--scenario',
+            action='append',
+            choices=benchmark.SCENARIOS,
+            help='Scenario to run, may be repeated. All scenarios run by default'
+        )
+        parser.add_argument(
+            '--url',
+            help='Base URL of a running server using this project settings and database'
+        )
+        parser.add_argument(
+            '--seed',
+            action='store_true',
+            help='With --url, add benchmark data to the configured database first'
+        )
+        parser.add_argument('--keepdb', action='store_true', help='Keep the test database between runs')
+        parser.add_argument('--save-baseline', help='Write results to this JSON file')
+        parser.add_argument('--baseline', help='Compare results with this JSON file')
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.2,
+            help='Allowed relative latency and throughput change against baseline'
+        )
+
+    def handle(self, *args, **options):
+        if options['clients'] < 1 or options['requests'] < options['clients']:
+            raise CommandError('Need at least one client and one request per client')
+        if options['url']:
+            if options['seed']:
+                self.seed(options)
+            results = self.run(options)
+        else:
+            old_config = setup_databases(verbosity=0, interactive=False, keepdb=options['keepdb'])
+            try:
+                if connection.vendor == 'sqlite' and connection.is_in_memory_db() and options['clients'] > 1:
+                    # Threads would share one in-memory database and fail on table locks.
+                    self.stderr.write('In-memory SQLite test database, running with a single client')
+                    options['clients'] = 1
+                self.seed(options)
+                with override_settings(DEBUG=False, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                    results = self.run(options)
+            finally:
+                teardown_databases(old_config, verbosity=0, keepdb=options['keepdb'])
+
+        self.report(results)
+        self.report_async(results)
+        meta = {
+            key: options[key]
+            for key in ('users', 'posts', 'likes', 'clients', 'requests', 'warmup', 'random_seed', 'url')
+        }
+        if options['save_baseline']:
+            benchmark.save_results(options['save_baseline'], results, meta)
+            self.stdout.write(f'Saved results to {options["save_baseline"]}')
+        if options['baseline']:
+            self.check_baseline(results, options)
+
+    def seed(self, options):
+        benchmark.seed(
+            users=options['users'],
+            posts=options['posts'],
+            likes=options['likes'],
+            random_seed=options['random_seed']
+        )
+
+    def run(self, options):
+        try:
+            return benchmark.run(
+                scenarios=options['scenario'] or benchmark.SCENARIOS,
+                base_url=options['url'],
+                clients=options['clients'],
+                requests=options['requests'],
+                warmup=options['warmup'],
+                random_seed=options['random_seed']
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+    def report(self, results):
+        columns = ('requests', 'errors', 'rps', 'p50_ms', 'p95_ms', 'p99_ms', 'queries_per_request')
+        self.stdout.write(' '.join([f'{"scenario":<18}'] + [f'{column:>19}' for column in columns]))
+        for scenario, metrics in results.items():
+            values = ['-' if metrics[column] is None else str(metrics[column]) for column in columns]
+            self.stdout.write(' '.join([f'{scenario:<18}'] + [f'{value:>19}' for value in values]))
+
+    def report_async(self, results):
+        for scenario, ratios in benchmark.compare_async(results).items():
+            compared = ', '.join(f'{metric} x{ratio}' for metric, ratio in ratios.items())
+            self.stdout.write(f'{scenario} against {benchmark.ASYNC_SCENARIOS[scenario]}: {compared}')
+
+    def check_baseline(self, results, options):
+        regressions = benchmark.compare(
+            results,
+            benchmark.load_results(options['baseline']),
+            options['tolerance']
+        )
+        if regressions:
+            raise CommandError('Regressions against baseline:\n' + '\n'.join(
+                f'{scenario} {metric}: {base_value} -> {value}'
+                for scenario, metric, base_value, value in regressions
+            ))
+        self.stdout.write(f'No regressions against {options["baseline"]}')
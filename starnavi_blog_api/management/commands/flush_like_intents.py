@@ -0,0 +1,45 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from starnavi_blog_api import write_behind
+
+
+class Command(BaseCommand):
+    help = (
+        'Applies likes accepted in write-behind mode to likes table. Keep it '
+        'running with --loop while LIKES_WRITE_BEHIND is enabled and until '
+        'like_intents is empty after it is disabled.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='Number of intents applied at once')
+        parser.add_argument('--loop', action='store_true', help='Keep flushing until interrupted')
+        parser.add_argument(
+            '--reconcile',
+            action='store_true',
+            help='Check likes counts and projected counts after flushing'
+        )
+        parser.add_argument('--fix', action='store_true', help='Repair what --reconcile finds')
+
+    def handle(self, *args, **options):
+        flushed = 0
+        try:
+            while True:
+                batch = write_behind.flush(options['batch_size'])
+                flushed += batch
+                if batch:
+                    continue
+                if not options['loop']:
+                    break
+                time.sleep(write_behind.get_options()['INTERVAL'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(f'Flushed {flushed} like intents')
+
+        if not options['reconcile']:
+            return
+        problems = write_behind.reconcile(fix=options['fix'])
+        for post_id, problem in problems:
+            self.stdout.write(f'Post {post_id}: {problem}')
+        if problems and not options['fix']:
+            raise CommandError(f'{len(problems)} posts out of sync, run with --fix to repair them')
+        self.stdout.write(f'Reconciled, {len(problems)} posts repaired' if problems else 'Reconciled, all in sync')
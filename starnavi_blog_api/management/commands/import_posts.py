@@ -0,0 +1,98 @@
+import csv
+import json
+import os
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import IntegerField
+from starnavi_blog_api import cache as feed_cache
+from starnavi_blog_api import search
+from starnavi_blog_api.bulk import chunked, insert_objects
+from starnavi_blog_api.models import Post
+from starnavi_blog_api.serializers import PostModelSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Streams posts from NDJSON or CSV file into posts table. '
+        'Records need title and content, user id is optional.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='NDJSON or CSV file to import')
+        parser.add_argument(
+            '--format',
+            choices=('ndjson', 'csv'),
+            help='Input format, detected from file extension by default'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Number of records validated and written at once'
+        )
+
+    def handle(self, *args, **options):
+        input_format = options['format'] or self.detect_format(options['path'])
+        imported = 0
+        with open(options['path'], newline='', encoding='utf-8') as input_file:
+            records = self.read_records(input_file, input_format)
+            with transaction.atomic():
+                for chunk in chunked(records, options['chunk_size']):
+                    search.index_posts(insert_objects(Post, self.build_posts(chunk, imported)))
+                    imported += len(chunk)
+            feed_cache.invalidate_feed()
+        self.stdout.write(f'Imported {imported} posts')
+
+    def detect_format(self, path):
+        extension = os.path.splitext(path)[1].lower()
+        if extension in ('.ndjson', '.jsonl'):
+            return 'ndjson'
+        if extension == '.csv':
+            return 'csv'
+        raise CommandError(f'Can not detect format of {path}, use --format')
+
+    def read_records(self, input_file, input_format):
+        if input_format == 'csv':
+            yield from csv.DictReader(input_file)
+            return
+        for line_number, line in enumerate(input_file, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as exc:
+                raise CommandError(f'Line {line_number} is not valid JSON: {exc}')
+
+    def build_posts(self, records, offset):
+        serializer = PostModelSerializer(data=records, many=True)
+        record_errors = serializer.errors if not serializer.is_valid() else {}
+        if isinstance(record_errors, dict):
+            # Newer DRF reports list errors as {index: errors}.
+            record_errors = [record_errors.get(index, {}) for index in range(len(records))]
+        user_field = IntegerField(min_value=1, allow_null=True)
+        user_ids = []
+        errors = []
+        for number, (record, record_error) in enumerate(zip(records, record_errors), start=1):
+            error = dict(record_error)
+            try:
+                user_ids.append(user_field.run_validation(record.get('user') or None))
+            except ValidationError as exc:
+                error['user'] = exc.detail
+            if error:
+                errors.append(f'record {offset + number}: {error}')
+        if errors:
+            raise CommandError('Invalid records, nothing imported:\n' + '\n'.join(errors))
+
+        referenced_user_ids = {user_id for user_id in user_ids if user_id is not None}
+        missing_user_ids = referenced_user_ids - set(
+            User.objects.filter(pk__in=referenced_user_ids).values_list('pk', flat=True)
+        )
+        if missing_user_ids:
+            raise CommandError(f'Users do not exist: {", ".join(map(str, sorted(missing_user_ids)))}')
+
+        return [
+            Post(user_id=user_id, **data)
+            for user_id, data in zip(user_ids, serializer.validated_data)
+        ]
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.template.defaultfilters import filesizeformat
+from starnavi_blog_api import partitioning
+
+
+class Command(BaseCommand):
+    help = (
+        'Reports partitions of partitioned tables, creates monthly partitions '
+        'ahead of time and drops ones past retention. Run it daily, inserts '
+        'into a month without a partition fail.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Database to maintain')
+        parser.add_argument('--premake', type=int, default=3, help='Number of monthly partitions kept ahead')
+        parser.add_argument(
+            '--retention-months',
+            type=int,
+            help='Drop monthly partitions older than this many full months'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be dropped')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'postgresql':
+            self.stdout.write(f'Tables are not partitioned on {connection.vendor}, nothing to maintain')
+            return
+        if options['retention_months'] is not None and options['retention_months'] < 1:
+            raise CommandError('--retention-months must be at least 1')
+
+        tables = partitioning.get_partitioned_tables(connection)
+        if not tables:
+            self.stdout.write('No partitioned tables')
+        with connection.schema_editor(atomic=False) as schema_editor:
+            for table, (method, key) in sorted(tables.items()):
+                self.stdout.write(f'{table}: partitioned by {method} of {key}')
+                if method == 'range' and not options['dry_run']:
+                    for name in partitioning.premake_partitions(schema_editor, table, options['premake']):
+                        self.stdout.write(f'  created {name}')
+                if method == 'range' and options['retention_months'] is not None:
+                    expired = partitioning.drop_expired_partitions(
+                        schema_editor, table, options['retention_months'], dry_run=options['dry_run']
+                    )
+                    for name in expired:
+                        self.stdout.write(f'  {"would drop" if options["dry_run"] else "dropped"} {name}')
+                for name, bound, rows, size in partitioning.get_partitions(connection, table):
+                    self.stdout.write(f'  {name} {bound}: ~{rows} rows, {filesizeformat(size)}')
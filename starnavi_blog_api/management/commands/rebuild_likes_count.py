@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from starnavi_blog_api import cache as feed_cache
+from starnavi_blog_api.models import Post, PostLikes
+
+
+class Command(BaseCommand):
+    help = 'Recalculates denormalized Post.likes_count from the likes table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help='Number of post ids updated per transaction'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        likes = PostLikes.objects.filter(post=OuterRef('pk')).order_by().values('post')
+        actual_count = Coalesce(
+            Subquery(likes.annotate(total=Count('pk')).values('total')),
+            0
+        )
+        last_id = Post.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+        updated = 0
+        for start in range(0, last_id + 1, batch_size):
+            with transaction.atomic():
+                updated += Post.objects.filter(
+                    id__gte=start,
+                    id__lt=start + batch_size
+                ).update(likes_count=actual_count)
+        # Cached pages and like patches still carry the counts just corrected.
+        feed_cache.invalidate_feed()
+        self.stdout.write(f'Rebuilt likes count for {updated} posts')
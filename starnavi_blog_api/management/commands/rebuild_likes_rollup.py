@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils.dateparse import parse_date
+from starnavi_blog_api.models import DailyLikes, PostLikes
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuilds daily likes rollup from likes table. Withdrawn likes are '
+        'not stored in likes table, so rebuilt days have no unlikes. Likes '
+        'made before like times were recorded count on the day of their post.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date-from', help='First day to rebuild, YYYY-MM-DD')
+        parser.add_argument('--date-to', help='Last day to rebuild, YYYY-MM-DD')
+
+    def handle(self, *args, **options):
+        likes = PostLikes.objects.all()
+        rollups = DailyLikes.objects.all()
+        for option, lookup in (('date_from', 'gte'), ('date_to', 'lte')):
+            if options[option] is None:
+                continue
+            date = parse_date(options[option])
+            if date is None:
+                raise CommandError(f'Invalid date: {options[option]}')
+            likes = likes.filter(**{f'created__date__{lookup}': date})
+            rollups = rollups.filter(**{f'date__{lookup}': date})
+
+        days = (
+            likes.annotate(day=TruncDate('created'))
+            .order_by()
+            .values('day')
+            .annotate(likes=Count('pk'))
+        )
+        with transaction.atomic():
+            rollups.delete()
+            DailyLikes.objects.bulk_create(
+                (DailyLikes(date=day['day'], shard=0, likes=day['likes']) for day in days),
+                batch_size=1000
+            )
+        self.stdout.write(f'Rebuilt daily likes for {len(days)} days')
@@ -0,0 +1,62 @@
+import math
+import time
+from collections import defaultdict
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from starnavi_blog_api.bulk import chunked
+from starnavi_blog_api.models import Post, PostLikes, TrendingState
+from starnavi_blog_api.trending import trending_posts
+
+
+class Command(BaseCommand):
+    help = (
+        'Moves trending epoch to now and scales trending scores down to it. '
+        'Likes do it themselves once the epoch is 64 time constants old, running it '
+        'every few half-lives keeps scores smaller and that pause off the like path.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Recompute scores from likes instead of scaling stored ones'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of posts updated at once by --rebuild'
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            with transaction.atomic():
+                # Locking the epoch row keeps likes out until new scores are committed.
+                state, _ = TrendingState.objects.select_for_update().get_or_create(
+                    pk=1,
+                    defaults={'epoch': time.time()}
+                )
+                state.epoch = time.time()
+                updated = self.rebuild(state.epoch, options['batch_size'])
+                state.save(update_fields=['epoch'])
+        else:
+            updated = Post.objects.filter(trending_score__gt=0).count()
+            TrendingState.objects.renormalize()
+        trending_posts.clear()
+        self.stdout.write(f'Renormalized trending scores of {updated} posts')
+
+    def rebuild(self, epoch, batch_size):
+        cutoff = timezone.now() - timedelta(seconds=-math.log(TrendingState.objects.min_score) * TrendingState.objects.get_tau())
+        scores = defaultdict(float)
+        likes = PostLikes.objects.filter(created__gte=cutoff).values_list('post_id', 'created')
+        for post_id, created in likes.iterator(chunk_size=batch_size):
+            scores[post_id] += TrendingState.objects.weight(created, epoch)
+        Post.objects.filter(trending_score__gt=0).update(trending_score=0)
+        for batch in chunked(scores.items(), batch_size):
+            Post.objects.bulk_update(
+                [Post(id=post_id, trending_score=score) for post_id, score in batch],
+                ['trending_score']
+            )
+        return len(scores)
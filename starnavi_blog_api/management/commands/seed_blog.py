@@ -0,0 +1,50 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from starnavi_blog_api import seeding
+
+
+class Command(BaseCommand):
+    help = (
+        'Generates users, posts and likes for local performance work. Liked '
+        'posts follow Zipf\'s law, every user signs in with the same password.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Users to add')
+        parser.add_argument('--posts', type=int, default=10000, help='Posts to add')
+        parser.add_argument('--likes', type=int, default=100000, help='Likes to add')
+        parser.add_argument(
+            '--exponent',
+            type=float,
+            default=1.1,
+            help='Zipf exponent of post likes and authors, 0 is uniform'
+        )
+        parser.add_argument('--random-seed', type=int, default=0, help='Seed of generated data')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help='Number of rows written at once'
+        )
+        parser.add_argument('--username-prefix', default=seeding.USERNAME_PREFIX, help='Prefix of usernames')
+        parser.add_argument('--password', default=seeding.PASSWORD, help='Password of every user')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        try:
+            user_ids, post_ids = seeding.seed_blog(
+                users=options['users'],
+                posts=options['posts'],
+                likes=options['likes'],
+                exponent=options['exponent'],
+                random_seed=options['random_seed'],
+                batch_size=options['batch_size'],
+                username_prefix=options['username_prefix'],
+                password=options['password']
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(
+            f'Seeded {len(user_ids)} users, {len(post_ids)} posts and {options["likes"]} likes '
+            f'in {time.monotonic() - started:.1f}s'
+        )
@@ -0,0 +1,301 @@
+import bisect
+import hmac
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseForbidden
+from rest_framework.fields import empty
+from rest_framework.serializers import ListSerializer
+
+DEFAULTS = {
+    'ENABLED': True,
+    'SERVER_TIMING': False,
+    'TOKEN': None,
+    'LATENCY_BUCKETS': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    'QUERY_BUCKETS': (0, 1, 2, 5, 10, 20, 50, 100),
+}
+
+# Timers measured inside a request besides total latency.
+TIMERS = ('db', 'serializer', 'external_http')
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_current = ContextVar('request_metrics', default=None)
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, 'REQUEST_METRICS', {})}
+
+
+class RequestMetrics:
+    """
+    Timings and query count of a single request
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timings = dict.fromkeys(TIMERS, 0.0)
+        self.active = dict.fromkeys(TIMERS, 0)
+        self.queries = 0
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    metrics.queries += 1
+    with timed('db'):
+        return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_recorder(connection, **kwargs):
+    """
+    Counts queries of ``connection`` towards the request running them.
+
+    The wrapper stays for the life of the connection and finds the request
+    in context, so queries async views run in worker threads count too.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def timed(name):
+    """
+    Adds time spent in the block to timer ``name`` of current request.
+
+    Nested blocks of the same timer are counted once. Different timers
+    may overlap, e.g. serializer time includes queries made by validators.
+    """
+    metrics = _current.get()
+    if metrics is None or metrics.active[name]:
+        yield
+        return
+    metrics.active[name] += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.timings[name] += time.perf_counter() - started
+        metrics.active[name] -= 1
+
+
+class TimedListSerializer(ListSerializer):
+    """
+    ``ListSerializer`` counting a whole list towards serializer time at once
+    """
+
+    def run_validation(self, data=empty):
+        if self.parent is not None:
+            return super().run_validation(data)
+        with timed('serializer'):
+            return super().run_validation(data)
+
+    def to_representation(self, data):
+        if self.parent is not None:
+            return super().to_representation(data)
+        with timed('serializer'):
+            return super().to_representation(data)
+
+
+class TimedSerializerMixin:
+    """
+    Counts validation and representation towards serializer time. Only
+    top-level serializers are timed, lists once rather than per item.
+    """
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_serializer = super().many_init(*args, **kwargs)
+        if type(list_serializer) is ListSerializer:
+            # DRF only takes list classes from Meta, which every serializer would have to repeat.
+            list_serializer.__class__ = TimedListSerializer
+        return list_serializer
+
+    def run_validation(self, data=empty):
+        if self.parent is not None:
+            return super().run_validation(data)
+        with timed('serializer'):
+            return super().run_validation(data)
+
+    def to_representation(self, instance):
+        if self.parent is not None:
+            return super().to_representation(instance)
+        with timed('serializer'):
+            return super().to_representation(instance)
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """
+    Histograms and counters of this process, keyed by metric name and labels
+    """
+
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def observe(self, name, labels, value, buckets):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def increment(self, name, labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + 1
+
+    def clear(self):
+        with self.lock:
+            self.histograms = {}
+            self.counters = {}
+
+    def render(self):
+        """
+        Returns metrics in Prometheus text exposition format
+        """
+        with self.lock:
+            histograms = {
+                key: (histogram.buckets, histogram.counts[:], histogram.sum, histogram.count)
+                for key, histogram in self.histograms.items()
+            }
+            counters = dict(self.counters)
+        lines = []
+        for name in sorted({name for name, _ in counters}):
+            lines.append(f'# TYPE {name} counter')
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_format_labels(labels)} {value}')
+        for name in sorted({name for name, _ in histograms}):
+            lines.append(f'# TYPE {name} histogram')
+            for (metric, labels), (buckets, counts, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip((*buckets, '+Inf'), counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{_format_labels(labels + (("le", str(bound)),))} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {total}')
+                lines.append(f'{name}_count{_format_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label(value)}"' for name, value in labels) + '}'
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class RequestMetricsMiddleware:
+    """
+    Records latency, DB queries, serializer and external HTTP time of every
+    request into per-view histograms. Put it first, so total latency covers
+    other middleware too.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        options = get_options()
+        if not options['ENABLED']:
+            return self.get_response(request)
+        # Connections opened before this module was imported missed the signal.
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.process_metrics(request, response, metrics, options)
+
+    async def __acall__(self, request):
+        options = get_options()
+        if not options['ENABLED']:
+            return await self.get_response(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.process_metrics(request, response, metrics, options)
+
+    def process_metrics(self, request, response, metrics, options):
+        total = time.perf_counter() - metrics.started
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.url_name or match.view_name) if match else 'unmatched'
+        labels = {'view': view, 'method': request.method}
+        registry.increment('http_requests_total', {**labels, 'status': response.status_code})
+        registry.observe('http_request_duration_seconds', labels, total, options['LATENCY_BUCKETS'])
+        registry.observe('http_request_db_queries', labels, metrics.queries, options['QUERY_BUCKETS'])
+        for name, seconds in metrics.timings.items():
+            registry.observe(f'http_request_{name}_duration_seconds', labels, seconds, options['LATENCY_BUCKETS'])
+
+        if options['SERVER_TIMING']:
+            entries = [
+                f'{name};dur={seconds * 1000:.3f}'
+                for name, seconds in metrics.timings.items()
+            ]
+            entries.append(f'db_queries;desc="{metrics.queries}"')
+            entries.append(f'total;dur={total * 1000:.3f}')
+            response['Server-Timing'] = ', '.join(entries)
+        return response
+
+
+def metrics_view(request):
+    """
+    Serves metrics to scrapers sending ``TOKEN`` as a bearer token, or to
+    staff users when no token is configured
+    """
+    token = get_options()['TOKEN']
+    if token:
+        expected = f'Bearer {token}'.encode()
+        authorized = hmac.compare_digest(request.headers.get('Authorization', '').encode(), expected)
+    else:
+        user = getattr(request, 'user', None)
+        authorized = user is not None and user.is_staff
+    if not authorized:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,28 @@
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_likes_count(apps, schema_editor):
+    Post = apps.get_model('starnavi_blog_api', 'Post')
+    PostLikes = apps.get_model('starnavi_blog_api', 'PostLikes')
+    likes = PostLikes.objects.filter(post=OuterRef('pk')).order_by().values('post')
+    Post.objects.using(schema_editor.connection.alias).update(
+        likes_count=Coalesce(Subquery(likes.annotate(total=Count('pk')).values('total')), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('starnavi_blog_api', '0007_auto_20190321_1104'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Post likes count'),
+        ),
+        migrations.RunPython(populate_likes_count, migrations.RunPython.noop),
+    ]
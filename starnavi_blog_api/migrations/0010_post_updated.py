@@ -0,0 +1,25 @@
+from django.db import migrations, models
+from django.db.models import F
+import django.utils.timezone
+
+
+def copy_created_to_updated(apps, schema_editor):
+    Post = apps.get_model('starnavi_blog_api', 'Post')
+    Post.objects.using(schema_editor.connection.alias).update(updated=F('created'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('starnavi_blog_api', '0009_post_created_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Date and Time Updated'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_created_to_updated, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.utils.timezone
+
+
+def backfill_like_times(apps, schema_editor):
+    # Like times were never stored. A like can't predate its post, so likes
+    # made before this migration are dated to their post's creation, which
+    # keeps rebuilt rollups spread over history instead of on migration day.
+    Post = apps.get_model('starnavi_blog_api', 'Post')
+    PostLikes = apps.get_model('starnavi_blog_api', 'PostLikes')
+    using = schema_editor.connection.alias
+    PostLikes.objects.using(using).update(
+        created=Subquery(Post.objects.using(using).filter(pk=OuterRef('post_id')).values('created')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('starnavi_blog_api', '0010_post_updated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postlikes',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Date and Time Liked'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_like_times, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='DailyLikes',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Day')),
+                ('shard', models.PositiveSmallIntegerField(verbose_name='Rollup shard')),
+                ('likes', models.PositiveIntegerField(default=0, verbose_name='Likes made')),
+                ('unlikes', models.PositiveIntegerField(default=0, verbose_name='Likes withdrawn')),
+            ],
+            options={
+                'verbose_name': 'Daily likes',
+                'verbose_name_plural': 'Daily likes',
+                'db_table': 'likes_daily',
+                'unique_together': {('date', 'shard')},
+            },
+        ),
+    ]
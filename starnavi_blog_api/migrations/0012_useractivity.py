@@ -0,0 +1,27 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('starnavi_blog_api', '0011_like_analytics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserActivity',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='activity', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='User')),
+                ('last_login', models.DateTimeField(null=True, verbose_name='Last sign in')),
+                ('last_request', models.DateTimeField(null=True, verbose_name='Last API request')),
+            ],
+            options={
+                'verbose_name': 'User activity',
+                'verbose_name_plural': 'User activity',
+                'db_table': 'user_activity',
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('starnavi_blog_api', '0012_useractivity'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # The author index is built before the unique constraint goes away, so
+        # author lookups stay indexed. Existing rows are kept as they are.
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['user', '-created', '-id'], name='posts_user_created_idx'),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='user',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='posts', to=settings.AUTH_USER_MODEL, verbose_name='Post Author'),
+        ),
+    ]
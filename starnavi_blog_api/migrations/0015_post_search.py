@@ -0,0 +1,112 @@
+import re
+from collections import Counter
+import django.db.models.deletion
+from django.db import migrations, models
+
+SEARCH_VECTOR_SQL = """
+    ALTER TABLE posts ADD COLUMN search_vector tsvector;
+
+    CREATE FUNCTION posts_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(NEW.content, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql;
+
+    CREATE TRIGGER posts_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, content ON posts
+    FOR EACH ROW EXECUTE PROCEDURE posts_search_vector_update();
+
+    UPDATE posts SET search_vector =
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(content, '')), 'B');
+
+    CREATE INDEX posts_search_vector_idx ON posts USING GIN (search_vector);
+"""
+
+DROP_SEARCH_VECTOR_SQL = """
+    DROP TRIGGER posts_search_vector_trigger ON posts;
+    DROP FUNCTION posts_search_vector_update();
+    ALTER TABLE posts DROP COLUMN search_vector;
+"""
+
+
+# Frozen copy of the term weighting in starnavi_blog_api.search at the time of this migration.
+STOP_WORDS = frozenset((
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'for', 'if', 'in',
+    'into', 'is', 'it', 'no', 'not', 'of', 'on', 'or', 'such', 'that', 'the',
+    'their', 'then', 'there', 'these', 'they', 'this', 'to', 'was', 'will', 'with',
+))
+
+WORD_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return [word for word in WORD_RE.findall(text.lower()) if word not in STOP_WORDS and len(word) <= 64]
+
+
+def get_term_weights(title, content):
+    weights = Counter()
+    for word in tokenize(title):
+        weights[word] += 4
+    for word in tokenize(content):
+        weights[word] += 1
+    return weights
+
+
+def add_search_vector(apps, schema_editor):
+    # The column lives outside of the model, so ORM queries and COPY never
+    # touch it and the trigger also covers bulk inserts and imports.
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(SEARCH_VECTOR_SQL)
+
+
+def drop_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_SEARCH_VECTOR_SQL)
+
+
+def index_existing_posts(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        return
+    Post = apps.get_model('starnavi_blog_api', 'Post')
+    PostSearchTerm = apps.get_model('starnavi_blog_api', 'PostSearchTerm')
+    using = schema_editor.connection.alias
+    posts = Post.objects.using(using).values_list('id', 'title', 'content').order_by('id')
+    PostSearchTerm.objects.using(using).bulk_create(
+        (
+            PostSearchTerm(post_id=post_id, term=term, weight=weight)
+            for post_id, title, content in posts.iterator(chunk_size=1000)
+            for term, weight in get_term_weights(title, content).items()
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('starnavi_blog_api', '0014_timeline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostSearchTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='Word')),
+                ('weight', models.FloatField(verbose_name='Weight in post')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='starnavi_blog_api.post', verbose_name='Post')),
+            ],
+            options={
+                'verbose_name': 'Post search term',
+                'verbose_name_plural': 'Post search terms',
+                'db_table': 'posts_search_terms',
+                'unique_together': {('term', 'post')},
+            },
+        ),
+        migrations.RunPython(add_search_vector, drop_search_vector),
+        migrations.RunPython(index_existing_posts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+import time
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_epoch(apps, schema_editor):
+    # Scores of existing likes can be filled with renormalize_trending_scores --rebuild.
+    TrendingState = apps.get_model('starnavi_blog_api', 'TrendingState')
+    TrendingState.objects.using(schema_editor.connection.alias).create(pk=1, epoch=time.time())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('starnavi_blog_api', '0015_post_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingState',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('epoch', models.FloatField(verbose_name='Epoch as unix time')),
+            ],
+            options={
+                'verbose_name': 'Trending state',
+                'verbose_name_plural': 'Trending state',
+                'db_table': 'trending_state',
+            },
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='trending_score',
+            field=models.FloatField(default=0, editable=False, verbose_name='Trending score'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-trending_score', '-id'], name='posts_trending_idx'),
+        ),
+        migrations.RunPython(create_epoch, migrations.RunPython.noop),
+    ]
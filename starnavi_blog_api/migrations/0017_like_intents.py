@@ -0,0 +1,31 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('starnavi_blog_api', '0016_trending'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LikeIntent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('liked', models.BooleanField(verbose_name='Requested like state')),
+                ('delta', models.SmallIntegerField(verbose_name='Projected likes count change')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Date and Time Requested')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='starnavi_blog_api.post', verbose_name='Post to like')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='User that has requested like')),
+            ],
+            options={
+                'verbose_name': 'Like intent',
+                'verbose_name_plural': 'Like intents',
+                'db_table': 'like_intents',
+                'indexes': [models.Index(fields=['user', 'post', '-id'], name='like_intents_user_post_idx')],
+            },
+        ),
+    ]
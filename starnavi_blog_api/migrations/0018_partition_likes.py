@@ -0,0 +1,15 @@
+from django.db import migrations
+from starnavi_blog_api.partitioning import PartitionTable
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('starnavi_blog_api', '0017_like_intents'),
+    ]
+
+    operations = [
+        # Likes are unique per (user, post), and partitions only enforce uniqueness
+        # including the partition key, so they are split by post rather than by time.
+        PartitionTable('postlikes', key='post', method='hash', partitions=8),
+    ]
@@ -1,5 +1,267 @@
-from django.db import models
+import math
+import time
+from collections import defaultdict
+from django.conf import settings
+from django.db import IntegrityError, connections, models, transaction
+from django.db.models import Case, F, FloatField, IntegerField, Q, Value, When
+from django.db.models.functions import Greatest
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+
+class PostLikesManager(models.Manager):
+
+    def toggle(self, user, post_id):
+        """
+        Likes or unlikes post for user and returns post with fresh
+        ``likes_count`` and ``liked`` state of the user.
+
+        Raises ``Post.DoesNotExist`` if there is no such post.
+        """
+        if connections[self.db].vendor == 'postgresql':
+            post = self._toggle_in_single_statement(user, post_id)
+        else:
+            post = self._toggle_in_transaction(user, post_id)
+        if post is None:
+            raise Post.DoesNotExist('Post does not exist')
+        return post
+
+    def _toggle_in_single_statement(self, user, post_id):
+        # Deleting an existing like and inserting a missing one happen in the
+        # same statement, so concurrent toggles serialize on the unique index
+        # and the counter always moves together with the likes table.
+        likes_table = self.model._meta.db_table
+        posts_table = Post._meta.db_table
+        rollup_table = DailyLikes._meta.db_table
+        # Only model columns are returned, posts also has a search_vector maintained by a trigger.
+        post_columns = ', '.join(field.column for field in Post._meta.concrete_fields)
+        # Scores would silently stay put without the epoch row the statement joins.
+        TrendingState.objects.db_manager(self.db).get_epoch()
+        sql = f'''
+            WITH epoch AS (
+                {TrendingState.objects.epoch_sql()}
+            ), deleted AS (
+                DELETE FROM {likes_table}
+                WHERE post_id = %(post)s AND user_id = %(user)s
+                RETURNING post_id, created
+            ), inserted AS (
+                INSERT INTO {likes_table} (post_id, user_id, created)
+                SELECT id, %(user)s, now() FROM {posts_table}
+                WHERE id = %(post)s AND NOT EXISTS (SELECT 1 FROM deleted)
+                ON CONFLICT DO NOTHING
+                RETURNING post_id, created
+            ), rollup AS (
+                INSERT INTO {rollup_table} (date, shard, likes, unlikes)
+                SELECT %(date)s, %(shard)s, (SELECT COUNT(*) FROM inserted), (SELECT COUNT(*) FROM deleted)
+                WHERE EXISTS (SELECT 1 FROM inserted) OR EXISTS (SELECT 1 FROM deleted)
+                ON CONFLICT (date, shard) DO UPDATE
+                SET likes = {rollup_table}.likes + EXCLUDED.likes,
+                    unlikes = {rollup_table}.unlikes + EXCLUDED.unlikes
+            ), updated AS (
+                UPDATE {posts_table}
+                SET likes_count = likes_count
+                    + (SELECT COUNT(*) FROM inserted)
+                    - (SELECT COUNT(*) FROM deleted),
+                    trending_score = GREATEST(0, trending_score
+                        + (SELECT COALESCE(SUM({TrendingState.objects.weight_sql('inserted')}), 0) FROM inserted, epoch)
+                        - (SELECT COALESCE(SUM({TrendingState.objects.weight_sql('deleted')}), 0) FROM deleted, epoch)),
+                    -- Read once the row is locked, so it orders changes of the post for cached counts.
+                    updated = clock_timestamp()
+                WHERE id = %(post)s
+                RETURNING {post_columns}
+            )
+            SELECT updated.*, NOT EXISTS (SELECT 1 FROM deleted) AS liked
+            FROM updated
+        '''
+        params = {
+            'post': post_id,
+            'user': user.pk,
+            'date': timezone.localdate(),
+            'shard': DailyLikes.objects.shard_for(user.pk),
+            'tau': TrendingState.objects.get_tau(),
+        }
+        return next(iter(Post.objects.db_manager(self.db).raw(sql, params)), None)
+
+    def _toggle_in_transaction(self, user, post_id):
+        with transaction.atomic(using=self.db):
+            # Epoch first, renormalizing it locks every scored post.
+            trending = TrendingState.objects.db_manager(self.db)
+            epoch = trending.get_epoch()
+            post = Post.objects.db_manager(self.db).select_for_update().filter(pk=post_id).first()
+            if post is None:
+                return None
+            like = self.filter(post_id=post_id, user=user).first()
+            deleted = like is not None
+            if deleted:
+                like.delete()
+                delta = -1
+                score = -trending.weight(like.created, epoch)
+            else:
+                like = self.create(post_id=post_id, user=user)
+                delta = 1
+                score = trending.weight(like.created, epoch)
+            DailyLikes.objects.db_manager(self.db).add(
+                timezone.localdate(),
+                DailyLikes.objects.shard_for(user.pk),
+                likes=int(delta > 0),
+                unlikes=int(delta < 0)
+            )
+            Post.objects.filter(pk=post_id).update(
+                likes_count=F('likes_count') + delta,
+                trending_score=Greatest(F('trending_score') + score, Value(0.0)),
+                updated=timezone.now()
+            )
+        post.refresh_from_db(fields=['likes_count', 'trending_score', 'updated'])
+        post.liked = not deleted
+        return post
+
+    def apply_states(self, states):
+        """
+        Brings likes to requested states given as ``{(user_id, post_id): liked}``.
+
+        Returns ``{post_id: (likes_count, delta)}`` for every requested post
+        that exists, where delta is the number of likes actually added.
+        """
+        if not states:
+            return {}
+        if connections[self.db].vendor == 'postgresql':
+            return self._apply_states_in_single_statement(states)
+        return self._apply_states_in_transaction(states)
+
+    def _apply_states_in_single_statement(self, states):
+        likes_table = self.model._meta.db_table
+        posts_table = Post._meta.db_table
+        rollup_table = DailyLikes._meta.db_table
+        # Scores would silently stay put without the epoch row the statement joins.
+        TrendingState.objects.db_manager(self.db).get_epoch()
+        sql = f'''
+            WITH epoch AS (
+                {TrendingState.objects.epoch_sql()}
+            ), requested (user_id, post_id, liked) AS (
+                SELECT * FROM unnest(%(users)s::integer[], %(posts)s::integer[], %(liked)s::boolean[])
+            ), inserted AS (
+                INSERT INTO {likes_table} (user_id, post_id, created)
+                SELECT requested.user_id, requested.post_id, now()
+                FROM requested JOIN {posts_table} ON {posts_table}.id = requested.post_id
+                WHERE requested.liked
+                ORDER BY requested.post_id
+                ON CONFLICT DO NOTHING
+                RETURNING user_id, post_id, created
+            ), deleted AS (
+                DELETE FROM {likes_table} USING requested
+                WHERE NOT requested.liked
+                    AND {likes_table}.user_id = requested.user_id
+                    AND {likes_table}.post_id = requested.post_id
+                RETURNING {likes_table}.user_id, {likes_table}.post_id, {likes_table}.created
+            ), changes AS (
+                SELECT user_id, post_id, 1 AS delta, {TrendingState.objects.weight_sql('inserted')} AS score
+                FROM inserted, epoch
+                UNION ALL
+                SELECT user_id, post_id, -1 AS delta, -{TrendingState.objects.weight_sql('deleted')} AS score
+                FROM deleted, epoch
+            ), rollup AS (
+                INSERT INTO {rollup_table} (date, shard, likes, unlikes)
+                SELECT %(date)s, MOD(user_id, %(shards)s),
+                    COUNT(*) FILTER (WHERE delta > 0), COUNT(*) FILTER (WHERE delta < 0)
+                FROM changes
+                GROUP BY 2
+                ON CONFLICT (date, shard) DO UPDATE
+                SET likes = {rollup_table}.likes + EXCLUDED.likes,
+                    unlikes = {rollup_table}.unlikes + EXCLUDED.unlikes
+            ), deltas AS (
+                SELECT post_id, SUM(delta) AS delta, SUM(score) AS score FROM changes GROUP BY post_id
+            ), updated AS (
+                UPDATE {posts_table}
+                SET likes_count = {posts_table}.likes_count + deltas.delta,
+                    trending_score = GREATEST(0, {posts_table}.trending_score + deltas.score),
+                    -- Read once the row is locked, so it orders changes of the post for cached counts.
+                    updated = clock_timestamp()
+                FROM deltas
+                WHERE {posts_table}.id = deltas.post_id
+                RETURNING {posts_table}.id, {posts_table}.likes_count, deltas.delta
+            )
+            SELECT {posts_table}.id,
+                COALESCE(updated.likes_count, {posts_table}.likes_count),
+                COALESCE(updated.delta, 0)
+            FROM {posts_table} LEFT JOIN updated ON updated.id = {posts_table}.id
+            WHERE {posts_table}.id IN (SELECT post_id FROM requested)
+        '''
+        pairs = list(states)
+        params = {
+            'users': [user_id for user_id, _ in pairs],
+            'posts': [post_id for _, post_id in pairs],
+            'liked': [states[pair] for pair in pairs],
+            'date': timezone.localdate(),
+            'shards': settings.LIKES_ROLLUP_SHARDS,
+            'tau': TrendingState.objects.get_tau(),
+        }
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(sql, params)
+            return {post_id: (likes_count, delta) for post_id, likes_count, delta in cursor.fetchall()}
+
+    def _apply_states_in_transaction(self, states):
+        user_ids = {user_id for user_id, _ in states}
+        post_ids = {post_id for _, post_id in states}
+        with transaction.atomic(using=self.db):
+            # Epoch first, renormalizing it locks every scored post.
+            trending = TrendingState.objects.db_manager(self.db)
+            epoch = trending.get_epoch()
+            existing_posts = set(
+                Post.objects.db_manager(self.db).select_for_update()
+                .filter(pk__in=post_ids).order_by('pk').values_list('pk', flat=True)
+            )
+            # Locked, so every like read here is still there to delete and no request inserts it twice.
+            existing_likes = {
+                (user_id, post_id): created for user_id, post_id, created in
+                self.select_for_update().filter(user_id__in=user_ids, post_id__in=post_ids)
+                .order_by('pk').values_list('user_id', 'post_id', 'created')
+            }
+            to_like = [
+                pair for pair, liked in states.items()
+                if liked and pair not in existing_likes and pair[1] in existing_posts
+            ]
+            to_unlike = [pair for pair, liked in states.items() if not liked and pair in existing_likes]
+
+            new_likes = [self.model(user_id=user_id, post_id=post_id) for user_id, post_id in to_like]
+            self.bulk_create(new_likes)
+            if to_unlike:
+                unlike_filter = Q()
+                for user_id, post_id in to_unlike:
+                    unlike_filter |= Q(user_id=user_id, post_id=post_id)
+                self.filter(unlike_filter).delete()
+
+            deltas = dict.fromkeys(existing_posts, 0)
+            scores = dict.fromkeys(existing_posts, 0.0)
+            rollup = {}
+            for like in new_likes:
+                deltas[like.post_id] += 1
+                scores[like.post_id] += trending.weight(like.created, epoch)
+                shard_likes = rollup.setdefault(DailyLikes.objects.shard_for(like.user_id), [0, 0])
+                shard_likes[0] += 1
+            for user_id, post_id in to_unlike:
+                deltas[post_id] -= 1
+                scores[post_id] -= trending.weight(existing_likes[(user_id, post_id)], epoch)
+                shard_likes = rollup.setdefault(DailyLikes.objects.shard_for(user_id), [0, 0])
+                shard_likes[1] += 1
+            for shard, (likes, unlikes) in rollup.items():
+                DailyLikes.objects.db_manager(self.db).add(timezone.localdate(), shard, likes, unlikes)
+            changed = [post_id for post_id in existing_posts if deltas[post_id] or scores[post_id]]
+            if changed:
+                Post.objects.db_manager(self.db).filter(pk__in=changed).update(
+                    likes_count=F('likes_count') + Case(
+                        *(When(pk=post_id, then=Value(deltas[post_id])) for post_id in changed),
+                        default=Value(0),
+                        output_field=IntegerField()
+                    ),
+                    trending_score=Greatest(F('trending_score') + Case(
+                        *(When(pk=post_id, then=Value(scores[post_id])) for post_id in changed),
+                        default=Value(0.0),
+                        output_field=FloatField()
+                    ), Value(0.0)),
+                    updated=timezone.now()
+                )
+            counts = Post.objects.db_manager(self.db).filter(pk__in=existing_posts).values_list('pk', 'likes_count')
+            return {post_id: (likes_count, deltas[post_id]) for post_id, likes_count in counts}
 
 
 class PostLikes(models.Model):
@@ -18,6 +280,13 @@ class PostLikes(models.Model):
         verbose_name='Post that has been liked'
     )
 
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Date and Time Liked'
+    )
+
+    objects = PostLikesManager()
+
     def __unicode__(self):
         return f'User: {self.user.username} has liked {self.post.title}'
 
@@ -37,12 +306,14 @@ class Post(models.Model):
 
     content = models.TextField(verbose_name='Post content')
 
-    user = models.OneToOneField(
+    # Indexed by posts_user_created_idx, which leads with user.
+    user = models.ForeignKey(
         User,
         on_delete=models.SET_NULL,
         related_name='posts',
         null=True,
         editable=False,
+        db_index=False,
         verbose_name='Post Author'
     )
 
@@ -51,15 +322,452 @@ class Post(models.Model):
         verbose_name='Date and Time Created'
     )
 
+    likes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Post likes count'
+    )
+
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Date and Time Updated'
+    )
+
+    # Sum of like weights growing with time, see TrendingState.
+    trending_score = models.FloatField(
+        default=0,
+        editable=False,
+        verbose_name='Trending score'
+    )
+
     def __unicode__(self):
         return self.title
 
     def get_likes_count(self):
-        return PostLikes.objects.filter(post=self).count()
+        return self.likes_count
 
     class Meta:
         db_table = 'posts'
         verbose_name = 'Post'
         verbose_name_plural = 'Posts'
+        indexes = [
+            models.Index(fields=['-created', '-id'], name='posts_created_id_idx'),
+            models.Index(fields=['user', '-created', '-id'], name='posts_user_created_idx'),
+            models.Index(fields=['-trending_score', '-id'], name='posts_trending_idx'),
+        ]
+
+
+class DailyLikesManager(models.Manager):
+
+    def shard_for(self, user_id):
+        return user_id % settings.LIKES_ROLLUP_SHARDS
+
+    def add(self, date, shard, likes=0, unlikes=0):
+        """
+        Adds like events to the rollup row of ``date`` and ``shard``
+        """
+        if not likes and not unlikes:
+            return
+        rollup = self.filter(date=date, shard=shard)
+        changes = {'likes': F('likes') + likes, 'unlikes': F('unlikes') + unlikes}
+        if rollup.update(**changes):
+            return
+        try:
+            with transaction.atomic(using=self.db):
+                self.create(date=date, shard=shard, likes=likes, unlikes=unlikes)
+        except IntegrityError:
+            rollup.update(**changes)
+
+
+class DailyLikes(models.Model):
+    """
+    Likes and unlikes made during a day.
+
+    Every day is split into ``LIKES_ROLLUP_SHARDS`` rows by user id, so a
+    burst of likes doesn't queue on a single row lock.
+    """
+
+    date = models.DateField(verbose_name='Day')
+
+    shard = models.PositiveSmallIntegerField(verbose_name='Rollup shard')
+
+    likes = models.PositiveIntegerField(default=0, verbose_name='Likes made')
+
+    unlikes = models.PositiveIntegerField(default=0, verbose_name='Likes withdrawn')
+
+    objects = DailyLikesManager()
+
+    def __unicode__(self):
+        return f'{self.date}: {self.likes} likes'
+
+    class Meta:
+        db_table = 'likes_daily'
+        verbose_name = 'Daily likes'
+        verbose_name_plural = 'Daily likes'
+        unique_together = ('date', 'shard')
+
+
+class UserActivity(models.Model):
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='activity',
+        verbose_name='User'
+    )
+
+    last_login = models.DateTimeField(null=True, verbose_name='Last sign in')
+
+    last_request = models.DateTimeField(null=True, verbose_name='Last API request')
+
+    def __unicode__(self):
+        return f'User: {self.user_id} last seen {self.last_request}'
+
+    class Meta:
+        db_table = 'user_activity'
+        verbose_name = 'User activity'
+        verbose_name_plural = 'User activity'
+
+
+class FollowManager(models.Manager):
+
+    def toggle(self, follower, followee_id):
+        """
+        Follows or unfollows user and returns whether ``follower`` follows
+        them now.
+
+        Raises ``User.DoesNotExist`` if there is no such user.
+        """
+        if not User.objects.using(self.db).filter(pk=followee_id).exists():
+            raise User.DoesNotExist('User does not exist')
+        with transaction.atomic(using=self.db):
+            deleted, _ = self.filter(follower=follower, followee_id=followee_id).delete()
+            if deleted:
+                TimelineEntry.objects.db_manager(self.db).remove_author(follower.pk, followee_id)
+                return False
+            followers = self.filter(followee_id=followee_id).count() + 1
+            pull = followers >= settings.TIMELINE_PULL_THRESHOLD
+            self.create(follower=follower, followee_id=followee_id, pull=pull)
+            if not pull:
+                TimelineEntry.objects.db_manager(self.db).backfill(follower.pk, followee_id)
+            elif followers == settings.TIMELINE_PULL_THRESHOLD:
+                # Author has just crossed the threshold, their next posts are read, not fanned out.
+                self.filter(followee_id=followee_id, pull=False).update(pull=True)
+        return True
+
+
+class Follow(models.Model):
+    """
+    Follower to author edge.
+
+    Posts of authors followed with ``pull`` set are merged into the
+    timeline when it is read instead of being fanned out on write.
+    """
+
+    follower = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='following',
+        verbose_name='Follower'
+    )
+
+    followee = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='followers',
+        verbose_name='Followed author'
+    )
+
+    pull = models.BooleanField(default=False, verbose_name='Read on timeline read')
+
+    created = models.DateTimeField(auto_now_add=True, verbose_name='Date and Time Followed')
+
+    objects = FollowManager()
+
+    def __unicode__(self):
+        return f'User: {self.follower_id} follows {self.followee_id}'
+
+    class Meta:
+        db_table = 'follows'
+        verbose_name = 'Follow'
+        verbose_name_plural = 'Follows'
+        unique_together = ('follower', 'followee')
 
 
+class TimelineEntryManager(models.Manager):
+
+    def fan_out(self, posts):
+        """
+        Adds new posts to timelines of their authors' push-mode followers
+        with a single ``INSERT ... SELECT``
+        """
+        post_ids = [post.id for post in posts if post.id is not None and post.user_id is not None]
+        if not post_ids:
+            return
+        connection = connections[self.db]
+        quote_name = connection.ops.quote_name
+        placeholders = ', '.join(['%s'] * len(post_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'''
+                INSERT INTO {quote_name(self.model._meta.db_table)} (user_id, post_id, created)
+                SELECT follows.follower_id, posts.id, posts.created
+                FROM {quote_name(Post._meta.db_table)} AS posts
+                JOIN {quote_name(Follow._meta.db_table)} AS follows ON follows.followee_id = posts.user_id
+                WHERE posts.id IN ({placeholders}) AND follows.pull = %s
+                ON CONFLICT DO NOTHING
+                ''',
+                [*post_ids, False]
+            )
+
+    def backfill(self, user_id, author_id):
+        """
+        Copies latest posts of a newly followed author into user's timeline
+        """
+        posts = Post.objects.using(self.db).filter(user_id=author_id).order_by('-created', '-id')
+        self.bulk_create(
+            [
+                self.model(user_id=user_id, post_id=post_id, created=created)
+                for post_id, created in posts.values_list('id', 'created')[:settings.TIMELINE_BACKFILL_SIZE]
+            ],
+            ignore_conflicts=True
+        )
+
+    def remove_author(self, user_id, author_id):
+        self.filter(user_id=user_id, post__user_id=author_id).delete()
+
+
+class TimelineEntry(models.Model):
+    """
+    Post materialized in a follower's home timeline.
+
+    ``created`` is copied from the post, so a timeline page is a range scan
+    over ``(user, created, post)`` without touching follows or posts.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        db_index=False,
+        verbose_name='Timeline owner'
+    )
+
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Post'
+    )
+
+    created = models.DateTimeField(verbose_name='Date and Time Post Created')
+
+    objects = TimelineEntryManager()
+
+    def __unicode__(self):
+        return f'User: {self.user_id} Post: {self.post_id}'
+
+    class Meta:
+        db_table = 'timeline'
+        verbose_name = 'Timeline entry'
+        verbose_name_plural = 'Timeline entries'
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(fields=['user', '-created', '-post'], name='timeline_user_created_idx'),
+        ]
+
+
+class PostSearchTerm(models.Model):
+    """
+    Word of a post with its weight, used for search on backends without
+    ``tsvector``. Maintained by ``starnavi_blog_api.search.index_posts``.
+    """
+
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='search_terms',
+        verbose_name='Post'
+    )
+
+    term = models.CharField(max_length=64, verbose_name='Word')
+
+    weight = models.FloatField(verbose_name='Weight in post')
+
+    def __unicode__(self):
+        return f'Post: {self.post_id} Term: {self.term}'
+
+    class Meta:
+        db_table = 'posts_search_terms'
+        verbose_name = 'Post search term'
+        verbose_name_plural = 'Post search terms'
+        unique_together = ('term', 'post')
+
+
+class TrendingStateManager(models.Manager):
+
+    # Epoch age in time constants past which likes renormalize scores
+    # themselves, so weights stay below exp(64) without a scheduled job.
+    max_epoch_age = 64
+    # Weight exponents are clamped to this, floats overflow past exp(709).
+    max_exponent = 700
+    # Scores below this are likes older than about 40 half-lives, they are dropped to zero.
+    min_score = 1e-12
+
+    def get_tau(self):
+        return settings.TRENDING_HALF_LIFE / math.log(2)
+
+    def get_epoch(self):
+        """
+        Returns epoch, creating it when missing and moving it forward when
+        it is older than ``max_epoch_age`` time constants
+        """
+        epoch = self.filter(pk=1).values_list('epoch', flat=True).first()
+        if epoch is None or time.time() - epoch > self.max_epoch_age * self.get_tau():
+            epoch = self.renormalize(self.max_epoch_age)
+        return epoch
+
+    def renormalize(self, min_age=0):
+        """
+        Moves epoch to now and scales trending scores down to it, unless
+        epoch is at most ``min_age`` time constants old. Returns the epoch.
+        """
+        with transaction.atomic(using=self.db):
+            # Locking the epoch row keeps likes out until new scores are committed.
+            state, created = self.select_for_update().get_or_create(pk=1, defaults={'epoch': time.time()})
+            epoch = time.time()
+            if created or epoch - state.epoch <= min_age * self.get_tau():
+                return state.epoch
+            factor = math.exp((state.epoch - epoch) / self.get_tau())
+            posts = Post.objects.db_manager(self.db)
+            posts.filter(trending_score__gt=0).update(trending_score=F('trending_score') * factor)
+            posts.filter(trending_score__gt=0, trending_score__lt=self.min_score).update(trending_score=0)
+            state.epoch = epoch
+            state.save(update_fields=['epoch'])
+        return epoch
+
+    def weight(self, liked_at, epoch):
+        exponent = (liked_at.timestamp() - epoch) / self.get_tau()
+        return math.exp(min(max(exponent, -self.max_exponent), self.max_exponent))
+
+    def epoch_sql(self):
+        # Shared lock keeps likes out while renormalize() moves the epoch.
+        return f'SELECT epoch FROM {self.model._meta.db_table} WHERE id = 1 FOR SHARE'
+
+    def weight_sql(self, likes):
+        exponent = f'(EXTRACT(EPOCH FROM {likes}.created) - epoch.epoch) / %(tau)s'
+        return f'EXP(LEAST(GREATEST({exponent}, -{self.max_exponent}), {self.max_exponent}))'
+
+
+class TrendingState(models.Model):
+    """
+    Epoch of trending scores.
+
+    A like made at ``t`` adds ``exp((t - epoch) / tau)`` to the post score
+    and an unlike takes the same weight back, so scores never decay in
+    place and comparing them compares likes decayed to the same moment.
+    ``renormalize_trending_scores`` moves the epoch forward and scales
+    scores down before they grow too large, likes do it themselves once the
+    epoch is ``max_epoch_age`` time constants old.
+    """
+
+    epoch = models.FloatField(verbose_name='Epoch as unix time')
+
+    objects = TrendingStateManager()
+
+    def __unicode__(self):
+        return f'Trending epoch: {self.epoch}'
+
+    class Meta:
+        db_table = 'trending_state'
+        verbose_name = 'Trending state'
+        verbose_name_plural = 'Trending state'
+
+
+class LikeIntentManager(models.Manager):
+
+    # PostgreSQL advisory lock key serializing flushes
+    flush_lock_key = 0x6c696b65
+
+    def get_pending_states(self, user_id, post_ids):
+        """
+        Returns ``{post_id: liked}`` requested by the latest pending intents of user
+        """
+        states = {}
+        intents = self.filter(user_id=user_id, post_id__in=post_ids).order_by('post_id', '-id')
+        for post_id, liked in intents.values_list('post_id', 'liked'):
+            states.setdefault(post_id, liked)
+        return states
+
+    def flush(self, batch_size):
+        """
+        Applies up to ``batch_size`` oldest intents to likes and deletes them.
+
+        Intents of the same user and post are coalesced into the latest one,
+        so a like followed by an unlike writes nothing. Returns ``(flushed,
+        posts, deltas)``, where ``posts`` is ``{post_id: (likes_count, delta)}``
+        as returned by ``PostLikesManager.apply_states`` and ``deltas`` is
+        ``{post_id: projected_delta}`` of the flushed intents.
+        """
+        with transaction.atomic(using=self.db):
+            # One flusher at a time, batches taken side by side could split intents
+            # of a user and post between them and commit an older one last.
+            connection = connections[self.db]
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT pg_advisory_xact_lock(%s)', [self.flush_lock_key])
+            intents = list(
+                self.select_for_update().order_by('id')
+                .values_list('id', 'user_id', 'post_id', 'liked', 'delta')[:batch_size]
+            )
+            if not intents:
+                return 0, {}, {}
+            states = {}
+            deltas = defaultdict(int)
+            for _, user_id, post_id, liked, delta in intents:
+                states[(user_id, post_id)] = liked
+                deltas[post_id] += delta
+            posts = PostLikes.objects.db_manager(self.db).apply_states(states)
+            self.filter(id__in=[intent[0] for intent in intents]).delete()
+        return len(intents), posts, dict(deltas)
+
+
+class LikeIntent(models.Model):
+    """
+    Like or unlike accepted in write-behind mode and not yet applied to
+    likes. ``delta`` is the change of likes count it was acknowledged with.
+    See ``starnavi_blog_api.write_behind``.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        db_index=False,
+        verbose_name='User that has requested like'
+    )
+
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        verbose_name='Post to like'
+    )
+
+    liked = models.BooleanField(verbose_name='Requested like state')
+
+    delta = models.SmallIntegerField(verbose_name='Projected likes count change')
+
+    created = models.DateTimeField(auto_now_add=True, verbose_name='Date and Time Requested')
+
+    objects = LikeIntentManager()
+
+    def __unicode__(self):
+        return f'User: {self.user_id} wants like {self.liked} on {self.post_id}'
+
+    class Meta:
+        db_table = 'like_intents'
+        verbose_name = 'Like intent'
+        verbose_name_plural = 'Like intents'
+        indexes = [
+            models.Index(fields=['user', 'post', '-id'], name='like_intents_user_post_idx'),
+        ]
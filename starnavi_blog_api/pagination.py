@@ -0,0 +1,165 @@
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from starnavi_blog_api.models import Post
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination keyed on the whole ``(created, id)`` ordering.
+
+    DRF's ``CursorPagination`` positions on the first ordering field only and
+    falls back to offsets for ties. Since ``(created, id)`` is unique, every
+    position here is exact and each page is a single index range scan
+    regardless of depth.
+    """
+
+    ordering = ('-created', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        current_position, reverse = self.start_page(queryset, request, view)
+        results = self.get_page_rows(queryset, current_position, reverse)
+        return self.finish_page(results, current_position, reverse)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        current_position, reverse = self.start_page(queryset, request, view)
+        results = await self.aget_page_rows(queryset, current_position, reverse)
+        return self.finish_page(results, current_position, reverse)
+
+    def start_page(self, queryset, request, view):
+        """
+        Reads page size and cursor of ``request``, returns ``(position, reverse)``
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+
+        self.view = view
+
+        reverse = self.cursor is not None and self.cursor.reverse
+        current_position = self.cursor.position if self.cursor else None
+        return current_position, reverse
+
+    def finish_page(self, results, current_position, reverse):
+        self.page = results[:self.page_size]
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = current_position is not None
+            self.has_previous = has_following_position
+            self.next_position = current_position
+            self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = current_position is not None
+            self.next_position = following_position
+            self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def get_page_rows(self, queryset, position, reverse, ordering=None):
+        """
+        Returns up to ``page_size + 1`` rows following ``position``
+        """
+        return list(self.get_page_queryset(queryset, position, reverse, ordering))
+
+    async def aget_page_rows(self, queryset, position, reverse, ordering=None):
+        return [row async for row in self.get_page_queryset(queryset, position, reverse, ordering)]
+
+    def get_page_queryset(self, queryset, position, reverse, ordering=None):
+        ordering = ordering or self.ordering
+        queryset = queryset.order_by(*(self.reverse_ordering(ordering) if reverse else ordering))
+        if position is not None:
+            queryset = queryset.filter(self.get_position_filter(position, reverse, ordering))
+        return queryset[:self.page_size + 1]
+
+    def reverse_ordering(self, ordering=None):
+        return tuple(
+            field[1:] if field.startswith('-') else f'-{field}'
+            for field in ordering or self.ordering
+        )
+
+    def get_position_filter(self, position, reverse, ordering=None):
+        """
+        Builds ``(created, id) < (position)`` for descending ordering.
+
+        The leading non-strict comparison on ``created`` keeps the filter
+        usable as an index range condition on backends without row values.
+        """
+        ordering = ordering or self.ordering
+        created_field, id_field = (field.lstrip('-') for field in ordering)
+        created, id_value = self.parse_position(position)
+        descending = ordering[0].startswith('-') != reverse
+        strict, loose = ('lt', 'lte') if descending else ('gt', 'gte')
+        return Q(**{f'{created_field}__{loose}': created}) & (
+            Q(**{f'{created_field}__{strict}': created}) |
+            Q(**{f'{id_field}__{strict}': id_value})
+        )
+
+    def parse_position(self, position):
+        created, _, id_value = position.rpartition('|')
+        try:
+            created = parse_datetime(created)
+            id_value = int(id_value)
+        except ValueError:
+            created = None
+        if created is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created, id_value
+
+    def _get_position_from_instance(self, instance, ordering):
+        created_field, id_field = (field.lstrip('-') for field in ordering)
+        if isinstance(instance, dict):
+            created, id_value = instance[created_field], instance[id_field]
+        else:
+            created, id_value = getattr(instance, created_field), getattr(instance, id_field)
+        return f'{created.isoformat()}|{id_value}'
+
+
+class TimelinePagination(KeysetPagination):
+    """
+    Keyset pagination over a home timeline.
+
+    A page is one range scan over the user's timeline entries merged with
+    posts of pull-mode authors the user follows, both read from the same
+    ``(created, id)`` position. The view provides the pull-mode posts with
+    ``get_pull_queryset()``.
+    """
+
+    entry_ordering = ('-created', '-post_id')
+
+    def get_page_rows(self, queryset, position, reverse, ordering=None):
+        entries = super().get_page_rows(queryset, position, reverse, self.entry_ordering)
+        pulled = super().get_page_rows(self.view.get_pull_queryset(), position, reverse)
+        posts = {post.id: post for post in pulled}
+        posts.update(Post.objects.in_bulk([entry.post_id for entry in entries]))
+        descending = self.ordering[0].startswith('-') != reverse
+        rows = sorted(posts.values(), key=lambda post: (post.created, post.id), reverse=descending)
+        return rows[:self.page_size + 1]
+
+
+class SearchPagination(PageNumberPagination):
+    """
+    Page number pagination for ranked results, which have no stable keyset
+    """
+
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
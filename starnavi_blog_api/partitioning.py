@@ -0,0 +1,306 @@
+import datetime
+import re
+from django.db.migrations.operations.base import Operation
+from django.db.models import UniqueConstraint
+from django.utils import timezone
+
+METHODS = ('hash', 'range')
+
+MONTH_PARTITION_RE = re.compile(r'_p(\d{4})_(\d{2})$')
+
+PARTITION_KEY_RE = re.compile(r'^(HASH|RANGE|LIST) \((\w+)\)$')
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def get_month(value):
+    """
+    Returns first day of the month of date or aware datetime ``value`` in UTC
+    """
+    if isinstance(value, datetime.datetime):
+        value = value.astimezone(datetime.timezone.utc).date()
+    return value.replace(day=1)
+
+
+def hash_partition_name(table, remainder):
+    return f'{table}_p{remainder}'
+
+
+def month_partition_name(table, month):
+    return f'{table}_p{month:%Y_%m}'
+
+
+def get_partition_month(name):
+    """
+    Returns month of a monthly partition from its name, None for other partitions
+    """
+    match = MONTH_PARTITION_RE.search(name)
+    return datetime.date(int(match[1]), int(match[2]), 1) if match else None
+
+
+def hash_partitions_sql(table, partitions, quote_name):
+    return [
+        f'CREATE TABLE {quote_name(hash_partition_name(table, remainder))} PARTITION OF {quote_name(table)} '
+        f'FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})'
+        for remainder in range(partitions)
+    ]
+
+
+def month_partition_sql(table, month, quote_name):
+    return (
+        f'CREATE TABLE IF NOT EXISTS {quote_name(month_partition_name(table, month))} '
+        f'PARTITION OF {quote_name(table)} '
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    )
+
+
+def get_unique_sets(model_state):
+    """
+    Returns field name sets ``model_state`` keeps unique, primary key excluded
+    """
+    unique_sets = [set(fields) for fields in model_state.options.get('unique_together', ())]
+    unique_sets.extend(
+        set(constraint.fields)
+        for constraint in model_state.options.get('constraints', [])
+        if isinstance(constraint, UniqueConstraint)
+    )
+    unique_sets.extend(
+        {name} for name, field in model_state.fields.items()
+        if field.unique and not field.primary_key
+    )
+    return unique_sets
+
+
+class PartitionTable(Operation):
+    """
+    Partitions table of ``model_name`` on PostgreSQL, by hash of ``key``
+    into ``partitions`` partitions or by month of ``key`` with partitions
+    for ``premake`` months ahead. Other databases keep the table as is.
+
+    PostgreSQL only enforces uniqueness within a partition, so every unique
+    constraint has to include ``key`` and the primary key is widened to
+    ``(pk, key)``. Primary key values still come from a sequence, so ORM
+    lookups by pk keep working. Rows are copied into the new table under
+    an exclusive lock, large tables need a maintenance window.
+    """
+
+    reversible = True
+    reduces_to_sql = False
+
+    def __init__(self, model_name, key, method='hash', partitions=8, premake=3):
+        if method not in METHODS:
+            raise ValueError(f'Unknown partitioning method {method}, use one of {", ".join(METHODS)}')
+        self.model_name = model_name
+        self.key = key
+        self.method = method
+        self.partitions = partitions
+        self.premake = premake
+
+    def state_forwards(self, app_label, state):
+        # Checked here, so a design PostgreSQL would refuse fails on every database.
+        model_state = state.models[app_label, self.model_name.lower()]
+        if self.key not in model_state.fields:
+            raise ValueError(f'{model_state.name} has no field {self.key} to partition by')
+        if self.method == 'range' and model_state.fields[self.key].null:
+            raise ValueError(f'{model_state.name}.{self.key} is nullable, rows without it fit no range')
+        for unique_set in get_unique_sets(model_state):
+            if self.key not in unique_set:
+                raise ValueError(
+                    f'{model_state.name} keeps {", ".join(sorted(unique_set))} unique, partitions can only '
+                    f'enforce uniqueness including the partition key {self.key}'
+                )
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if schema_editor.connection.vendor != 'postgresql' or not self.allow_migrate_model(
+            schema_editor.connection.alias, model
+        ):
+            return
+        table = model._meta.db_table
+        quote_name = schema_editor.quote_name
+        key_column = model._meta.get_field(self.key).column
+        if self.method == 'hash':
+            partition_by = f'HASH ({quote_name(key_column)})'
+            partitions_sql = hash_partitions_sql(table, self.partitions, quote_name)
+        else:
+            partition_by = f'RANGE ({quote_name(key_column)})'
+            with schema_editor.connection.cursor() as cursor:
+                cursor.execute(f'SELECT MIN({quote_name(key_column)}) FROM {quote_name(table)}')
+                first = cursor.fetchone()[0]
+            month = get_month(first or timezone.now())
+            last_month = add_months(get_month(timezone.now()), self.premake)
+            partitions_sql = []
+            while month <= last_month:
+                partitions_sql.append(month_partition_sql(table, month, quote_name))
+                month = add_months(month, 1)
+        primary_key = [model._meta.pk.column]
+        if key_column not in primary_key:
+            primary_key.append(key_column)
+        rebuild_table(schema_editor, model, f' PARTITION BY {partition_by}', partitions_sql, primary_key)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if schema_editor.connection.vendor != 'postgresql' or not self.allow_migrate_model(
+            schema_editor.connection.alias, model
+        ):
+            return
+        rebuild_table(schema_editor, model, '', [], [model._meta.pk.column])
+
+    def describe(self):
+        if self.method == 'hash':
+            return f'Partition {self.model_name} by hash of {self.key} into {self.partitions} partitions'
+        return f'Partition {self.model_name} by month of {self.key}'
+
+    @property
+    def migration_name_fragment(self):
+        return f'partition_{self.model_name.lower()}'
+
+
+def rebuild_table(schema_editor, model, partition_clause, partitions_sql, primary_key):
+    """
+    Moves rows of ``model`` table into a new table created with
+    ``partition_clause`` and ``partitions_sql``, then restores its sequence,
+    ``primary_key``, unique constraints, indexes and foreign keys
+    """
+    quote_name = schema_editor.quote_name
+    table = model._meta.db_table
+    old_table = f'{table}__old'
+    pk_column = model._meta.pk.column
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', [quote_name(table), pk_column])
+        sequence = cursor.fetchone()[0]
+        cursor.execute(
+            '''
+            SELECT is_identity = 'YES' FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = %s AND column_name = %s
+            ''',
+            [table, pk_column]
+        )
+        identity = cursor.fetchone()[0]
+
+    if sequence and not identity:
+        # Serial sequences are dropped together with their table, it is moved to the new one below.
+        schema_editor.execute(f'ALTER SEQUENCE {sequence} OWNED BY NONE')
+    schema_editor.execute(f'ALTER TABLE {quote_name(table)} RENAME TO {quote_name(old_table)}')
+    schema_editor.execute(
+        f'CREATE TABLE {quote_name(table)} (LIKE {quote_name(old_table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+        f'{partition_clause}'
+    )
+    for sql in partitions_sql:
+        schema_editor.execute(sql)
+    schema_editor.execute(f'INSERT INTO {quote_name(table)} SELECT * FROM {quote_name(old_table)}')
+    schema_editor.execute(f'DROP TABLE {quote_name(old_table)}')
+
+    if identity:
+        # Identity columns can't be copied onto partitioned tables, a plain sequence takes over.
+        sequence = quote_name(f'{table}_{pk_column}_seq')
+        schema_editor.execute(f'CREATE SEQUENCE {sequence}')
+        schema_editor.execute(
+            f'SELECT setval(%s, COALESCE(MAX({quote_name(pk_column)}), 0) + 1, false) FROM {quote_name(table)}',
+            [sequence]
+        )
+        schema_editor.execute(
+            f'ALTER TABLE {quote_name(table)} ALTER COLUMN {quote_name(pk_column)} '
+            f"SET DEFAULT nextval('{sequence}'::regclass)"
+        )
+    if sequence:
+        schema_editor.execute(f'ALTER SEQUENCE {sequence} OWNED BY {quote_name(table)}.{quote_name(pk_column)}')
+
+    # Indexes are built after the rows are in, which is faster than maintaining them during the copy.
+    schema_editor.execute(
+        f'ALTER TABLE {quote_name(table)} ADD PRIMARY KEY ({", ".join(quote_name(column) for column in primary_key)})'
+    )
+    for fields in model._meta.unique_together:
+        schema_editor.execute(
+            schema_editor._create_unique_sql(model, [model._meta.get_field(name) for name in fields])
+        )
+    for constraint in model._meta.constraints:
+        if isinstance(constraint, UniqueConstraint):
+            schema_editor.add_constraint(model, constraint)
+    for field in model._meta.local_concrete_fields:
+        if field.unique and not field.primary_key:
+            schema_editor.execute(schema_editor._create_unique_sql(model, [field]))
+    for sql in schema_editor._model_indexes_sql(model):
+        schema_editor.execute(sql)
+    for field in model._meta.local_concrete_fields:
+        if field.remote_field and field.db_constraint:
+            schema_editor.execute(schema_editor._create_fk_sql(model, field, '_fk_%(to_table)s_%(to_column)s'))
+
+
+def get_partitioned_tables(connection):
+    """
+    Returns ``{table: (method, key_column)}`` of partitioned tables in current schema
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            '''
+            SELECT parent.relname, pg_get_partkeydef(parent.oid)
+            FROM pg_partitioned_table partitioned
+            JOIN pg_class parent ON parent.oid = partitioned.partrelid
+            WHERE parent.relnamespace = current_schema()::regnamespace
+            '''
+        )
+        tables = {}
+        for table, key_definition in cursor.fetchall():
+            match = PARTITION_KEY_RE.match(key_definition)
+            if match:
+                tables[table] = (match[1].lower(), match[2])
+        return tables
+
+
+def get_partitions(connection, table):
+    """
+    Returns ``[(name, bound, estimated_rows, total_bytes)]`` of partitions of ``table``
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            '''
+            SELECT child.relname, pg_get_expr(child.relpartbound, child.oid),
+                GREATEST(child.reltuples, 0)::bigint, pg_total_relation_size(child.oid)
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s AND parent.relnamespace = current_schema()::regnamespace
+            ORDER BY child.relname
+            ''',
+            [table]
+        )
+        return cursor.fetchall()
+
+
+def premake_partitions(schema_editor, table, months, today=None):
+    """
+    Creates monthly partitions of ``table`` up to ``months`` months ahead
+    and returns names of the new ones
+    """
+    current_month = get_month(today or timezone.now())
+    existing = {name for name, *_ in get_partitions(schema_editor.connection, table)}
+    created = []
+    for ahead in range(months + 1):
+        month = add_months(current_month, ahead)
+        name = month_partition_name(table, month)
+        if name not in existing:
+            schema_editor.execute(month_partition_sql(table, month, schema_editor.quote_name))
+            created.append(name)
+    return created
+
+
+def drop_expired_partitions(schema_editor, table, retention_months, today=None, dry_run=False):
+    """
+    Drops monthly partitions of ``table`` holding only rows older than
+    ``retention_months`` full months and returns their names
+    """
+    cutoff = add_months(get_month(today or timezone.now()), -retention_months)
+    expired = [
+        name for name, *_ in get_partitions(schema_editor.connection, table)
+        if get_partition_month(name) is not None and get_partition_month(name) < cutoff
+    ]
+    if not dry_run:
+        quote_name = schema_editor.quote_name
+        for name in expired:
+            schema_editor.execute(f'ALTER TABLE {quote_name(table)} DETACH PARTITION {quote_name(name)}')
+            schema_editor.execute(f'DROP TABLE {quote_name(name)}')
+    return expired
@@ -0,0 +1,248 @@
+import logging
+import os
+import re
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from rest_framework.fields import Field
+from rest_framework.serializers import ListSerializer
+from starnavi_blog_api import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': False,
+    'STRICT': False,
+    'MAX_QUERIES': None,
+    'REPEAT_THRESHOLD': 5,
+    'SLOW_QUERY_MS': 100,
+}
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+LIST_RE = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)')
+VALUES_RE = re.compile(r'(VALUES\s*\(\.\.\.\))(?:\s*,\s*\(\.\.\.\))+', re.IGNORECASE)
+
+# Query wrappers are never where a query comes from.
+WRAPPER_FILES = {
+    os.path.abspath(__file__),
+    os.path.abspath(metrics.__file__),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark.py'),
+}
+
+_inspectors = ContextVar('query_inspectors', default=())
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, 'QUERY_INSPECTOR', {})}
+
+
+class QueryBudgetExceeded(Exception):
+    """
+    Raised in strict mode when a request breaks its query budget
+    """
+
+
+def get_query_shape(sql):
+    """
+    Returns ``sql`` with literals and placeholder lists collapsed, so that
+    queries differing only in parameters share a shape
+    """
+    shape = STRING_RE.sub('?', sql)
+    shape = NUMBER_RE.sub('?', shape)
+    shape = LIST_RE.sub('(...)', shape)
+    shape = VALUES_RE.sub(r'\1', shape)
+    return ' '.join(shape.split())
+
+
+class QueryRecord:
+
+    def __init__(self, sql, duration, location, field):
+        self.sql = sql
+        self.shape = get_query_shape(sql)
+        self.duration = duration
+        self.location = location
+        self.field = field
+
+
+class QueryInspector:
+    """
+    Collects queries with the code location and serializer field that
+    issued them. Activated with ``inspect_queries``.
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def get_repeated(self, threshold):
+        """
+        Returns ``{shape: [queries]}`` of shapes issued ``threshold`` times or more
+        """
+        shapes = defaultdict(list)
+        for query in self.queries:
+            shapes[query.shape].append(query)
+        return {shape: queries for shape, queries in shapes.items() if len(queries) >= threshold}
+
+    def get_slow(self, slow_query_ms):
+        return [query for query in self.queries if query.duration * 1000 >= slow_query_ms]
+
+    def get_problems(self, max_queries=None, repeat_threshold=None, slow_query_ms=None):
+        """
+        Returns human readable descriptions of broken limits
+        """
+        problems = []
+        if max_queries is not None and len(self.queries) > max_queries:
+            problems.append(f'{len(self.queries)} queries, budget is {max_queries}')
+        if repeat_threshold is not None:
+            for shape, queries in self.get_repeated(repeat_threshold).items():
+                origins = sorted({_describe_origin(query) for query in queries})
+                problems.append(f'{len(queries)} similar queries from {", ".join(origins)}: {shape}')
+        if slow_query_ms is not None:
+            for query in self.get_slow(slow_query_ms):
+                problems.append(f'slow query ({query.duration * 1000:.1f}ms) from {_describe_origin(query)}: {query.sql}')
+        return problems
+
+
+def _find_origin(frame):
+    """
+    Returns innermost project code location and serializer field of ``frame``
+    """
+    location = field = None
+    root = os.path.abspath(settings.BASE_DIR) + os.sep
+    while frame is not None and (location is None or field is None):
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if location is None and filename.startswith(root) and filename not in WRAPPER_FILES and 'site-packages' not in filename:
+            location = f'{os.path.relpath(filename, root)}:{frame.f_lineno} in {frame.f_code.co_name}'
+        if field is None:
+            owner = frame.f_locals.get('self')
+            # type() rather than isinstance(), which would resolve lazy objects like request.user.
+            owner_type = type(owner)
+            if (
+                issubclass(owner_type, Field) and not issubclass(owner_type, ListSerializer) and
+                owner.field_name and owner.parent is not None
+            ):
+                parent = owner.parent.child if isinstance(owner.parent, ListSerializer) else owner.parent
+                field = f'{type(parent).__name__}.{owner.field_name}'
+        frame = frame.f_back
+    return location, field
+
+
+def _describe_origin(query):
+    origin = query.location or 'unknown location'
+    if query.field:
+        origin = f'{query.field} at {origin}'
+    return origin
+
+
+def inspect_query(execute, sql, params, many, context):
+    inspectors = _inspectors.get()
+    if not inspectors:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        location, field = _find_origin(sys._getframe(1))
+        record = QueryRecord(sql, duration, location, field)
+        for inspector in inspectors:
+            inspector.queries.append(record)
+
+
+@receiver(connection_created)
+def install_query_inspector(connection, **kwargs):
+    """
+    Wraps ``connection`` for the inspectors active in context, so queries
+    async views run in worker threads are inspected too
+    """
+    if inspect_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(inspect_query)
+
+
+@contextmanager
+def inspect_queries():
+    """
+    Records queries of every database made inside the block
+    """
+    # Connections opened before this module was imported missed the signal.
+    for connection in connections.all(initialized_only=True):
+        install_query_inspector(connection)
+    inspector = QueryInspector()
+    token = _inspectors.set((*_inspectors.get(), inspector))
+    try:
+        yield inspector
+    finally:
+        _inspectors.reset(token)
+
+
+class QueryInspectorMiddleware:
+    """
+    Logs query budget breaks, N+1 query patterns and slow queries of every
+    request when ``QUERY_INSPECTOR['ENABLED']``. In strict mode budget
+    breaks and N+1 patterns raise ``QueryBudgetExceeded`` instead, failing
+    the request in development and the test in CI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        options = get_options()
+        if not options['ENABLED']:
+            return self.get_response(request)
+        with inspect_queries() as inspector:
+            response = self.get_response(request)
+        self.report(request, inspector, options)
+        return response
+
+    async def __acall__(self, request):
+        options = get_options()
+        if not options['ENABLED']:
+            return await self.get_response(request)
+        with inspect_queries() as inspector:
+            response = await self.get_response(request)
+        self.report(request, inspector, options)
+        return response
+
+    def report(self, request, inspector, options):
+        match = getattr(request, 'resolver_match', None)
+        view = f'{request.method} {match.view_name if match else request.path}'
+        problems = inspector.get_problems(options['MAX_QUERIES'], options['REPEAT_THRESHOLD'])
+        if problems:
+            report = f'{view}: ' + '; '.join(problems)
+            if options['STRICT']:
+                raise QueryBudgetExceeded(report)
+            logger.warning(report)
+        # Timings are too noisy to fail on, slow queries are only logged.
+        for problem in inspector.get_problems(slow_query_ms=options['SLOW_QUERY_MS']):
+            logger.warning('%s: %s', view, problem)
+
+
+class QueryBudgetMixin:
+    """
+    Test case mixin checking queries of a block against a budget
+    """
+
+    @contextmanager
+    def assertQueryBudget(self, max_queries=None, repeat_threshold=None, slow_query_ms=None):
+        if repeat_threshold is None:
+            repeat_threshold = get_options()['REPEAT_THRESHOLD']
+        with inspect_queries() as inspector:
+            yield inspector
+        problems = inspector.get_problems(max_queries, repeat_threshold, slow_query_ms)
+        if problems:
+            self.fail('Query budget exceeded:\n' + '\n'.join(problems))
@@ -0,0 +1,38 @@
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    ``JSONRenderer`` encoding with orjson when it is installed.
+
+    With DRF's default compact, unicode and strict JSON settings output is
+    the same as of the stock renderer: non-ASCII text is written as is,
+    U+2028 and U+2029 are escaped and datetimes go through DRF encoder.
+    Indented output, other settings, a missing orjson and values orjson
+    refuses, like integers beyond 64 bits, fall back to the stock renderer.
+
+    orjson writes floats without an exponent sign and NaN as null, so the
+    renderer is only meant for payloads without floats, like posts.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if orjson is None or indent is not None or self.ensure_ascii or not self.compact or not self.strict:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME
+            )
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same strict javascript subset as the stock renderer.
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
@@ -0,0 +1,175 @@
+import random
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.functional import LazyObject, empty
+
+DEFAULTS = {
+    'WEIGHTS': {},
+    'STICKY_TIMEOUT': 5,
+    'CACHE_ALIAS': 'default',
+}
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_current = ContextVar('replica_routing', default=None)
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, 'READ_REPLICAS', {})}
+
+
+def sticky_key(user_id):
+    return f'db:primary:{user_id}'
+
+
+class RoutingState:
+    """
+    Database choice of a single request. Reads use ``replica`` unless
+    request is pinned to ``primary``.
+    """
+
+    def __init__(self, primary):
+        self.primary = primary
+        self.replica = None
+
+
+def use_primary():
+    """
+    Sends the rest of current request's reads to primary
+    """
+    state = _current.get()
+    if state is not None:
+        state.primary = True
+
+
+def is_pinned():
+    """
+    Returns True if current request reads primary while others read replicas.
+    Pages shared between users may come from a lagging replica, such
+    requests must not be served from them.
+    """
+    state = _current.get()
+    return state is not None and state.primary and bool(get_options()['WEIGHTS'])
+
+
+def note_user(user_id):
+    """
+    Pins current request to primary if the user wrote within ``STICKY_TIMEOUT``
+    """
+    state = _current.get()
+    if state is None or state.primary or not get_options()['WEIGHTS']:
+        return
+    if caches[get_options()['CACHE_ALIAS']].get(sticky_key(user_id)):
+        state.primary = True
+
+
+async def anote_user(user_id):
+    state = _current.get()
+    if state is None or state.primary or not get_options()['WEIGHTS']:
+        return
+    if await caches[get_options()['CACHE_ALIAS']].aget(sticky_key(user_id)):
+        state.primary = True
+
+
+def mark_writer(user_id):
+    options = get_options()
+    if options['WEIGHTS']:
+        caches[options['CACHE_ALIAS']].set(sticky_key(user_id), 1, options['STICKY_TIMEOUT'])
+
+
+async def amark_writer(user_id):
+    options = get_options()
+    if options['WEIGHTS']:
+        await caches[options['CACHE_ALIAS']].aset(sticky_key(user_id), 1, options['STICKY_TIMEOUT'])
+
+
+class ReplicaRouter:
+    """
+    Sends reads of safe requests to replicas from ``READ_REPLICAS['WEIGHTS']``,
+    picked once per request by weight. Everything else, including reads
+    outside requests, inside transactions and of users, stays on primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _current.get()
+        weights = get_options()['WEIGHTS']
+        if state is None or state.primary or not weights or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        # Users are read once per worker cache miss, a lagging replica would reject fresh sign ups.
+        if model._meta.label == settings.AUTH_USER_MODEL:
+            return DEFAULT_DB_ALIAS
+        if state.replica is None:
+            state.replica = random.choices(list(weights), weights=list(weights.values()))[0]
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        # Explicit, so saving an instance read from a replica doesn't write there.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_options()['WEIGHTS']}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lets reads of safe requests go to replicas and keeps users on primary
+    for ``STICKY_TIMEOUT`` seconds after their writes, so they read their
+    own likes and posts.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        writes = request.method not in SAFE_METHODS
+        token = _current.set(RoutingState(primary=writes))
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        if writes and response.status_code < 400:
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                mark_writer(user.pk)
+        return response
+
+    async def __acall__(self, request):
+        writes = request.method not in SAFE_METHODS
+        token = _current.set(RoutingState(primary=writes))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        if writes and response.status_code < 400 and get_options()['WEIGHTS']:
+            user = await aget_request_user(request)
+            if user is not None:
+                await amark_writer(user.pk)
+        return response
+
+
+async def aget_request_user(request):
+    """
+    Returns authenticated user of ``request`` or None, from async code.
+
+    API views set the user they authenticated. Otherwise it is the lazy
+    session user, which may need a query to resolve.
+    """
+    user = getattr(request, 'user', None)
+    if user is None:
+        return None
+    if isinstance(user, LazyObject) and user._wrapped is empty:
+        user = await request.auser()
+    return user if user.is_authenticated else None
@@ -0,0 +1,94 @@
+import re
+from collections import Counter
+from django.db import connections, router
+from django.db.models import BooleanField, Count, FloatField, OuterRef, Subquery, Sum
+from django.db.models.expressions import RawSQL
+from starnavi_blog_api.bulk import insert_rows
+from starnavi_blog_api.models import Post, PostSearchTerm
+
+# Text search configuration of posts.search_vector, see migration 0015.
+SEARCH_CONFIG = 'english'
+
+TITLE_WEIGHT = 4
+
+CONTENT_WEIGHT = 1
+
+STOP_WORDS = frozenset((
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'for', 'if', 'in',
+    'into', 'is', 'it', 'no', 'not', 'of', 'on', 'or', 'such', 'that', 'the',
+    'their', 'then', 'there', 'these', 'they', 'this', 'to', 'was', 'will', 'with',
+))
+
+WORD_RE = re.compile(r'\w+')
+
+MAX_TERM_LENGTH = 64
+
+
+def tokenize(text):
+    return [
+        word for word in WORD_RE.findall(text.lower())
+        if word not in STOP_WORDS and len(word) <= MAX_TERM_LENGTH
+    ]
+
+
+def uses_search_vector(using):
+    return connections[using].vendor == 'postgresql'
+
+
+def index_posts(posts, using=None):
+    """
+    Rebuilds fallback search terms of ``posts``.
+
+    PostgreSQL keeps ``posts.search_vector`` up to date with a trigger, so
+    this only writes on other backends.
+    """
+    using = using or router.db_for_write(Post)
+    posts = [post for post in posts if post.pk is not None]
+    if not posts or uses_search_vector(using):
+        return
+    PostSearchTerm.objects.using(using).filter(post__in=[post.pk for post in posts]).delete()
+    insert_rows(
+        PostSearchTerm,
+        ('post_id', 'term', 'weight'),
+        [
+            (post.pk, term, weight)
+            for post in posts
+            for term, weight in get_term_weights(post.title, post.content).items()
+        ],
+        using
+    )
+
+
+def get_term_weights(title, content):
+    weights = Counter()
+    for word in tokenize(title):
+        weights[word] += TITLE_WEIGHT
+    for word in tokenize(content):
+        weights[word] += CONTENT_WEIGHT
+    return weights
+
+
+def search_posts(query, using=None):
+    """
+    Returns posts matching every word of ``query``, best ranked first
+    """
+    using = using or router.db_for_read(Post)
+    posts = Post.objects.using(using)
+    if uses_search_vector(using):
+        table = connections[using].ops.quote_name(Post._meta.db_table)
+        ts_query = 'plainto_tsquery(%s, %s)'
+        return posts.annotate(
+            matched=RawSQL(f'{table}.search_vector @@ {ts_query}', (SEARCH_CONFIG, query), BooleanField()),
+            rank=RawSQL(f'ts_rank_cd({table}.search_vector, {ts_query})', (SEARCH_CONFIG, query), FloatField()),
+        ).filter(matched=True).order_by('-rank', '-id')
+
+    words = set(tokenize(query))
+    if not words:
+        return posts.none()
+    terms = PostSearchTerm.objects.using(using).filter(term__in=words)
+    # Only posts holding every word match, like with plainto_tsquery.
+    matches = terms.values('post').annotate(matched=Count('term')).filter(matched=len(words))
+    rank = terms.filter(post=OuterRef('pk')).values('post').annotate(rank=Sum('weight')).values('rank')
+    return posts.filter(id__in=matches.values('post')).annotate(
+        rank=Subquery(rank, output_field=FloatField())
+    ).order_by('-rank', '-id')
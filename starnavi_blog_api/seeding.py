@@ -0,0 +1,155 @@
+import random
+from collections import Counter
+from itertools import accumulate
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connections, router, transaction
+from django.db.models import Count, F, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from starnavi_blog_api import cache as feed_cache
+from starnavi_blog_api import search
+from starnavi_blog_api.bulk import chunked, insert_objects, insert_rows
+from starnavi_blog_api.models import DailyLikes, Post, PostLikes, TrendingState
+from starnavi_blog_api.trending import trending_posts
+
+USERNAME_PREFIX = 'seed_user_'
+
+PASSWORD = 'seed-password'
+
+LIKE_COLUMNS = ('user_id', 'post_id', 'created')
+
+WORDS = (
+    'api', 'async', 'benchmark', 'blog', 'cache', 'cluster', 'data', 'database',
+    'deploy', 'django', 'feed', 'index', 'latency', 'like', 'memory', 'network',
+    'post', 'python', 'query', 'queue', 'release', 'replica', 'schema', 'search',
+    'server', 'shard', 'storage', 'stream', 'test', 'timeline', 'trending', 'user',
+)
+
+
+class ZipfSampler:
+    """
+    Draws indexes ``0..size - 1`` where index ``k`` is ``(k + 1) ** exponent``
+    times less likely than index 0
+    """
+
+    def __init__(self, size, exponent, rng):
+        self.population = range(size)
+        self.cum_weights = list(accumulate(1 / rank ** exponent for rank in range(1, size + 1)))
+        self.rng = rng
+
+    def sample(self, count):
+        return self.rng.choices(self.population, cum_weights=self.cum_weights, k=count)
+
+
+def make_text(rng, words):
+    return ' '.join(rng.choices(WORDS, k=words))
+
+
+def seed_blog(
+    users=1000,
+    posts=10000,
+    likes=100000,
+    exponent=1.1,
+    random_seed=0,
+    batch_size=10000,
+    username_prefix=USERNAME_PREFIX,
+    password=PASSWORD
+):
+    """
+    Adds ``users`` users, ``posts`` posts and ``likes`` likes and returns
+    ids of new users and new posts.
+
+    Authors and liked posts follow Zipf's law with ``exponent``, likers are
+    uniform. Every user signs in with ``password``, it is hashed once. The
+    same ``random_seed`` generates the same data. Rows are written with
+    ``COPY`` on PostgreSQL, likes counts, daily rollups and trending scores
+    of new posts are then set with a few set-based updates.
+    """
+    if posts and not users:
+        raise ValueError('Posts need at least one user to author them')
+    if likes > users * posts:
+        raise ValueError(f'{users} users can not like {posts} posts {likes} times')
+    rng = random.Random(random_seed)
+    password_hash = make_password(password)
+    first_number = User.objects.filter(username__startswith=username_prefix).count()
+    last_user_id = User.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+    last_post_id = Post.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+
+    with transaction.atomic():
+        for batch in chunked(range(first_number, first_number + users), batch_size):
+            insert_objects(User, [
+                User(username=f'{username_prefix}{number}', password=password_hash)
+                for number in batch
+            ])
+        user_ids = list(
+            User.objects.filter(pk__gt=last_user_id, username__startswith=username_prefix)
+            .order_by('pk').values_list('pk', flat=True)
+        )
+
+        authors = ZipfSampler(len(user_ids), exponent, rng)
+        for batch in chunked(range(posts), batch_size):
+            search.index_posts(insert_objects(Post, [
+                Post(
+                    title=make_text(rng, rng.randint(2, 8)).capitalize(),
+                    content=make_text(rng, rng.randint(20, 80)),
+                    user_id=user_ids[author]
+                )
+                for author in authors.sample(len(batch))
+            ]))
+        seeded_posts = Post.objects.filter(pk__gt=last_post_id)
+        post_ids = list(seeded_posts.order_by('pk').values_list('pk', flat=True))
+
+        liked_at = timezone.now()
+        shards = seed_likes(rng, user_ids, post_ids, likes, exponent, liked_at, batch_size)
+
+        liked_posts = PostLikes.objects.filter(post=OuterRef('pk')).order_by().values('post')
+        seeded_posts.update(likes_count=Coalesce(
+            Subquery(liked_posts.annotate(total=Count('pk')).values('total')),
+            0
+        ))
+        today = timezone.localdate()
+        for shard, count in shards.items():
+            DailyLikes.objects.add(today, shard, likes=count)
+        weight = TrendingState.objects.weight(liked_at, TrendingState.objects.get_epoch())
+        seeded_posts.filter(likes_count__gt=0).update(trending_score=F('likes_count') * weight)
+
+    feed_cache.invalidate_feed()
+    trending_posts.clear()
+    return user_ids, post_ids
+
+
+def seed_likes(rng, user_ids, post_ids, likes, exponent, liked_at, batch_size):
+    """
+    Writes ``likes`` distinct likes made at ``liked_at`` and returns their
+    number per rollup shard
+    """
+    # Popularity ranks are shuffled so that the most liked posts aren't the oldest.
+    ranked_post_ids = post_ids[:]
+    rng.shuffle(ranked_post_ids)
+    liked_posts = ZipfSampler(len(ranked_post_ids), exponent, rng)
+    # Likes are kept as single ints, pairs of a million likes would take too much memory.
+    key_base = max(post_ids) + 1
+    seen = set()
+    shards = Counter()
+    connection = connections[router.db_for_write(PostLikes)]
+    created = connection.ops.adapt_datetimefield_value(liked_at)
+    pending = []
+    while len(seen) < likes:
+        for rank in liked_posts.sample(likes - len(seen)):
+            user_id = rng.choice(user_ids)
+            post_id = ranked_post_ids[rank]
+            if user_id * key_base + post_id in seen:
+                # Popular posts run out of likers, the draw moves to any post instead.
+                post_id = rng.choice(post_ids)
+                if user_id * key_base + post_id in seen:
+                    continue
+            seen.add(user_id * key_base + post_id)
+            shards[DailyLikes.objects.shard_for(user_id)] += 1
+            pending.append((user_id, post_id, created))
+            if len(pending) >= batch_size:
+                insert_rows(PostLikes, LIKE_COLUMNS, pending)
+                pending = []
+    if pending:
+        insert_rows(PostLikes, LIKE_COLUMNS, pending)
+    return shards
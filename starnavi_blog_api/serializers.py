@@ -1,13 +1,19 @@
-import requests
-from django.contrib.auth.models import User
 from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
 from rest_framework.validators import UniqueValidator
 from rest_framework.exceptions import ValidationError
-from rest_framework import serializers
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from rest_framework.utils.serializer_helpers import ReturnList
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from starnavi_blog_api import activity, email_verification
+from starnavi_blog_api.metrics import TimedSerializerMixin, timed
 from starnavi_blog_api.models import Post, PostLikes
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
 
     email = serializers.EmailField(
         required=True,
@@ -32,12 +38,20 @@ class UserSerializer(serializers.ModelSerializer):
             validated_data['email'],
             validated_data['password']
         )
+        if email_verification.get_options()['ASYNC']:
+            transaction.on_commit(
+                lambda: email_verification.verify_user_in_background(user.pk)
+            )
         return user
 
     def validate(self, attrs):
-        url = settings.EMAIL_TO_FIND_URL.format(attrs['email'])
-        request = requests.get(url).json()
-        if request['data']['gibberish'] or not request['data']['webmail']:
+        if email_verification.get_options()['ASYNC']:
+            return attrs
+        try:
+            email_valid = email_verification.get_email_verifier().verify(attrs['email'])
+        except email_verification.EmailVerificationUnavailable:
+            raise ValidationError('Email can not be verified right now, try again later')
+        if not email_valid:
             raise ValidationError('Email is not valid or it does not exist')
         return attrs
 
@@ -51,11 +65,22 @@ class UserSerializer(serializers.ModelSerializer):
         )
 
 
-class PostModelSerializer(serializers.ModelSerializer):
-    likes = serializers.SerializerMethodField()
+class SignInSerializer(TimedSerializerMixin, TokenObtainPairSerializer):
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        activity.buffer.record(self.user.pk, last_login=timezone.now())
+        return data
+
+
+class UserActivitySerializer(TimedSerializerMixin, serializers.Serializer):
+    user = serializers.IntegerField()
+    last_login = serializers.DateTimeField(allow_null=True)
+    last_request = serializers.DateTimeField(allow_null=True)
+
 
-    def get_likes(self, obj):
-        return obj.get_likes_count()
+class PostModelSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    likes = serializers.IntegerField(source='likes_count', read_only=True)
 
     class Meta:
         model = Post
@@ -69,7 +94,57 @@ class PostModelSerializer(serializers.ModelSerializer):
         )
 
 
-class PostLikesModelSerializer(serializers.ModelSerializer):
+def get_datetime_formatter():
+    """
+    Returns function formatting aware datetimes like DRF ``DateTimeField``,
+    with output format and time zone looked up once
+    """
+    field = serializers.DateTimeField()
+    if not settings.USE_TZ or api_settings.DATETIME_FORMAT is None or api_settings.DATETIME_FORMAT.lower() != ISO_8601:
+        return field.to_representation
+    current_timezone = timezone.get_current_timezone()
+
+    def format_datetime(value):
+        if value is None:
+            return None
+        value = value.astimezone(current_timezone).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+    return format_datetime
+
+
+class PostValuesSerializer:
+    """
+    Read-only fast path of ``PostModelSerializer`` for lists.
+
+    Takes rows of ``Post.objects.values(*PostValuesSerializer.values_fields)``
+    and builds the same dicts the model serializer would, in the same key
+    order, without running a field per value.
+    """
+
+    values_fields = ('id', 'title', 'content', 'user_id', 'likes_count', 'created')
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    @property
+    def data(self):
+        with timed('serializer'):
+            format_datetime = get_datetime_formatter()
+            return ReturnList([
+                {
+                    'id': row['id'],
+                    'title': row['title'],
+                    'content': row['content'],
+                    'user': row['user_id'],
+                    'likes': row['likes_count'],
+                    'created': format_datetime(row['created']),
+                }
+                for row in self.rows
+            ], serializer=self)
+
+
+class PostLikesModelSerializer(TimedSerializerMixin, serializers.ModelSerializer):
 
     class Meta:
         model = PostLikes
@@ -77,3 +152,51 @@ class PostLikesModelSerializer(serializers.ModelSerializer):
             'id',
             'post',
         )
+
+
+class PostLikeToggleSerializer(TimedSerializerMixin, serializers.Serializer):
+    post = serializers.IntegerField()
+
+
+class PostLikeOperationSerializer(TimedSerializerMixin, serializers.Serializer):
+    # Bounded to the primary key column, larger ids can't even be looked up.
+    post = serializers.IntegerField(min_value=1, max_value=2 ** 31 - 1)
+    action = serializers.ChoiceField(choices=('like', 'unlike'))
+
+
+class PostLikesBulkSerializer(TimedSerializerMixin, serializers.Serializer):
+    operations = serializers.ListField(
+        child=PostLikeOperationSerializer(),
+        allow_empty=False,
+        max_length=settings.LIKES_BULK_MAX_OPERATIONS
+    )
+
+
+class PostSearchQuerySerializer(TimedSerializerMixin, serializers.Serializer):
+    q = serializers.CharField(max_length=200)
+
+
+class TrendingQuerySerializer(TimedSerializerMixin, serializers.Serializer):
+    limit = serializers.IntegerField(min_value=1, required=False)
+
+    def validate_limit(self, value):
+        if value > settings.TRENDING_CACHE_SIZE:
+            raise ValidationError(f'Ensure this value is less than or equal to {settings.TRENDING_CACHE_SIZE}.')
+        return value
+
+    def validate(self, attrs):
+        attrs.setdefault('limit', min(20, settings.TRENDING_CACHE_SIZE))
+        return attrs
+
+
+class LikesAnalyticsQuerySerializer(TimedSerializerMixin, serializers.Serializer):
+    date_from = serializers.DateField()
+    date_to = serializers.DateField()
+
+    def validate(self, attrs):
+        days = (attrs['date_to'] - attrs['date_from']).days + 1
+        if days < 1:
+            raise ValidationError('date_from must not be later than date_to')
+        if days > settings.LIKES_ANALYTICS_MAX_DAYS:
+            raise ValidationError(f'Date range can not be longer than {settings.LIKES_ANALYTICS_MAX_DAYS} days')
+        return attrs
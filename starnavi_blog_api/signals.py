@@ -0,0 +1,33 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.settings import api_settings
+from starnavi_blog_api import cache, search
+from starnavi_blog_api.authentication import user_cache
+from starnavi_blog_api.models import Post
+from starnavi_blog_api.trending import trending_posts
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_feed_on_post_change(sender, **kwargs):
+    transaction.on_commit(cache.invalidate_feed)
+
+
+@receiver(post_save, sender=Post)
+def index_post_on_save(sender, instance, update_fields=None, using=None, **kwargs):
+    if update_fields is None or {'title', 'content'} & set(update_fields):
+        search.index_posts([instance], using)
+
+
+@receiver(post_delete, sender=Post)
+def discard_trending_post(sender, instance, **kwargs):
+    trending_posts.discard(instance.pk)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def evict_cached_user(sender, instance, **kwargs):
+    # Deactivation and password change both go through save.
+    user_cache.evict(str(getattr(instance, api_settings.USER_ID_FIELD)))
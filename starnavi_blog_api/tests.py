@@ -1,14 +1,113 @@
+import contextvars
+import datetime
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock, skipUnless
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from urllib.parse import parse_qs, urlparse
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.apps import apps
+from django.db import IntegrityError, connection, transaction
+from django.db.migrations.state import ProjectState
+from django.db.models import F, Sum
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
 from rest_framework.test import APITestCase, APIRequestFactory
+from rest_framework import serializers as drf_serializers
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.request import Request
-from .models import Post, PostLikes
-from starnavi_blog_api import serializers
+from .models import (
+    DailyLikes, Follow, LikeIntent, Post, PostLikes, PostSearchTerm, TimelineEntry, TrendingState, UserActivity
+)
+from starnavi_blog_api import cache as feed_cache
+from starnavi_blog_api import (
+    activity, benchmark, email_verification, metrics, partitioning, profiling, renderers, routers, seeding,
+    serializers, write_behind
+)
+from starnavi_blog_api.authentication import user_cache
+from starnavi_blog_api.trending import trending_posts
 
 
 FACTORY = APIRequestFactory()
 
 
+class EmailVerifierStubHandler(BaseHTTPRequestHandler):
+    """
+    Answers like hunter.io email verifier: gmail.com is the only webmail
+    domain, emails from GIBBERISH_EMAILS are gibberish, "slow" emails time
+    out and "broken" emails fail with server error
+    """
+
+    GIBBERISH_EMAILS = {'qwe123wewwsdasdawdwdx@gmail.com', 'gibberish@gmail.com'}
+
+    def do_GET(self):
+        email = parse_qs(urlparse(self.path).query)['email'][0]
+        self.server.requested_emails.append(email)
+        if email.startswith('slow'):
+            time.sleep(0.5)
+        if email.startswith('broken'):
+            self.send_response(500)
+            self.end_headers()
+            return
+        body = json.dumps({
+            'data': {
+                'gibberish': email in self.GIBBERISH_EMAILS,
+                'webmail': email.endswith('@gmail.com')
+            }
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class EmailVerifierStubMixin:
+    """
+    Runs local email verifier stub server and points sign up to it
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.email_server = ThreadingHTTPServer(('127.0.0.1', 0), EmailVerifierStubHandler)
+        cls.email_server.requested_emails = []
+        threading.Thread(target=cls.email_server.serve_forever, daemon=True).start()
+        port = cls.email_server.server_address[1]
+        cls.email_settings = override_settings(
+            EMAIL_TO_FIND_URL=f'http://127.0.0.1:{port}/v2/email-verifier?email={{}}&api_key=test'
+        )
+        cls.email_settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.email_settings.disable()
+        cls.email_server.shutdown()
+        cls.email_server.server_close()
+
+    def setUp(self):
+        cache.clear()
+        email_verification.reset_email_verifier('EMAIL_VERIFICATION')
+        self.email_server.requested_emails.clear()
+        super().setUp()
+
+
 class PostCreateTestCase(APITestCase):
 
     """
@@ -62,6 +161,20 @@ class PostCreateTestCase(APITestCase):
             post_data_to_create['title']
         )
 
+    def test_user_can_create_many_posts(self):
+        """
+        Checks that author can create posts after the first one
+        """
+        for number in range(2):
+            response = self.client.post(
+                self.url,
+                data={'title': f'Title {number}', 'content': 'Content'},
+                format='json',
+                HTTP_AUTHORIZATION=f'Bearer {self.auth_token}'
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.user.posts.count(), 2)
+
     def test_post_cant_create_not_authorized(self):
 
         """
@@ -111,6 +224,7 @@ class PostCanGetListAPITestCase(APITestCase):
         """
         Set ups test case with user, authentication and Post object
         """
+        cache.clear()
         self.user = User.objects.create_user(
             'test_case_user',
             'test_case_email@example.com',
@@ -144,11 +258,11 @@ class PostCanGetListAPITestCase(APITestCase):
         )
 
         serialized_post = serializers.PostModelSerializer(
-            Post.objects.all(),
+            Post.objects.order_by('-created', '-id'),
             many=True,
             context={'request': self.request}
         )
-        self.assertEqual(response.data, serialized_post.data)
+        self.assertEqual(response.data['results'], serialized_post.data)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
     def test_post_cant_get_not_authorized(self):
@@ -165,12 +279,13 @@ class PostCanGetListAPITestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-class UserCanSignUpAPITestCase(APITestCase):
+class UserCanSignUpAPITestCase(EmailVerifierStubMixin, APITestCase):
     """
     Checks that user can sign up
     """
 
     def setUp(self):
+        super().setUp()
         self.existing_username_user = User.objects.create_user(
             username='test_case_existing_username',
             email='email1@example.com',
@@ -388,6 +503,7 @@ class PostLikesAPITestCase(APITestCase):
             post=self.post,
             user=self.user
         )
+        Post.objects.filter(pk=self.post.pk).update(likes_count=1)
 
         post_to_like = {
             'post': self.post.id
@@ -461,3 +577,2686 @@ class PostLikesAPITestCase(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+
+class PostLikesCountTestCase(APITestCase):
+    """
+    Checks denormalized likes counter maintenance
+    """
+
+    def setUp(self):
+        """
+        Set ups users, authentication and post object
+        """
+        self.user = User.objects.create_user(
+            username='test_case_user',
+            email='test@case.email',
+            password='test_case_password'
+        )
+        self.other_user = User.objects.create_user(
+            username='test_case_other_user',
+            email='other@case.email',
+            password='test_case_password'
+        )
+        login_response = self.client.post(
+            '/sign-in/',
+            data={
+                'username': self.user.username,
+                'password': 'test_case_password'
+            },
+            format='json'
+        )
+        self.auth_token = login_response.data['access']
+        self.post = Post.objects.create(
+            title='Test Case Post Title',
+            content='Test Case Post Content'
+        )
+
+    def test_like_and_unlike_update_counter(self):
+        """
+        Checks that like toggle keeps likes_count in sync with likes table
+        """
+
+        for expected_count in (1, 0, 1):
+            response = self.client.post(
+                '/api/v1/posts/like/',
+                data={'post': self.post.id},
+                format='json',
+                HTTP_AUTHORIZATION=f'Bearer {self.auth_token}'
+            )
+            self.assertEqual(response.data['likes'], expected_count)
+            self.assertEqual(
+                Post.objects.get(pk=self.post.pk).likes_count,
+                PostLikes.objects.filter(post=self.post).count()
+            )
+
+    def test_rebuild_likes_count_fixes_drift(self):
+        """
+        Checks that management command recalculates drifted counters
+        """
+
+        PostLikes.objects.create(post=self.post, user=self.user)
+        PostLikes.objects.create(post=self.post, user=self.other_user)
+        empty_post = Post.objects.create(title='Empty', content='Empty')
+        Post.objects.filter(pk=empty_post.pk).update(likes_count=5)
+
+        call_command('rebuild_likes_count', batch_size=1, stdout=StringIO())
+
+        self.assertEqual(Post.objects.get(pk=self.post.pk).likes_count, 2)
+        self.assertEqual(Post.objects.get(pk=empty_post.pk).likes_count, 0)
+
+
+@override_settings(POSTS_FEED_CACHE={'ENABLED': False})
+class PostListQueryCountTestCase(APITestCase):
+    """
+    Checks that post list is built with a constant number of queries
+    """
+
+    def setUp(self):
+        """
+        Set ups user and authentication
+        """
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='test_case_user',
+            email='test@case.email',
+            password='test_case_password'
+        )
+        login_response = self.client.post(
+            '/sign-in/',
+            data={
+                'username': self.user.username,
+                'password': 'test_case_password'
+            },
+            format='json'
+        )
+        self.auth_token = login_response.data['access']
+        self.url = '/api/v1/posts/'
+
+    def create_posts(self, count):
+        users = [
+            User.objects.create_user(f'author_{Post.objects.count()}_{i}')
+            for i in range(count)
+        ]
+        for author in users:
+            post = Post.objects.create(title='Title', content='Content', user=author)
+            PostLikes.objects.create(post=post, user=self.user)
+
+    def count_list_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(
+                self.url,
+                HTTP_AUTHORIZATION=f'Bearer {self.auth_token}'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries)
+
+    def test_post_list_query_count_does_not_grow(self):
+        """
+        Checks that list endpoint issues no per-post queries
+        """
+
+        # Warm up cached authentication so both counts cover the same queries.
+        self.count_list_queries()
+        self.create_posts(2)
+        queries_for_few_posts = self.count_list_queries()
+        self.create_posts(8)
+        queries_for_more_posts = self.count_list_queries()
+
+        self.assertEqual(queries_for_few_posts, queries_for_more_posts)
+
+    def test_post_serializer_makes_no_per_row_queries(self):
+        """
+        Checks that PostModelSerializer reads everything from the post row
+        """
+
+        self.create_posts(5)
+        with self.assertNumQueries(1):
+            serializers.PostModelSerializer(Post.objects.all(), many=True).data
+
+
+class PostListPaginationTestCase(APITestCase):
+    """
+    Checks keyset pagination of the post list
+    """
+
+    def setUp(self):
+        """
+        Set ups user, authentication and posts sharing one created timestamp
+        """
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='test_case_user',
+            email='test@case.email',
+            password='test_case_password'
+        )
+        login_response = self.client.post(
+            '/sign-in/',
+            data={
+                'username': self.user.username,
+                'password': 'test_case_password'
+            },
+            format='json'
+        )
+        self.auth_token = login_response.data['access']
+        self.url = '/api/v1/posts/'
+        Post.objects.bulk_create(
+            Post(title=f'Title {i}', content='Content') for i in range(7)
+        )
+        first_post = Post.objects.order_by('id').first()
+        Post.objects.filter(id__lte=first_post.id + 3).update(created=first_post.created)
+
+    def get(self, url):
+        response = self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {self.auth_token}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_pages_follow_created_and_id_order(self):
+        """
+        Checks that following next links returns every post exactly once
+        """
+
+        expected_ids = list(
+            Post.objects.order_by('-created', '-id').values_list('id', flat=True)
+        )
+        page = self.get(f'{self.url}?page_size=3')
+        collected_ids = [post['id'] for post in page['results']]
+        self.assertIsNone(page['previous'])
+        while page['next']:
+            page = self.get(page['next'])
+            collected_ids.extend(post['id'] for post in page['results'])
+
+        self.assertEqual(collected_ids, expected_ids)
+
+    def test_previous_link_returns_previous_page(self):
+        """
+        Checks that previous link of the second page returns the first page
+        """
+
+        first_page = self.get(f'{self.url}?page_size=3')
+        second_page = self.get(first_page['next'])
+        previous_page = self.get(second_page['previous'])
+
+        self.assertEqual(previous_page['results'], first_page['results'])
+
+    def test_page_size_is_capped(self):
+        """
+        Checks that requested page size can't exceed maximum page size
+        """
+
+        Post.objects.bulk_create(
+            Post(title='Title', content='Content') for _ in range(100)
+        )
+        page = self.get(f'{self.url}?page_size=1000')
+
+        self.assertEqual(len(page['results']), 100)
+
+    def test_invalid_cursor(self):
+        """
+        Checks that malformed cursor is rejected
+        """
+
+        response = self.client.get(
+            f'{self.url}?cursor=bad-cursor',
+            HTTP_AUTHORIZATION=f'Bearer {self.auth_token}'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class EmailVerificationTestCase(EmailVerifierStubMixin, APITestCase):
+    """
+    Checks email verification caching, timeouts and circuit breaker
+    """
+
+    url = '/sign-up/'
+
+    def sign_up(self, email, username='test_case_user'):
+        return self.client.post(
+            self.url,
+            data={
+                'username': username,
+                'email': email,
+                'password': '1234qwer'
+            },
+            format='json'
+        )
+
+    def test_verdicts_are_cached(self):
+        """
+        Checks that email and domain verdicts are served from cache
+        """
+
+        self.sign_up('gibberish@gmail.com')
+        self.sign_up('gibberish@gmail.com')
+        self.sign_up('first@example.com')
+        response = self.sign_up('second@example.com')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            self.email_server.requested_emails,
+            ['gibberish@gmail.com', 'first@example.com']
+        )
+
+    @override_settings(EMAIL_VERIFICATION={'READ_TIMEOUT': 0.1})
+    def test_slow_upstream_fails_closed(self):
+        """
+        Checks that slow upstream is cut by timeout and sign up is rejected
+        """
+
+        response = self.sign_up('slow@gmail.com')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(User.objects.filter(email='slow@gmail.com').exists())
+
+    @override_settings(EMAIL_VERIFICATION={'READ_TIMEOUT': 0.1, 'FAIL_OPEN': True})
+    def test_slow_upstream_fails_open(self):
+        """
+        Checks that sign up is accepted when upstream is down and backend fails open
+        """
+
+        response = self.sign_up('slow@gmail.com')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    @override_settings(EMAIL_VERIFICATION={'FAILURE_THRESHOLD': 2, 'RECOVERY_TIMEOUT': 60})
+    def test_circuit_breaker_stops_calling_upstream(self):
+        """
+        Checks that upstream is not called while circuit breaker is open
+        """
+
+        for i in range(4):
+            response = self.sign_up(f'broken{i}@gmail.com', username=f'user_{i}')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.assertEqual(
+            self.email_server.requested_emails,
+            ['broken0@gmail.com', 'broken1@gmail.com']
+        )
+
+    @override_settings(EMAIL_VERIFICATION={'ASYNC': True})
+    def test_async_verification_deactivates_user(self):
+        """
+        Checks that user is created right away and verified after commit
+        """
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.sign_up('gibberish@gmail.com')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(self.email_server.requested_emails, [])
+
+        email_verification.verify_user(response.data['id'])
+
+        self.assertFalse(User.objects.get(pk=response.data['id']).is_active)
+
+    @override_settings(EMAIL_VERIFICATION={'ASYNC': True, 'READ_TIMEOUT': 0.1, 'RETRIES': 1, 'RETRY_DELAY': 30})
+    def test_async_verification_retries_when_unavailable(self):
+        """
+        Checks that user is left active and verified again later while upstream is down
+        """
+
+        with self.captureOnCommitCallbacks():
+            response = self.sign_up('slow@gmail.com')
+        user_id = response.data['id']
+
+        with mock.patch.object(email_verification, 'verify_user_in_background') as verify_user_in_background:
+            email_verification.verify_user(user_id)
+            verify_user_in_background.assert_called_once_with(user_id, 1, 30)
+            email_verification.verify_user(user_id, 1)
+            verify_user_in_background.assert_called_once()
+
+        self.assertTrue(User.objects.get(pk=user_id).is_active)
+
+
+class PostLikesToggleTestCase(APITestCase):
+    """
+    Checks like toggle response and input validation
+    """
+
+    def setUp(self):
+        """
+        Set ups user, authentication and post object
+        """
+        self.user = User.objects.create_user(
+            username='test_case_user',
+            email='test@case.email',
+            password='test_case_password'
+        )
+        login_response = self.client.post(
+            '/sign-in/',
+            data={
+                'username': self.user.username,
+                'password': 'test_case_password'
+            },
+            format='json'
+        )
+        self.auth_token = login_response.data['access']
+        self.url = '/api/v1/posts/like/'
+        self.post = Post.objects.create(
+            title='Test Case Post Title',
+            content='Test Case Post Content'
+        )
+
+    def toggle(self, data):
+        return self.client.post(
+            self.url,
+            data=data,
+            format='json',
+            HTTP_AUTHORIZATION=f'Bearer {self.auth_token}'
+        )
+
+    def test_toggle_returns_like_state(self):
+        """
+        Checks that response contains new like state and count
+        """
+
+        liked_response = self.toggle({'post': self.post.id})
+        unliked_response = self.toggle({'post': self.post.id})
+
+        self.assertTrue(liked_response.data['liked'])
+        self.assertEqual(liked_response.data['likes'], 1)
+        self.assertFalse(unliked_response.data['liked'])
+        self.assertEqual(unliked_response.data['likes'], 0)
+
+    def test_toggle_without_post(self):
+        """
+        Checks that request without post is rejected
+        """
+
+        response = self.toggle({})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Single statement toggle runs on PostgreSQL only')
+class PostLikesConcurrentToggleTestCase(TransactionTestCase):
+    """
+    Checks that concurrent toggles keep counter consistent with likes table
+    """
+
+    def test_concurrent_toggles_keep_counter_consistent(self):
+        """
+        Checks counter after many simultaneous toggles of the same post
+        """
+
+        users = [User.objects.create_user(f'test_case_user_{i}') for i in range(4)]
+        post = Post.objects.create(title='Title', content='Content')
+
+        def toggle(user):
+            try:
+                PostLikes.objects.toggle(user, post.id)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(toggle, users * 5))
+
+        post.refresh_from_db()
+        self.assertEqual(post.likes_count, PostLikes.objects.filter(post=post).count())
+
+
+class PostLikesBulkAPITestCase(APITestCase):
+    """
+    Checks batched like/unlike operations
+    """
+
+    def setUp(self):
+        """
+        Set ups users, authentication and post objects
+        """
+        self.user = User.objects.create_user(
+            username='test_case_user',
+            email='test@case.email',
+            password='test_case_password'
+        )
+        self.other_user = User.objects.create_user(username='test_case_other_user')
+        login_response = self.client.post(
+            '/sign-in/',
+            data={
+                'username': self.user.username,
+                'password': 'test_case_password'
+            },
+            format='json'
+        )
+        self.auth_token = login_response.data['access']
+        self.url = '/api/v1/posts/like/bulk/'
+        self.first_post = Post.objects.create(title='First', content='Content')
+        self.second_post = Post.objects.create(title='Second', content='Content')
+        PostLikes.objects.create(post=self.second_post, user=self.user)
+        PostLikes.objects.create(post=self.second_post, user=self.other_user)
+        Post.objects.filter(pk=self.second_post.pk).update(likes_count=2)
+
+    def bulk(self, operations):
+        return self.client.post(
+            self.url,
+            data={'operations': operations},
+            format='json',
+            HTTP_AUTHORIZATION=f'Bearer {self.auth_token}'
+        )
+
+    def test_bulk_like_and_unlike(self):
+        """
+        Checks per item results and updated counts of affected posts
+        """
+
+        response = self.bulk([
+            {'post': self.first_post.id, 'action': 'like'},
+            {'post': self.second_post.id, 'action': 'unlike'},
+            {'post': self.first_post.id, 'action': 'like'},
+            {'post': 999, 'action': 'like'},
+        ])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(result.get('changed'), result.get('liked')) for result in response.data['results']],
+            [(True, True), (True, False), (False, True), (None, None)]
+        )
+        self.assertTrue(response.data['results'][3]['error'])
+        self.assertEqual(
+            response.data['posts'],
+            [{'id': self.first_post.id, 'likes': 1}, {'id': self.second_post.id, 'likes': 1}]
+        )
+        self.assertTrue(PostLikes.objects.filter(post=self.first_post, user=self.user).exists())
+        self.assertFalse(PostLikes.objects.filter(post=self.second_post, user=self.user).exists())
+
+    def test_like_followed_by_unlike_writes_nothing(self):
+        """
+        Checks that only final state of each post is applied
+        """
+
+        response = self.bulk([
+            {'post': self.first_post.id, 'action': 'like'},
+            {'post': self.first_post.id, 'action': 'unlike'},
+        ])
+
+        self.assertEqual(response.data['posts'], [{'id': self.first_post.id, 'likes': 0}])
+        self.assertFalse(PostLikes.objects.filter(post=self.first_post).exists())
+
+    def test_bulk_writes_in_single_statements(self):
+        """
+        Checks that likes and unlikes of many posts take one insert and one delete
+        """
+
+        posts = [Post.objects.create(title=f'Title {number}', content='Content', likes_count=1) for number in range(3)]
+        PostLikes.objects.bulk_create(PostLikes(post=post, user=self.user) for post in posts)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.bulk(
+                [{'post': post.id, 'action': 'unlike'} for post in posts] +
+                [{'post': self.first_post.id, 'action': 'like'}]
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(all(result['changed'] for result in response.data['results']))
+        likes_table = PostLikes._meta.db_table
+        statements = [query['sql'] for query in context.captured_queries]
+        self.assertEqual(len([sql for sql in statements if sql.startswith(f'DELETE FROM "{likes_table}"')]), 1)
+        self.assertEqual(len([sql for sql in statements if sql.startswith(f'INSERT INTO "{likes_table}"')]), 1)
+        self.assertFalse(PostLikes.objects.filter(post__in=posts).exists())
+
+    def test_bulk_bad_request(self):
+        """
+        Checks that invalid actions, empty and oversized batches are rejected
+        """
+
+        self.assertEqual(
+            self.bulk([{'post': self.first_post.id, 'action': 'love'}]).status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+        self.assertEqual(self.bulk([]).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.bulk([{'post': 2 ** 70, 'action': 'like'}]).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.bulk([{'post': 0, 'action': 'like'}]).status_code, status.HTTP_400_BAD_REQUEST)
+        too_many_operations = [
+            {'post': self.first_post.id, 'action': 'like'}
+        ] * (settings.LIKES_BULK_MAX_OPERATIONS + 1)
+        self.assertEqual(self.bulk(too_many_operations).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PostBulkCreateTestCase(APITestCase):
+    """
+    Checks bulk post creation through posts endpoint
+    """
+
+    def setUp(self):
+        """
+        Set ups user and authentication
+        """
+        self.user = User.objects.create_user(
+            username='test_case_user',
+            email='test@case.email',
+            password='test_case_password'
+        )
+        login_response = self.client.post(
+            '/sign-in/',
+            data={
+                'username': self.user.username,
+                'password': 'test_case_password'
+            },
+            format='json'
+        )
+        self.auth_token = login_response.data['access']
+        self.url = '/api/v1/posts/'
+
+    def bulk_create(self, posts):
+        return self.client.post(
+            self.url,
+            data=posts,
+            format='json',
+            HTTP_AUTHORIZATION=f'Bearer {self.auth_token}'
+        )
+
+    def test_posts_can_bulk_create(self):
+        """
+        Checks that list of posts is created and returned
+        """
+
+        response = self.bulk_create([
+            {'title': 'Bulk Post Title', 'content': 'Bulk Post Content'},
+            {'title': 'Other Bulk Post Title', 'content': 'Bulk Post Content'},
+        ])
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            response.data,
+            serializers.PostModelSerializer(Post.objects.order_by('id'), many=True).data
+        )
+        self.assertEqual(self.user.posts.count(), 2)
+
+    def test_posts_cant_bulk_create_bad_request(self):
+        """
+        Checks that one invalid post rejects the whole list
+        """
+
+        response = self.bulk_create([
+            {'title': 'Bulk Post Title', 'content': 'Bulk Post Content'},
+            {'title': 'Bulk Post Title'},
+        ])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Post.objects.exists())
+        self.assertEqual(self.bulk_create([]).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ImportPostsCommandTestCase(APITestCase):
+    """
+    Checks streaming posts importer
+    """
+
+    def write_file(self, suffix, content):
+        descriptor, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(descriptor, 'w') as input_file:
+            input_file.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_import_ndjson(self):
+        """
+        Checks that posts are imported from NDJSON in chunks
+        """
+
+        author = User.objects.create_user('test_case_user')
+        path = self.write_file('.ndjson', '\n'.join(
+            json.dumps({'title': f'Title {i}', 'content': 'Content'}) for i in range(5)
+        ) + '\n' + json.dumps({'title': 'Authored', 'content': 'Content', 'user': author.id}))
+
+        call_command('import_posts', path, chunk_size=2, stdout=StringIO())
+
+        self.assertEqual(Post.objects.count(), 6)
+        self.assertEqual(Post.objects.get(title='Authored').user, author)
+
+    def test_import_csv(self):
+        """
+        Checks that posts are imported from CSV
+        """
+
+        path = self.write_file('.csv', 'title,content\nFirst,"Multi\nline, ""quoted"""\nSecond,Content\n')
+
+        call_command('import_posts', path, stdout=StringIO())
+
+        self.assertEqual(
+            list(Post.objects.order_by('id').values_list('title', 'content')),
+            [('First', 'Multi\nline, "quoted"'), ('Second', 'Content')]
+        )
+
+    def test_import_invalid_record(self):
+        """
+        Checks that invalid record aborts the whole import
+        """
+
+        path = self.write_file('.ndjson', '{"title": "Title", "content": "Content"}\n{"title": "Title"}\n')
+
+        with self.assertRaisesRegex(CommandError, r'record 2: .*content'):
+            call_command('import_posts', path, chunk_size=1, stdout=StringIO())
+
+        self.assertFalse(Post.objects.exists())
+
+    def test_import_invalid_user(self):
+        """
+        Checks that a non-numeric user id is reported with its record number
+        """
+
+        path = self.write_file('.csv', 'title,content,user\nFirst,Content,\nSecond,Content,alice\n')
+
+        with self.assertRaisesRegex(CommandError, r'record 2: .*user'):
+            call_command('import_posts', path, stdout=StringIO())
+
+        self.assertFalse(Post.objects.exists())
+
+
+class PostFeedCacheTestCase(APITestCase):
+    """
+    Checks post feed page cache invalidation and like patching
+    """
+
+    def setUp(self):
+        """
+        Set ups user, authentication and post object
+        """
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='test_case_user',
+            email='test@case.email',
+            password='test_case_password'
+        )
+        login_response = self.client.post(
+            '/sign-in/',
+            data={
+                'username': self.user.username,
+                'password': 'test_case_password'
+            },
+            format='json'
+        )
+        self.auth_token = login_response.data['access']
+        self.url = '/api/v1/posts/'
+        self.post = Post.objects.create(title='Title', content='Content')
+
+    def get_feed(self):
+        response = self.client.get(self.url, HTTP_AUTHORIZATION=f'Bearer {self.auth_token}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def count_posts_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            self.get_feed()
+        return len([query for query in context.captured_queries if '"posts"' in query['sql']])
+
+    def test_feed_page_is_cached(self):
+        """
+        Checks that repeated request is served without querying posts
+        """
+
+        self.assertEqual(self.count_posts_queries(), 1)
+        self.assertEqual(self.count_posts_queries(), 0)
+
+    def test_new_post_invalidates_feed(self):
+        """
+        Checks that post created through API shows up in cached feed
+        """
+
+        self.get_feed()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                self.url,
+                data={'title': 'New Title', 'content': 'New Content'},
+                format='json',
+                HTTP_AUTHORIZATION=f'Bearer {self.auth_token}'
+            )
+
+        self.assertEqual(len(self.get_feed()['results']), 2)
+
+    def test_like_patches_cached_page(self):
+        """
+        Checks that like count in cached page is patched without rebuilding it
+        """
+
+        self.get_feed()
+        self.client.post(
+            '/api/v1/posts/like/',
+            data={'post': self.post.id},
+            format='json',
+            HTTP_AUTHORIZATION=f'Bearer {self.auth_token}'
+        )
+
+        self.assertEqual(self.count_posts_queries(), 0)
+        self.assertEqual(self.get_feed()['results'][0]['likes'], 1)
+
+    def test_older_like_count_does_not_override_newer(self):
+        """
+        Checks that a count read from an older post row is not patched over a newer one
+        """
+
+        self.get_feed()
+        updated = timezone.now()
+        feed_cache.set_likes_count({self.post.id: (6, updated)})
+        feed_cache.set_likes_count({self.post.id: (5, updated - datetime.timedelta(milliseconds=1))})
+
+        self.assertEqual(self.get_feed()['results'][0]['likes'], 6)
+
+    def test_rebuilt_page_drops_older_patches(self):
+        """
+        Checks that pages rebuilt from database and invalidated feed don't take earlier patches
+        """
+
+        self.get_feed()
+        feed_cache.set_likes_count({self.post.id: (7, timezone.now())})
+        self.assertEqual(self.get_feed()['results'][0]['likes'], 7)
+
+        cache.delete(feed_cache.feed_page_key('http://testserver/api/v1/posts/'))
+        self.assertEqual(self.get_feed()['results'][0]['likes'], 0)
+
+        feed_cache.set_likes_count({self.post.id: (7, timezone.now())})
+        call_command('rebuild_likes_count', stdout=StringIO())
+        self.assertEqual(self.get_feed()['results'][0]['likes'], 0)
+
+    @override_settings(POSTS_FEED_CACHE={'TIMEOUT': 0, 'STALE_TIMEOUT': 60, 'LOCK_TIMEOUT': 0.1})
+    def test_stale_page_is_served_while_rebuilding(self):
+        """
+        Checks that only the lock holder rebuilds stale page
+        """
+
+        builds = []
+
+        def build_page():
+            builds.append(1)
+            return {'results': [{'id': self.post.id, 'likes': 0}]}
+
+        url = 'http://testserver/api/v1/posts/'
+        feed_cache.get_feed_page(url, build_page)
+        page_key = feed_cache.feed_page_key(url)
+        cache.add(f'{page_key}:lock', 1)
+
+        page = feed_cache.get_feed_page(url, build_page)
+
+        self.assertEqual(page, {'results': [{'id': self.post.id, 'likes': 0}]})
+        self.assertEqual(len(builds), 1)
+        cache.delete(f'{page_key}:lock')
+        feed_cache.get_feed_page(url, build_page)
+        self.assertEqual(len(builds), 2)
+
+
+class PostFeedConditionalGetTestCase(APITestCase):
+    """
+    Checks ETag and Last-Modified support of the post feed
+    """
+
+    def setUp(self):
+        """
+        Set ups user, authentication and post object
+        """
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='test_case_user',
+            email='test@case.email',
+            password='test_case_password'
+        )
+        login_response = self.client.post(
+            '/sign-in/',
+            data={
+                'username': self.user.username,
+                'password': 'test_case_password'
+            },
+            format='json'
+        )
+        self.auth_token = login_response.data['access']
+        self.url = '/api/v1/posts/'
+        self.post = Post.objects.create(title='Title', content='Content')
+
+    def get_feed(self, **headers):
+        return self.client.get(self.url, HTTP_AUTHORIZATION=f'Bearer {self.auth_token}', **headers)
+
+    def test_unchanged_feed_is_not_modified(self):
+        """
+        Checks that request with current ETag gets empty 304 without touching posts
+        """
+
+        etag = self.get_feed()['ETag']
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.get_feed(HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertFalse(response.content)
+        self.assertFalse([query for query in context.captured_queries if '"posts"' in query['sql']])
+
+    def test_like_changes_etag(self):
+        """
+        Checks that like makes previous ETag stale and bumps post updated time
+        """
+
+        first_response = self.get_feed()
+        self.client.post(
+            '/api/v1/posts/like/',
+            data={'post': self.post.id},
+            format='json',
+            HTTP_AUTHORIZATION=f'Bearer {self.auth_token}'
+        )
+        response = self.get_feed(HTTP_IF_NONE_MATCH=first_response['ETag'])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['likes'], 1)
+        self.assertGreater(Post.objects.get(pk=self.post.pk).updated, self.post.updated)
+
+    def test_last_modified_is_sent_after_its_second(self):
+        """
+        Checks that a change in the second of a previous response isn't hidden from If-Modified-Since
+        """
+
+        stamp = 1000000.2
+        cache.set(feed_cache.FEED_STAMP_KEY, stamp, timeout=None)
+        with mock.patch('time.time', return_value=stamp + 0.1):
+            response = self.get_feed()
+        self.assertNotIn('Last-Modified', response)
+
+        with mock.patch('time.time', return_value=stamp + 1):
+            response = self.get_feed()
+            self.assertEqual(response['Last-Modified'], http_date(math.ceil(stamp)))
+            self.assertEqual(
+                self.get_feed(HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code,
+                status.HTTP_304_NOT_MODIFIED
+            )
+            cache.set(feed_cache.FEED_STAMP_KEY, stamp + 0.5, timeout=None)
+            self.assertEqual(
+                self.get_feed(HTTP_IF_MODIFIED_SINCE=http_date(math.floor(stamp))).status_code,
+                status.HTTP_200_OK
+            )
+
+    def test_unauthorized_conditional_request(self):
+        """
+        Checks that conditional request still needs authentication
+        """
+
+        etag = self.get_feed()['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class LikesAnalyticsAPITestCase(APITestCase):
+    """
+    Checks daily likes rollup and analytics endpoint
+    """
+
+    def setUp(self):
+        """
+        Set ups users, authentication and post object
+        """
+        self.user = User.objects.create_user(
+            username='test_case_user',
+            email='test@case.email',
+            password='test_case_password'
+        )
+        login_response = self.client.post(
+            '/sign-in/',
+            data={
+                'username': self.user.username,
+                'password': 'test_case_password'
+            },
+            format='json'
+        )
+        self.auth_token = login_response.data['access']
+        self.url = '/api/v1/analytics/likes/'
+        self.post = Post.objects.create(title='Title', content='Content')
+        self.other_post = Post.objects.create(title='Other Title', content='Content')
+
+    def get_analytics(self, date_from, date_to):
+        return self.client.get(
+            self.url,
+            data={'date_from': date_from, 'date_to': date_to},
+            HTTP_AUTHORIZATION=f'Bearer {self.auth_token}'
+        )
+
+    def test_likes_are_rolled_up(self):
+        """
+        Checks that toggles and bulk likes are counted in today's rollup
+        """
+
+        for _ in range(3):
+            self.client.post(
+                '/api/v1/posts/like/',
+                data={'post': self.post.id},
+                format='json',
+                HTTP_AUTHORIZATION=f'Bearer {self.auth_token}'
+            )
+        self.client.post(
+            '/api/v1/posts/like/bulk/',
+            data={'operations': [{'post': self.other_post.id, 'action': 'like'}]},
+            format='json',
+            HTTP_AUTHORIZATION=f'Bearer {self.auth_token}'
+        )
+        today = timezone.localdate()
+        yesterday = today - datetime.timedelta(days=1)
+
+        response = self.get_analytics(yesterday, today)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['likes'], 3)
+        self.assertEqual(response.data['unlikes'], 1)
+        self.assertEqual(response.data['days'], [
+            {'date': yesterday, 'likes': 0, 'unlikes': 0},
+            {'date': today, 'likes': 3, 'unlikes': 1},
+        ])
+
+    def test_analytics_reads_rollups_only(self):
+        """
+        Checks that endpoint sums rollup shards without touching likes table
+        """
+
+        DailyLikes.objects.create(date=datetime.date(2019, 3, 1), shard=0, likes=2)
+        DailyLikes.objects.create(date=datetime.date(2019, 3, 1), shard=1, likes=3, unlikes=1)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.get_analytics('2019-03-01', '2019-03-01')
+
+        self.assertEqual(response.data['days'], [{'date': datetime.date(2019, 3, 1), 'likes': 5, 'unlikes': 1}])
+        self.assertFalse([query for query in context.captured_queries if 'FROM "likes"' in query['sql']])
+
+    def test_analytics_bad_request(self):
+        """
+        Checks that missing, malformed and reversed dates are rejected
+        """
+
+        self.assertEqual(self.get_analytics('2019-03-02', '2019-03-01').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.get_analytics('yesterday', '2019-03-01').status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, HTTP_AUTHORIZATION=f'Bearer {self.auth_token}')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rebuild_likes_rollup(self):
+        """
+        Checks that rollup is rebuilt from likes timestamps
+        """
+
+        PostLikes.objects.create(post=self.post, user=self.user)
+        PostLikes.objects.create(post=self.other_post, user=self.user)
+        DailyLikes.objects.create(date=timezone.localdate(), shard=3, likes=10)
+
+        call_command('rebuild_likes_rollup', stdout=StringIO())
+
+        self.assertEqual(
+            list(DailyLikes.objects.values_list('date', 'likes', 'unlikes')),
+            [(timezone.localdate(), 2, 0)]
+        )
+
+
+class UserActivityTestCase(APITestCase):
+    """
+    Checks buffered last login and last request tracking
+    """
+
+    def setUp(self):
+        """
+        Set ups user, empties activity buffer and signs in
+        """
+        activity.buffer.pending.clear()
+        self.user = User.objects.create_user(
+            username='test_case_user',
+            email='test@case.email',
+            password='test_case_password'
+        )
+        login_response = self.client.post(
+            '/sign-in/',
+            data={
+                'username': self.user.username,
+                'password': 'test_case_password'
+            },
+            format='json'
+        )
+        self.auth_token = login_response.data['access']
+        self.url = f'/api/v1/users/{self.user.id}/activity/'
+
+    def tearDown(self):
+        activity.buffer.pending.clear()
+
+    def test_requests_do_not_write_activity(self):
+        """
+        Checks that authenticated requests only touch the in-memory buffer
+        """
+
+        with CaptureQueriesContext(connection) as context:
+            self.client.get('/api/v1/posts/', HTTP_AUTHORIZATION=f'Bearer {self.auth_token}')
+
+        self.assertFalse([query for query in context.captured_queries if 'user_activity' in query['sql']])
+        self.assertFalse(UserActivity.objects.exists())
+        last_login, last_request = activity.buffer.get_pending(self.user.id)
+        self.assertIsNotNone(last_login)
+        self.assertIsNotNone(last_request)
+
+    def test_flush_writes_single_batch(self):
+        """
+        Checks that pending activity of many users is written with one upsert
+        """
+
+        users = [
+            User.objects.create_user(username=f'user_{number}', password='test_case_password')
+            for number in range(5)
+        ]
+        for user in users:
+            activity.buffer.record(user.id, last_request=timezone.now())
+
+        with CaptureQueriesContext(connection) as context:
+            activity.buffer.flush()
+
+        upserts = [query for query in context.captured_queries if 'INSERT INTO "user_activity"' in query['sql']]
+        self.assertEqual(len(upserts), 1)
+        self.assertEqual(UserActivity.objects.count(), 6)
+        self.assertEqual(activity.buffer.pending, {})
+
+    def test_flush_never_moves_timestamps_back(self):
+        """
+        Checks that a late flush with older times keeps newer stored times
+        """
+
+        now = timezone.now()
+        earlier = now - datetime.timedelta(minutes=5)
+        activity.write_activity({self.user.id: (now, now)})
+        activity.write_activity({self.user.id: (earlier, None)})
+
+        stored = UserActivity.objects.get(user=self.user)
+        self.assertEqual(stored.last_login, now)
+        self.assertEqual(stored.last_request, now)
+
+    def test_flush_skips_deleted_users(self):
+        """
+        Checks that activity of a user deleted before flush is dropped
+        """
+
+        user = User.objects.create_user(username='deleted_user', password='test_case_password')
+        activity.buffer.record(user.id, last_request=timezone.now())
+        user.delete()
+
+        activity.buffer.flush()
+
+        self.assertFalse(UserActivity.objects.filter(user_id=user.id).exists())
+
+    def test_user_can_get_activity(self):
+        """
+        Checks that endpoint merges stored activity with pending one
+        """
+
+        earlier = timezone.now() - datetime.timedelta(days=1)
+        activity.write_activity({self.user.id: (earlier, earlier)})
+        self.client.get('/api/v1/posts/', HTTP_AUTHORIZATION=f'Bearer {self.auth_token}')
+        pending_login, pending_request = activity.buffer.get_pending(self.user.id)
+
+        response = self.client.get(self.url, HTTP_AUTHORIZATION=f'Bearer {self.auth_token}')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['user'], self.user.id)
+        to_representation = serializers.UserActivitySerializer().fields['last_login'].to_representation
+        self.assertEqual(response.data['last_login'], to_representation(pending_login))
+        self.assertGreater(pending_request, earlier)
+        self.assertEqual(response.data['last_request'], to_representation(pending_request))
+
+    def test_user_cant_get_other_user_activity(self):
+        """
+        Checks that users can see only their own activity
+        """
+
+        other_user = User.objects.create_user(username='other_user', password='test_case_password')
+
+        response = self.client.get(
+            f'/api/v1/users/{other_user.id}/activity/',
+            HTTP_AUTHORIZATION=f'Bearer {self.auth_token}'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+@override_settings(USER_ACTIVITY={'FLUSH_INTERVAL': 0.1, 'BACKGROUND_FLUSH': True})
+class UserActivityBackgroundFlushTestCase(TransactionTestCase):
+    """
+    Checks that activity of an idle worker is flushed in the background
+    """
+
+    def tearDown(self):
+        activity.buffer.stop()
+        activity.buffer.pending.clear()
+
+    def test_idle_buffer_is_flushed(self):
+        """
+        Checks that pending activity is written without further requests and flushing stops on request
+        """
+
+        user = User.objects.create_user(username='test_case_user', password='test_case_password')
+        activity.buffer.record(user.id, last_request=timezone.now())
+        self.assertTrue(activity.buffer.thread.is_alive())
+
+        deadline = time.monotonic() + 5
+        while not UserActivity.objects.filter(user=user).exists() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertIsNotNone(UserActivity.objects.get(user=user).last_request)
+        self.assertEqual(activity.buffer.pending, {})
+
+        thread = activity.buffer.thread
+        activity.buffer.stop()
+        self.assertFalse(thread.is_alive())
+
+
+class CachedJWTAuthenticationTestCase(APITestCase):
+    """
+    Checks that authenticated requests resolve users without auth_user queries
+    """
+
+    def setUp(self):
+        """
+        Set ups user, empties user cache and signs in
+        """
+        user_cache.clear()
+        self.user = User.objects.create_user(
+            username='test_case_user',
+            email='test@case.email',
+            password='test_case_password'
+        )
+        login_response = self.client.post(
+            '/sign-in/',
+            data={
+                'username': self.user.username,
+                'password': 'test_case_password'
+            },
+            format='json'
+        )
+        self.auth_token = login_response.data['access']
+        self.post = Post.objects.create(title='Title', content='Content')
+
+    def tearDown(self):
+        user_cache.clear()
+
+    def get_feed(self):
+        return self.client.get('/api/v1/posts/', HTTP_AUTHORIZATION=f'Bearer {self.auth_token}')
+
+    def count_user_queries(self, request):
+        with CaptureQueriesContext(connection) as context:
+            response = request()
+        user_queries = [query for query in context.captured_queries if 'FROM "auth_user"' in query['sql']]
+        return response, len(user_queries)
+
+    def test_hot_paths_skip_user_query(self):
+        """
+        Checks that only the first request loads the user
+        """
+
+        response, user_queries = self.count_user_queries(self.get_feed)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(user_queries, 1)
+
+        response, user_queries = self.count_user_queries(self.get_feed)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(user_queries, 0)
+
+        response, user_queries = self.count_user_queries(lambda: self.client.post(
+            '/api/v1/posts/like/',
+            data={'post': self.post.id},
+            HTTP_AUTHORIZATION=f'Bearer {self.auth_token}'
+        ))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(user_queries, 0)
+
+    def test_deactivated_user_is_rejected(self):
+        """
+        Checks that deactivation evicts cached user
+        """
+
+        self.assertEqual(self.get_feed().status_code, status.HTTP_200_OK)
+
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertEqual(self.get_feed().status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_evicts_user(self):
+        """
+        Checks that password change makes next request load the user again
+        """
+
+        self.get_feed()
+        self.assertIsNotNone(user_cache.get(str(self.user.id)))
+
+        self.user.set_password('new_test_case_password')
+        self.user.save()
+
+        self.assertIsNone(user_cache.get(str(self.user.id)))
+        response, user_queries = self.count_user_queries(self.get_feed)
+        self.assertEqual(user_queries, 1)
+
+    @override_settings(AUTH_USER_CACHE={'TIMEOUT': 30, 'MAX_SIZE': 2})
+    def test_cache_is_size_bounded(self):
+        """
+        Checks that least recently used users are dropped first
+        """
+
+        for user_id in ('1', '2', '3'):
+            user_cache.set(user_id, self.user)
+        user_cache.get('2')
+        user_cache.set('4', self.user)
+
+        self.assertEqual(list(user_cache.entries), ['2', '4'])
+
+    @override_settings(AUTH_USER_CACHE={'TIMEOUT': 0})
+    def test_cache_can_be_disabled(self):
+        """
+        Checks that zero timeout loads user on every request
+        """
+
+        self.get_feed()
+        response, user_queries = self.count_user_queries(self.get_feed)
+
+        self.assertEqual(user_queries, 1)
+
+
+class UserPostListAPITestCase(APITestCase):
+    """
+    Checks per-author post feed
+    """
+
+    def setUp(self):
+        """
+        Set ups authors, posts and authentication
+        """
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='test_case_user',
+            email='test@case.email',
+            password='test_case_password'
+        )
+        login_response = self.client.post(
+            '/sign-in/',
+            data={
+                'username': self.user.username,
+                'password': 'test_case_password'
+            },
+            format='json'
+        )
+        self.auth_token = login_response.data['access']
+        self.author = User.objects.create_user('test_case_author')
+        self.url = f'/api/v1/users/{self.author.id}/posts/'
+        self.posts = [
+            Post.objects.create(title=f'Title {number}', content='Content', user=self.author)
+            for number in range(5)
+        ]
+        Post.objects.create(title='Other Author Title', content='Content', user=self.user)
+
+    def get(self, url, **params):
+        return self.client.get(url, data=params, HTTP_AUTHORIZATION=f'Bearer {self.auth_token}')
+
+    def test_user_posts_are_paginated(self):
+        """
+        Checks that author feed walks only author posts, newest first
+        """
+
+        first_page = self.get(self.url, page_size=3)
+        second_page = self.client.get(
+            first_page.data['next'],
+            HTTP_AUTHORIZATION=f'Bearer {self.auth_token}'
+        )
+
+        self.assertEqual(first_page.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [post['id'] for post in first_page.data['results'] + second_page.data['results']],
+            [post.id for post in reversed(self.posts)]
+        )
+        self.assertIsNone(second_page.data['next'])
+
+    def test_user_posts_query_uses_author_filter(self):
+        """
+        Checks that page is read with a single filtered and ordered query
+        """
+
+        with CaptureQueriesContext(connection) as context:
+            self.get(self.url, page_size=3)
+
+        post_queries = [query['sql'] for query in context.captured_queries if 'FROM "posts"' in query['sql']]
+        self.assertEqual(len(post_queries), 1)
+        self.assertIn('"posts"."user_id" = ', post_queries[0])
+        # Rows are read with values(), selected columns may be ordered by position.
+        self.assertRegex(post_queries[0], r'ORDER BY ("posts"\."created"|6) DESC, ("posts"\."id"|1) DESC')
+
+    def test_user_without_posts(self):
+        """
+        Checks that existing author without posts gets an empty page and unknown one 404
+        """
+
+        empty_author = User.objects.create_user('test_case_empty_author')
+
+        response = self.get(f'/api/v1/users/{empty_author.id}/posts/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], [])
+
+        response = self.get('/api/v1/users/0/posts/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TimelineAPITestCase(APITestCase):
+    """
+    Checks follows, timeline fan-out and timeline reads
+    """
+
+    def setUp(self):
+        """
+        Set ups users, authentication and author posts
+        """
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='test_case_user',
+            email='test@case.email',
+            password='test_case_password'
+        )
+        self.auth_token = self.sign_in(self.user)
+        self.author = User.objects.create_user('test_case_author', password='test_case_password')
+        self.author_token = self.sign_in(self.author)
+        self.old_posts = [
+            Post.objects.create(title=f'Old Title {number}', content='Content', user=self.author)
+            for number in range(2)
+        ]
+
+    def sign_in(self, user):
+        return self.client.post(
+            '/sign-in/',
+            data={'username': user.username, 'password': 'test_case_password'},
+            format='json'
+        ).data['access']
+
+    def follow(self, user_id, token=None):
+        return self.client.post(
+            f'/api/v1/users/{user_id}/follow/',
+            HTTP_AUTHORIZATION=f'Bearer {token or self.auth_token}'
+        )
+
+    def publish(self, data):
+        return self.client.post(
+            '/api/v1/posts/',
+            data=data,
+            format='json',
+            HTTP_AUTHORIZATION=f'Bearer {self.author_token}'
+        )
+
+    def get_timeline(self, url='/api/v1/timeline/', **params):
+        return self.client.get(url, data=params, HTTP_AUTHORIZATION=f'Bearer {self.auth_token}')
+
+    def test_user_can_follow_and_unfollow(self):
+        """
+        Checks that following backfills timeline and unfollowing empties it
+        """
+
+        response = self.follow(self.author.id)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data, {'user': self.author.id, 'following': True})
+        self.assertEqual(
+            set(TimelineEntry.objects.filter(user=self.user).values_list('post_id', flat=True)),
+            {post.id for post in self.old_posts}
+        )
+
+        response = self.follow(self.author.id)
+        self.assertEqual(response.data, {'user': self.author.id, 'following': False})
+        self.assertFalse(Follow.objects.exists())
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    def test_user_cant_follow_self_or_nonexistent_user(self):
+        """
+        Checks that self follow is rejected and unknown user is not found
+        """
+
+        self.assertEqual(self.follow(self.user.id).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.follow(0).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_new_posts_are_fanned_out(self):
+        """
+        Checks that created and bulk created posts reach followers only
+        """
+
+        bystander = User.objects.create_user('test_case_bystander')
+        self.follow(self.author.id)
+
+        self.publish({'title': 'New Title', 'content': 'Content'})
+        self.publish([
+            {'title': 'Bulk Title', 'content': 'Content'},
+            {'title': 'Other Bulk Title', 'content': 'Content'},
+        ])
+
+        self.assertEqual(TimelineEntry.objects.filter(user=self.user).count(), 5)
+        self.assertFalse(TimelineEntry.objects.filter(user=bystander).exists())
+
+    def test_timeline_is_read_without_joins(self):
+        """
+        Checks that timeline pages are range scans over timeline entries
+        """
+
+        self.follow(self.author.id)
+        for number in range(3):
+            self.publish({'title': f'New Title {number}', 'content': 'Content'})
+        expected = list(Post.objects.order_by('-created', '-id').values_list('id', flat=True))
+
+        with CaptureQueriesContext(connection) as context:
+            first_page = self.get_timeline(page_size=3)
+        timeline_queries = [query['sql'] for query in context.captured_queries if 'FROM "timeline"' in query['sql']]
+        second_page = self.get_timeline(first_page.data['next'])
+
+        self.assertEqual(first_page.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [post['id'] for post in first_page.data['results'] + second_page.data['results']],
+            expected
+        )
+        self.assertEqual(len(timeline_queries), 1)
+        self.assertNotIn('JOIN', timeline_queries[0])
+
+    @override_settings(TIMELINE_PULL_THRESHOLD=2)
+    def test_prolific_author_is_merged_on_read(self):
+        """
+        Checks that posts of authors over follower threshold are read, not fanned out
+        """
+
+        other_follower = User.objects.create_user('test_case_follower', password='test_case_password')
+        self.follow(self.author.id)
+        self.follow(self.author.id, token=self.sign_in(other_follower))
+        self.assertFalse(Follow.objects.filter(pull=False).exists())
+
+        self.publish({'title': 'New Title', 'content': 'Content'})
+        new_post = Post.objects.get(title='New Title')
+
+        self.assertFalse(TimelineEntry.objects.filter(post=new_post).exists())
+        response = self.get_timeline()
+        self.assertEqual(
+            [post['id'] for post in response.data['results']],
+            [new_post.id] + [post.id for post in reversed(self.old_posts)]
+        )
+
+
+class PostSearchAPITestCase(APITestCase):
+    """
+    Checks ranked post search and its index maintenance
+    """
+
+    def setUp(self):
+        """
+        Set ups user, authentication and posts to search
+        """
+        self.user = User.objects.create_user(
+            username='test_case_user',
+            email='test@case.email',
+            password='test_case_password'
+        )
+        login_response = self.client.post(
+            '/sign-in/',
+            data={
+                'username': self.user.username,
+                'password': 'test_case_password'
+            },
+            format='json'
+        )
+        self.auth_token = login_response.data['access']
+        self.url = '/api/v1/posts/search/'
+        self.title_post = Post.objects.create(title='Django performance', content='Notes on caching')
+        self.content_post = Post.objects.create(title='Weekly notes', content='Django and Postgres performance')
+        self.other_post = Post.objects.create(title='Gardening', content='Tomatoes need sun')
+
+    def search(self, **params):
+        return self.client.get(self.url, data=params, HTTP_AUTHORIZATION=f'Bearer {self.auth_token}')
+
+    def result_ids(self, response):
+        return [post['id'] for post in response.data['results']]
+
+    def test_search_is_ranked(self):
+        """
+        Checks that posts holding every word match and title matches rank first
+        """
+
+        response = self.search(q='django performance')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(self.result_ids(response), [self.title_post.id, self.content_post.id])
+        self.assertEqual(self.result_ids(self.search(q='django tomatoes')), [])
+
+    def test_search_is_paginated(self):
+        """
+        Checks that ranked results are split into pages
+        """
+
+        first_page = self.search(q='django', page_size=1)
+        second_page = self.client.get(first_page.data['next'], HTTP_AUTHORIZATION=f'Bearer {self.auth_token}')
+
+        self.assertEqual(self.result_ids(first_page), [self.title_post.id])
+        self.assertEqual(self.result_ids(second_page), [self.content_post.id])
+        self.assertIsNone(second_page.data['next'])
+
+    def test_search_index_follows_changes(self):
+        """
+        Checks that updated, bulk created and deleted posts are reindexed
+        """
+
+        self.other_post.title = 'Django gardening'
+        self.other_post.save()
+        self.client.post(
+            '/api/v1/posts/',
+            data=[{'title': 'Bulk', 'content': 'Gardening with django'}],
+            format='json',
+            HTTP_AUTHORIZATION=f'Bearer {self.auth_token}'
+        )
+        self.content_post.delete()
+
+        self.assertEqual(
+            self.result_ids(self.search(q='django gardening')),
+            [self.other_post.id, Post.objects.get(title='Bulk').id]
+        )
+        self.assertFalse(PostSearchTerm.objects.filter(term='weekly').exists())
+
+    def test_search_bad_request(self):
+        """
+        Checks that search needs a query and stop words alone match nothing
+        """
+
+        self.assertEqual(self.search().status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.search(q='').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.result_ids(self.search(q='the and')), [])
+
+
+class TrendingPostsTestCase(APITestCase):
+    """
+    Checks time-decayed trending scores and trending endpoint
+    """
+
+    def setUp(self):
+        """
+        Set ups user, authentication and posts
+        """
+        trending_posts.clear()
+        self.user = User.objects.create_user(
+            username='test_case_user',
+            email='test@case.email',
+            password='test_case_password'
+        )
+        login_response = self.client.post(
+            '/sign-in/',
+            data={
+                'username': self.user.username,
+                'password': 'test_case_password'
+            },
+            format='json'
+        )
+        self.auth_token = login_response.data['access']
+        self.url = '/api/v1/posts/trending/'
+        self.posts = [
+            Post.objects.create(title=f'Title {number}', content='Content')
+            for number in range(3)
+        ]
+
+    def tearDown(self):
+        trending_posts.clear()
+
+    def like(self, post):
+        return self.client.post(
+            '/api/v1/posts/like/',
+            data={'post': post.id},
+            HTTP_AUTHORIZATION=f'Bearer {self.auth_token}'
+        )
+
+    def get_trending(self, **params):
+        response = self.client.get(self.url, data=params, HTTP_AUTHORIZATION=f'Bearer {self.auth_token}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post['id'] for post in response.data['results']]
+
+    def test_likes_move_posts_up(self):
+        """
+        Checks that like adds to score, unlike takes it back
+        """
+
+        self.like(self.posts[1])
+        self.assertGreater(Post.objects.get(pk=self.posts[1].pk).trending_score, 0)
+        self.assertEqual(self.get_trending(), [self.posts[1].id])
+
+        self.like(self.posts[1])
+        self.assertAlmostEqual(Post.objects.get(pk=self.posts[1].pk).trending_score, 0)
+        self.assertEqual(self.get_trending(), [])
+
+    def test_recent_likes_outweigh_old_ones(self):
+        """
+        Checks that scores follow like velocity, not total likes
+        """
+
+        old = timezone.now() - datetime.timedelta(seconds=2 * settings.TRENDING_HALF_LIFE)
+        for number in range(3):
+            liker = User.objects.create_user(f'test_case_liker_{number}')
+            PostLikes.objects.create(post=self.posts[0], user=liker)
+        PostLikes.objects.filter(post=self.posts[0]).update(created=old)
+        self.like(self.posts[2])
+
+        call_command('renormalize_trending_scores', '--rebuild', stdout=StringIO())
+
+        self.assertEqual(self.get_trending(), [self.posts[2].id, self.posts[0].id])
+        self.assertAlmostEqual(Post.objects.get(pk=self.posts[0].pk).trending_score, 0.75, places=3)
+
+    def test_renormalize_scales_scores(self):
+        """
+        Checks that moving the epoch scales scores and keeps new likes comparable
+        """
+
+        TrendingState.objects.filter(pk=1).update(epoch=time.time() - settings.TRENDING_HALF_LIFE)
+        self.like(self.posts[0])
+        self.assertAlmostEqual(Post.objects.get(pk=self.posts[0].pk).trending_score, 2, places=3)
+
+        call_command('renormalize_trending_scores', stdout=StringIO())
+        self.like(self.posts[1])
+
+        self.assertAlmostEqual(Post.objects.get(pk=self.posts[0].pk).trending_score, 1, places=3)
+        self.assertAlmostEqual(Post.objects.get(pk=self.posts[1].pk).trending_score, 1, places=3)
+
+    def test_likes_renormalize_old_epoch(self):
+        """
+        Checks that likes move an epoch too old for their weights forward instead of failing
+        """
+
+        Post.objects.filter(pk=self.posts[0].pk).update(trending_score=1e30)
+        TrendingState.objects.filter(pk=1).update(epoch=time.time() - 365 * 24 * 60 * 60)
+
+        self.assertEqual(self.like(self.posts[1]).status_code, status.HTTP_201_CREATED)
+
+        self.assertAlmostEqual(TrendingState.objects.get(pk=1).epoch, time.time(), delta=60)
+        self.assertAlmostEqual(Post.objects.get(pk=self.posts[1].pk).trending_score, 1, places=3)
+        self.assertEqual(Post.objects.get(pk=self.posts[0].pk).trending_score, 0)
+
+    def test_likes_create_missing_epoch(self):
+        """
+        Checks that likes score posts even without an epoch row
+        """
+
+        TrendingState.objects.all().delete()
+
+        self.assertEqual(self.like(self.posts[0]).status_code, status.HTTP_201_CREATED)
+
+        self.assertTrue(TrendingState.objects.filter(pk=1).exists())
+        self.assertAlmostEqual(Post.objects.get(pk=self.posts[0].pk).trending_score, 1, places=3)
+
+    def test_bulk_likes_update_scores(self):
+        """
+        Checks that bulk likes add and withdraw the same weights and update cached trending posts
+        """
+
+        self.assertEqual(self.get_trending(), [])
+        self.client.post(
+            '/api/v1/posts/like/bulk/',
+            data={'operations': [{'post': self.posts[0].id, 'action': 'like'}]},
+            format='json',
+            HTTP_AUTHORIZATION=f'Bearer {self.auth_token}'
+        )
+        self.assertGreater(Post.objects.get(pk=self.posts[0].pk).trending_score, 0)
+        self.assertEqual(self.get_trending(), [self.posts[0].id])
+
+        self.client.post(
+            '/api/v1/posts/like/bulk/',
+            data={'operations': [{'post': self.posts[0].id, 'action': 'unlike'}]},
+            format='json',
+            HTTP_AUTHORIZATION=f'Bearer {self.auth_token}'
+        )
+        self.assertAlmostEqual(Post.objects.get(pk=self.posts[0].pk).trending_score, 0)
+        self.assertEqual(self.get_trending(), [])
+
+    @override_settings(TRENDING_CACHE_SIZE=2)
+    def test_trending_cache_is_bounded_and_follows_likes(self):
+        """
+        Checks that cache holds top posts only and takes this worker's likes without reloading
+        """
+
+        Post.objects.filter(pk=self.posts[0].pk).update(trending_score=3)
+        Post.objects.filter(pk=self.posts[1].pk).update(trending_score=2)
+        Post.objects.filter(pk=self.posts[2].pk).update(trending_score=1)
+        self.assertEqual(self.get_trending(), [self.posts[0].id, self.posts[1].id])
+        self.assertEqual(len(trending_posts.posts), 2)
+
+        for number in range(3):
+            liker = User.objects.create_user(f'test_case_liker_{number}')
+            PostLikes.objects.create(post=self.posts[2], user=liker)
+        Post.objects.filter(pk=self.posts[2].pk).update(trending_score=10)
+        self.like(self.posts[2])
+
+        with CaptureQueriesContext(connection) as context:
+            trending = self.get_trending(limit=2)
+        self.assertFalse([query for query in context.captured_queries if 'FROM "posts"' in query['sql']])
+        self.assertEqual(trending, [self.posts[2].id, self.posts[0].id])
+        response = self.client.get(self.url, data={'limit': 3}, HTTP_AUTHORIZATION=f'Bearer {self.auth_token}')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BenchmarkTestCase(APITestCase):
+    """
+    Checks benchmark seeding, measuring and baseline comparison
+    """
+
+    def test_seed_and_run_scenarios(self):
+        """
+        Checks that every scenario runs without errors against seeded data
+        """
+
+        user_ids = benchmark.seed(users=3, posts=5, likes=10, batch_size=2)
+        self.assertEqual(len(user_ids), 3)
+        self.assertEqual(Post.objects.count(), 5)
+        self.assertEqual(
+            sum(Post.objects.values_list('likes_count', flat=True)),
+            PostLikes.objects.count()
+        )
+
+        results = benchmark.run(clients=1, requests=2, warmup=1)
+        self.assertEqual(list(results), list(benchmark.SCENARIOS))
+        for metrics in results.values():
+            self.assertEqual(metrics['requests'], 2)
+            self.assertEqual(metrics['errors'], 0)
+            self.assertIsNotNone(metrics['queries_per_request'])
+            self.assertLessEqual(metrics['p50_ms'], metrics['p99_ms'])
+        self.assertGreater(results['like_toggle_async']['queries_per_request'], 0)
+
+    def test_queries_in_worker_threads_are_counted(self):
+        """
+        Checks that queries run on connections of other threads count towards the request
+        """
+
+        def query():
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+            finally:
+                connection.close()
+
+        def get(*args, **kwargs):
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                executor.submit(contextvars.copy_context().run, query).result()
+            return mock.Mock(status_code=status.HTTP_200_OK)
+
+        transport = benchmark.InProcessTransport()
+        with mock.patch.object(transport.client, 'get', get):
+            self.assertEqual(transport.request('get', '/api/v1/posts/'), (status.HTTP_200_OK, 1))
+
+    def test_run_requires_seeded_data(self):
+        """
+        Checks that benchmark refuses to run against empty database
+        """
+
+        with self.assertRaises(ValueError):
+            benchmark.run(clients=1, requests=1)
+
+    def test_compare_with_baseline(self):
+        """
+        Checks that only changes beyond tolerance and any extra query are regressions
+        and that async scenarios are compared with their sync versions
+        """
+
+        baseline = {'post_list': {'p95_ms': 10.0, 'rps': 100.0, 'queries_per_request': 2.0}}
+        self.assertEqual(
+            benchmark.compare({'post_list': {'p95_ms': 11.0, 'rps': 90.0, 'queries_per_request': 2.0}}, baseline),
+            []
+        )
+        self.assertEqual(
+            benchmark.compare({'post_list': {'p95_ms': 13.0, 'rps': 70.0, 'queries_per_request': 3.0}}, baseline),
+            [
+                ('post_list', 'p95_ms', 10.0, 13.0),
+                ('post_list', 'rps', 100.0, 70.0),
+                ('post_list', 'queries_per_request', 2.0, 3.0),
+            ]
+        )
+        self.assertEqual(
+            benchmark.compare_async({
+                'post_list': {'p95_ms': 10.0, 'rps': 100.0, 'queries_per_request': 2.0},
+                'post_list_async': {'p95_ms': 5.0, 'rps': 250.0, 'queries_per_request': 2.0},
+                'like_toggle_async': {'p95_ms': 5.0, 'rps': 250.0, 'queries_per_request': 2.0},
+            })['post_list_async'],
+            {'p95_ms': 0.5, 'rps': 2.5, 'queries_per_request': 1.0}
+        )
+        self.assertEqual(benchmark.percentile([4, 1, 3, 2], 50), 2)
+        self.assertEqual(benchmark.percentile([4, 1, 3, 2], 99), 4)
+
+
+class SeedBlogTestCase(APITestCase):
+    """
+    Checks generated test data
+    """
+
+    def test_seed_blog(self):
+        """
+        Checks that seeded likes are distinct, skewed and counted everywhere
+        """
+
+        call_command('seed_blog', users=20, posts=30, likes=200, batch_size=7, stdout=StringIO())
+        self.assertEqual(User.objects.filter(username__startswith=seeding.USERNAME_PREFIX).count(), 20)
+        self.assertEqual(Post.objects.count(), 30)
+        self.assertEqual(PostLikes.objects.count(), 200)
+        self.assertEqual(DailyLikes.objects.aggregate(total=Sum('likes'))['total'], 200)
+        counts = sorted(Post.objects.values_list('likes_count', flat=True), reverse=True)
+        self.assertEqual(sum(counts), 200)
+        self.assertGreater(counts[0], counts[len(counts) // 2])
+        self.assertEqual(
+            Post.objects.filter(likes_count__gt=0).count(),
+            Post.objects.filter(trending_score__gt=0).count()
+        )
+
+        login_response = self.client.post(
+            '/sign-in/',
+            data={'username': f'{seeding.USERNAME_PREFIX}0', 'password': seeding.PASSWORD},
+            format='json'
+        )
+        self.assertEqual(login_response.status_code, status.HTTP_200_OK)
+        post = Post.objects.first()
+        response = self.client.get(
+            '/api/v1/posts/search/',
+            data={'q': post.title.split()[0]},
+            HTTP_AUTHORIZATION=f'Bearer {login_response.data["access"]}'
+        )
+        self.assertIn(post.id, [found['id'] for found in response.data['results']])
+
+    def test_seed_blog_is_deterministic(self):
+        """
+        Checks that the same random seed generates the same data
+        """
+
+        def seed_and_collect():
+            user_ids, post_ids = seeding.seed_blog(users=5, posts=10, likes=20, username_prefix='deterministic_')
+            users = {user_id: number for number, user_id in enumerate(user_ids)}
+            posts = {post_id: number for number, post_id in enumerate(post_ids)}
+            return (
+                [(users[user_id], title) for user_id, title in
+                 Post.objects.filter(pk__in=post_ids).order_by('pk').values_list('user_id', 'title')],
+                sorted(
+                    (users[user_id], posts[post_id]) for user_id, post_id in
+                    PostLikes.objects.filter(post__in=post_ids).values_list('user_id', 'post_id')
+                ),
+            )
+
+        first = seed_and_collect()
+        self.assertEqual(seed_and_collect(), first)
+
+    def test_seed_blog_refuses_impossible_likes(self):
+        """
+        Checks that more likes than user and post pairs are refused
+        """
+
+        with self.assertRaises(CommandError):
+            call_command('seed_blog', users=2, posts=3, likes=7, stdout=StringIO())
+
+
+class RequestMetricsTestCase(EmailVerifierStubMixin, APITestCase):
+    """
+    Checks per-request metrics and metrics endpoint
+    """
+
+    def setUp(self):
+        """
+        Set ups user, authentication and empty metrics
+        """
+        super().setUp()
+        self.user = User.objects.create_user(
+            username='test_case_user',
+            email='test@case.email',
+            password='test_case_password'
+        )
+        login_response = self.client.post(
+            '/sign-in/',
+            data={
+                'username': self.user.username,
+                'password': 'test_case_password'
+            },
+            format='json'
+        )
+        self.auth_token = login_response.data['access']
+        metrics.registry.clear()
+
+    def tearDown(self):
+        metrics.registry.clear()
+
+    def get_histogram(self, name, view, method):
+        return metrics.registry.histograms[(name, (('method', method), ('view', view)))]
+
+    def test_request_metrics_are_recorded_per_view(self):
+        """
+        Checks that queries and timers of each request land in histograms of its view
+        """
+
+        Post.objects.create(title='Title', content='Content', user=self.user)
+        feed_cache.invalidate_feed()
+        with CaptureQueriesContext(connection) as context:
+            self.client.get('/api/v1/posts/', HTTP_AUTHORIZATION=f'Bearer {self.auth_token}')
+        queries = len(context.captured_queries)
+        self.client.get('/api/v1/posts/', HTTP_AUTHORIZATION=f'Bearer {self.auth_token}')
+        self.client.get('/api/v1/missing/')
+
+        queries_histogram = self.get_histogram('http_request_db_queries', 'posts', 'GET')
+        self.assertEqual(queries_histogram.count, 2)
+        self.assertGreaterEqual(queries_histogram.sum, queries)
+        self.assertGreater(self.get_histogram('http_request_serializer_duration_seconds', 'posts', 'GET').sum, 0)
+        self.assertEqual(self.get_histogram('http_request_duration_seconds', 'unmatched', 'GET').count, 1)
+        self.assertEqual(
+            metrics.registry.counters[
+                ('http_requests_total', (('method', 'GET'), ('status', 200), ('view', 'posts')))
+            ],
+            2
+        )
+
+    def test_external_http_time_is_recorded(self):
+        """
+        Checks that email verification counts as external HTTP time of sign up
+        """
+
+        self.client.post(
+            '/sign-up/',
+            data={'username': 'new_user', 'email': 'slow_user@gmail.com', 'password': 'test_case_password'},
+            format='json'
+        )
+        external = self.get_histogram('http_request_external_http_duration_seconds', 'sign-up', 'POST')
+        self.assertGreaterEqual(external.sum, 0.5)
+        self.assertLessEqual(
+            external.sum,
+            self.get_histogram('http_request_duration_seconds', 'sign-up', 'POST').sum
+        )
+
+    def test_metrics_endpoint_and_server_timing(self):
+        """
+        Checks Prometheus output and Server-Timing header
+        """
+
+        with override_settings(REQUEST_METRICS={'SERVER_TIMING': True}):
+            response = self.client.get('/api/v1/posts/', HTTP_AUTHORIZATION=f'Bearer {self.auth_token}')
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('total;dur=', response['Server-Timing'])
+        with override_settings(REQUEST_METRICS={'SERVER_TIMING': False}):
+            response = self.client.get('/api/v1/posts/', HTTP_AUTHORIZATION=f'Bearer {self.auth_token}')
+        self.assertNotIn('Server-Timing', response)
+
+        with override_settings(REQUEST_METRICS={'TOKEN': 'scraper-token'}):
+            self.assertEqual(self.client.get('/metrics').status_code, status.HTTP_403_FORBIDDEN)
+            self.assertEqual(
+                self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong-token').status_code,
+                status.HTTP_403_FORBIDDEN
+            )
+            response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scraper-token')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        body = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn('http_request_duration_seconds_bucket{method="GET",view="posts",le="+Inf"} 2', body)
+        self.assertIn('http_request_duration_seconds_count{method="GET",view="posts"} 2', body)
+        self.assertIn('http_requests_total{method="GET",status="200",view="posts"} 2', body)
+
+    def test_metrics_endpoint_without_token_needs_staff(self):
+        """
+        Checks that without a token only staff users can read metrics
+        """
+
+        with override_settings(REQUEST_METRICS={'TOKEN': None}):
+            self.assertEqual(self.client.get('/metrics').status_code, status.HTTP_403_FORBIDDEN)
+            self.client.force_login(self.user)
+            self.assertEqual(self.client.get('/metrics').status_code, status.HTTP_403_FORBIDDEN)
+            User.objects.filter(pk=self.user.pk).update(is_staff=True)
+            self.assertEqual(self.client.get('/metrics').status_code, status.HTTP_200_OK)
+
+    def test_lists_are_timed_once(self):
+        """
+        Checks that list serializers enter the serializer timer once, not per item
+        """
+
+        posts = [Post(pk=number, title='Title', content='Content') for number in range(1, 4)]
+        with mock.patch.object(metrics, 'timed', wraps=metrics.timed) as timed:
+            data = serializers.PostModelSerializer(posts, many=True).data
+        self.assertEqual(len(data), 3)
+        self.assertEqual(timed.call_count, 1)
+
+
+class LikesCountingPostSerializer(serializers.PostModelSerializer):
+    """
+    Counts likes of every post with its own query, the N+1 pattern
+    """
+
+    likes = drf_serializers.SerializerMethodField()
+
+    def get_likes(self, post):
+        return PostLikes.objects.filter(post=post).count()
+
+
+class QueryInspectorTestCase(profiling.QueryBudgetMixin, APITestCase):
+    """
+    Checks N+1 and query budget detection
+    """
+
+    def setUp(self):
+        """
+        Set ups user, authentication and posts
+        """
+        self.user = User.objects.create_user(
+            username='test_case_user',
+            email='test@case.email',
+            password='test_case_password'
+        )
+        login_response = self.client.post(
+            '/sign-in/',
+            data={
+                'username': self.user.username,
+                'password': 'test_case_password'
+            },
+            format='json'
+        )
+        self.auth_token = login_response.data['access']
+        self.posts = [
+            Post.objects.create(title=f'Title {number}', content='Content', user=self.user)
+            for number in range(5)
+        ]
+
+    def test_query_shape_ignores_parameters(self):
+        """
+        Checks that queries differing only in parameters share a shape
+        """
+
+        self.assertEqual(
+            profiling.get_query_shape('SELECT * FROM posts WHERE id IN (%s, %s) AND title = \'a\' LIMIT 21'),
+            profiling.get_query_shape('SELECT * FROM posts WHERE id IN (%s)  AND title = \'b\' LIMIT 5')
+        )
+        self.assertNotEqual(
+            profiling.get_query_shape('SELECT * FROM posts WHERE id = %s'),
+            profiling.get_query_shape('SELECT * FROM likes WHERE id = %s')
+        )
+
+    def test_repeated_queries_point_to_serializer_field(self):
+        """
+        Checks that N+1 queries are reported with serializer field and code location
+        """
+
+        with profiling.inspect_queries() as inspector:
+            LikesCountingPostSerializer(Post.objects.all(), many=True).data
+        repeated = inspector.get_repeated(len(self.posts))
+        self.assertEqual(len(repeated), 1)
+        queries = list(repeated.values())[0]
+        self.assertEqual({query.field for query in queries}, {'LikesCountingPostSerializer.likes'})
+        self.assertTrue(queries[0].location.startswith(f'starnavi_blog_api{os.sep}tests.py:'))
+        self.assertTrue(queries[0].location.endswith('in get_likes'))
+
+        with self.assertRaises(self.failureException):
+            with self.assertQueryBudget(repeat_threshold=len(self.posts)):
+                LikesCountingPostSerializer(Post.objects.all(), many=True).data
+        with self.assertQueryBudget(max_queries=1):
+            serializers.PostModelSerializer(Post.objects.all(), many=True).data
+
+    def test_middleware_logs_or_fails_request(self):
+        """
+        Checks that broken budget is logged and fails the request in strict mode
+        """
+
+        def like():
+            return self.client.post(
+                '/api/v1/posts/like/',
+                data={'post': self.posts[0].id},
+                format='json',
+                HTTP_AUTHORIZATION=f'Bearer {self.auth_token}'
+            )
+
+        with override_settings(QUERY_INSPECTOR={'ENABLED': True, 'MAX_QUERIES': 1}):
+            with self.assertLogs('starnavi_blog_api.profiling', 'WARNING') as logs:
+                response = like()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn('POST like-unlike', logs.output[0])
+        self.assertIn('budget is 1', logs.output[0])
+
+        with override_settings(QUERY_INSPECTOR={'ENABLED': True, 'STRICT': True, 'MAX_QUERIES': 1}):
+            with self.assertRaises(profiling.QueryBudgetExceeded):
+                like()
+
+    def test_inspected_session_requests(self):
+        """
+        Checks that queries resolving the lazy session user are inspected without resolving it again
+        """
+
+        self.client.force_login(self.user)
+        with override_settings(QUERY_INSPECTOR={'ENABLED': True}):
+            response = self.client.get('/admin/')
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+
+
+@override_settings(LIKES_WRITE_BEHIND={'ENABLED': True})
+class WriteBehindLikesTestCase(APITestCase):
+    """
+    Checks likes accepted in write-behind mode and their flushing
+    """
+
+    def setUp(self):
+        """
+        Set ups users, their authentication and a post
+        """
+        cache.clear()
+        self.auth_tokens = []
+        for number in range(2):
+            user = User.objects.create_user(
+                username=f'test_case_user_{number}',
+                email=f'test{number}@case.email',
+                password='test_case_password'
+            )
+            login_response = self.client.post(
+                '/sign-in/',
+                data={
+                    'username': user.username,
+                    'password': 'test_case_password'
+                },
+                format='json'
+            )
+            self.auth_tokens.append(login_response.data['access'])
+        self.post = Post.objects.create(title='Title', content='Content')
+
+    def like(self, auth_token):
+        return self.client.post(
+            '/api/v1/posts/like/',
+            data={'post': self.post.id},
+            format='json',
+            HTTP_AUTHORIZATION=f'Bearer {auth_token}'
+        )
+
+    def flush(self, *args):
+        output = StringIO()
+        call_command('flush_like_intents', *args, stdout=output)
+        return output.getvalue()
+
+    def test_likes_are_acknowledged_before_they_are_written(self):
+        """
+        Checks projected counts and that pending likes survive losing the cache
+        """
+
+        response = self.like(self.auth_tokens[0])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['likes'], response.data['liked']), (1, True))
+        response = self.like(self.auth_tokens[1])
+        self.assertEqual((response.data['likes'], response.data['liked']), (2, True))
+        self.assertFalse(PostLikes.objects.exists())
+        self.assertEqual(Post.objects.get(pk=self.post.pk).likes_count, 0)
+
+        # Intents are rows, so a restart with an empty cache loses only projections.
+        cache.clear()
+        self.assertIn('Flushed 2 like intents', self.flush('--reconcile'))
+        self.assertEqual(PostLikes.objects.filter(post=self.post).count(), 2)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).likes_count, 2)
+        self.assertGreater(Post.objects.get(pk=self.post.pk).trending_score, 0)
+        self.assertFalse(LikeIntent.objects.exists())
+        self.assertEqual(write_behind.get_pending_deltas([self.post.pk]), {})
+
+        response = self.like(self.auth_tokens[0])
+        self.assertEqual((response.data['likes'], response.data['liked']), (1, False))
+
+    def test_like_and_unlike_cancel_out(self):
+        """
+        Checks that like followed by unlike writes nothing
+        """
+
+        self.like(self.auth_tokens[0])
+        response = self.like(self.auth_tokens[0])
+        self.assertEqual((response.data['likes'], response.data['liked']), (0, False))
+        response = self.client.post(
+            '/api/v1/posts/like/bulk/',
+            data={'operations': [
+                {'post': self.post.id, 'action': 'like'},
+                {'post': self.post.id, 'action': 'unlike'},
+            ]},
+            format='json',
+            HTTP_AUTHORIZATION=f'Bearer {self.auth_tokens[1]}'
+        )
+        self.assertEqual(response.data['posts'], [{'id': self.post.id, 'likes': 0}])
+        self.assertEqual([result['liked'] for result in response.data['results']], [True, False])
+
+        self.flush()
+        self.assertFalse(PostLikes.objects.exists())
+        self.assertFalse(DailyLikes.objects.exists())
+        self.assertEqual(Post.objects.get(pk=self.post.pk).likes_count, 0)
+
+    def test_reconcile_finds_and_repairs_drift(self):
+        """
+        Checks that reconciliation compares counts with likes table and pending intents
+        """
+
+        self.like(self.auth_tokens[0])
+        write_behind.set_pending_deltas({self.post.pk: 5})
+        Post.objects.filter(pk=self.post.pk).update(likes_count=3)
+        self.assertEqual(len(write_behind.reconcile()), 2)
+        write_behind.reconcile(fix=True)
+        self.assertEqual(write_behind.reconcile(), [])
+        self.assertEqual(write_behind.get_pending_deltas([self.post.pk]), {self.post.pk: 1})
+        self.assertEqual(Post.objects.get(pk=self.post.pk).likes_count, 0)
+
+        self.flush()
+        Post.objects.filter(pk=self.post.pk).update(likes_count=3)
+        with self.assertRaises(CommandError):
+            self.flush('--reconcile')
+        self.assertIn('1 posts repaired', self.flush('--reconcile', '--fix'))
+        self.assertEqual(Post.objects.get(pk=self.post.pk).likes_count, 1)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Concurrent transactions need PostgreSQL')
+@override_settings(LIKES_WRITE_BEHIND={'ENABLED': True})
+class WriteBehindConcurrentLikesTestCase(TransactionTestCase):
+    """
+    Checks that concurrent taps and flushes in write-behind mode keep likes consistent
+    """
+
+    def test_concurrent_taps_and_flushes(self):
+        """
+        Checks that each tap flips the previous state and flushers apply intents in order
+        """
+
+        cache.clear()
+        users = [User.objects.create_user(f'test_case_user_{i}') for i in range(3)]
+        post = Post.objects.create(title='Title', content='Content')
+
+        def in_thread(function, *args):
+            try:
+                return function(*args)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda user: in_thread(write_behind.toggle, user, post.id), users * 5))
+        self.assertEqual(write_behind.get_pending_deltas([post.id]), {post.id: 3})
+        for user in users:
+            deltas = list(LikeIntent.objects.filter(user=user).order_by('id').values_list('delta', flat=True))
+            self.assertEqual(deltas, [1, -1, 1, -1, 1])
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda _: in_thread(write_behind.flush, 2), range(8)))
+        self.assertFalse(LikeIntent.objects.exists())
+        self.assertEqual(PostLikes.objects.filter(post=post).count(), 3)
+        post.refresh_from_db()
+        self.assertEqual(post.likes_count, 3)
+
+
+@override_settings(READ_REPLICAS={'WEIGHTS': {'replica': 1}}, POSTS_FEED_CACHE={'ENABLED': False})
+class ReadReplicaRoutingTestCase(TransactionTestCase):
+    """
+    Checks that safe reads go to replica and writers read their own writes.
+    Rows differ between the two databases, so responses show which one served them.
+    """
+
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        """
+        Set ups user, authentication and a post on each database
+        """
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='test_case_user',
+            email='test@case.email',
+            password='test_case_password'
+        )
+        login_response = self.client.post(
+            '/sign-in/',
+            data={
+                'username': self.user.username,
+                'password': 'test_case_password'
+            },
+            format='json'
+        )
+        self.auth_token = login_response.data['access']
+        Post.objects.create(title='Primary post', content='Content')
+        Post.objects.using('replica').create(title='Replica post', content='Content')
+
+    def get_titles(self):
+        response = self.client.get('/api/v1/posts/', HTTP_AUTHORIZATION=f'Bearer {self.auth_token}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post['title'] for post in response.data['results']]
+
+    def test_reads_follow_replica_until_user_writes(self):
+        """
+        Checks that user reads primary right after their write and replica again later
+        """
+
+        self.assertEqual(self.get_titles(), ['Replica post'])
+
+        response = self.client.post(
+            '/api/v1/posts/',
+            data={'title': 'New post', 'content': 'Content'},
+            format='json',
+            HTTP_AUTHORIZATION=f'Bearer {self.auth_token}'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Post.objects.filter(title='New post').count(), 1)
+        self.assertFalse(Post.objects.using('replica').filter(title='New post').exists())
+        self.assertEqual(self.get_titles(), ['New post', 'Primary post'])
+
+        cache.delete(routers.sticky_key(self.user.pk))
+        self.assertEqual(self.get_titles(), ['Replica post'])
+
+    @override_settings(POSTS_FEED_CACHE={'ENABLED': True})
+    def test_writer_skips_pages_cached_from_replica(self):
+        """
+        Checks that a feed page another user cached from replica after a write isn't served to the writer
+        """
+
+        User.objects.create_user(username='test_case_reader', password='test_case_password')
+        reader_token = self.client.post(
+            '/sign-in/',
+            data={'username': 'test_case_reader', 'password': 'test_case_password'},
+            format='json'
+        ).data['access']
+        response = self.client.post(
+            '/api/v1/posts/',
+            data={'title': 'New post', 'content': 'Content'},
+            format='json',
+            HTTP_AUTHORIZATION=f'Bearer {self.auth_token}'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        for url in ('/api/v1/posts/', '/api/v1/async/posts/'):
+            reader_response = self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {reader_token}')
+            self.assertEqual([post['title'] for post in reader_response.json()['results']], ['Replica post'])
+
+            response = self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {self.auth_token}')
+            self.assertEqual([post['title'] for post in response.json()['results']], ['New post', 'Primary post'])
+            response = self.client.get(
+                url,
+                HTTP_AUTHORIZATION=f'Bearer {self.auth_token}',
+                HTTP_IF_NONE_MATCH=reader_response['ETag']
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual([post['title'] for post in response.json()['results']], ['New post', 'Primary post'])
+
+    def test_router_keeps_writes_and_other_reads_on_primary(self):
+        """
+        Checks router choices outside safe requests
+        """
+
+        router = routers.ReplicaRouter()
+        self.assertEqual(router.db_for_read(Post), 'default')
+        state_token = routers._current.set(routers.RoutingState(primary=False))
+        try:
+            self.assertEqual(router.db_for_read(Post), 'replica')
+            self.assertEqual(router.db_for_read(User), 'default')
+            self.assertEqual(router.db_for_write(Post), 'default')
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(Post), 'default')
+            routers.use_primary()
+            self.assertEqual(router.db_for_read(Post), 'default')
+        finally:
+            routers._current.reset(state_token)
+
+
+class AsyncViewsTestCase(APITestCase):
+    """
+    Checks async feed and like endpoints against their sync counterparts
+    """
+
+    def setUp(self):
+        """
+        Set ups user, authentication and posts
+        """
+        cache.clear()
+        metrics.registry.clear()
+        self.user = User.objects.create_user(
+            username='test_case_user',
+            email='test@case.email',
+            password='test_case_password'
+        )
+        login_response = self.client.post(
+            '/sign-in/',
+            data={
+                'username': self.user.username,
+                'password': 'test_case_password'
+            },
+            format='json'
+        )
+        self.auth_token = login_response.data['access']
+        self.posts = [
+            Post.objects.create(title=f'Title {number}', content='Content', user=self.user)
+            for number in range(25)
+        ]
+
+    def tearDown(self):
+        metrics.registry.clear()
+
+    def test_async_feed_matches_sync_feed(self):
+        """
+        Checks that async feed pages, cursors and conditional requests match sync feed
+        """
+
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {self.auth_token}'}
+        sync_page = self.client.get('/api/v1/posts/?page_size=10', **headers)
+        async_page = self.client.get('/api/v1/async/posts/?page_size=10', **headers)
+        self.assertEqual(async_page.status_code, status.HTTP_200_OK)
+        self.assertEqual(async_page['Content-Type'], 'application/json')
+        self.assertEqual(async_page.json()['results'], sync_page.json()['results'])
+        self.assertEqual(
+            parse_qs(urlparse(async_page.json()['next']).query),
+            parse_qs(urlparse(sync_page.json()['next']).query)
+        )
+
+        next_page = self.client.get(async_page.json()['next'], **headers)
+        self.assertEqual(next_page.json()['results'], self.client.get(sync_page.json()['next'], **headers).json()['results'])
+
+        not_modified = self.client.get('/api/v1/async/posts/?page_size=10', HTTP_IF_NONE_MATCH=async_page['ETag'], **headers)
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        unauthenticated = self.client.get('/api/v1/async/posts/')
+        self.assertEqual(unauthenticated.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(unauthenticated.json(), self.client.get('/api/v1/posts/').json())
+        self.assertIn('WWW-Authenticate', unauthenticated)
+        invalid_token = self.client.get('/api/v1/async/posts/', HTTP_AUTHORIZATION='Bearer invalid')
+        self.assertEqual(invalid_token.status_code, status.HTTP_401_UNAUTHORIZED)
+        not_allowed = self.client.post('/api/v1/async/posts/', data={}, format='json', **headers)
+        self.assertEqual(not_allowed.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    async def test_async_like_runs_through_async_middleware(self):
+        """
+        Checks that likes toggle over ASGI with queries counted and user activity recorded
+        """
+
+        headers = {'Authorization': f'Bearer {self.auth_token}'}
+        post = self.posts[0]
+        liked = await self.async_client.post(
+            '/api/v1/async/posts/like/',
+            data={'post': post.id},
+            content_type='application/json',
+            headers=headers
+        )
+        self.assertEqual(liked.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(liked.json()['likes'], 1)
+        self.assertTrue(liked.json()['liked'])
+        self.assertTrue(await PostLikes.objects.filter(user=self.user, post=post).aexists())
+        self.assertIsNotNone(activity.buffer.get_pending(self.user.pk)[1])
+
+        unliked = await self.async_client.post(
+            '/api/v1/async/posts/like/',
+            data={'post': post.id},
+            content_type='application/json',
+            headers=headers
+        )
+        self.assertEqual(unliked.json()['likes'], 0)
+        self.assertFalse(unliked.json()['liked'])
+
+        missing = await self.async_client.post(
+            '/api/v1/async/posts/like/',
+            data={'post': 0},
+            content_type='application/json',
+            headers=headers
+        )
+        self.assertEqual(missing.status_code, status.HTTP_404_NOT_FOUND)
+        bad_request = await self.async_client.post(
+            '/api/v1/async/posts/like/',
+            data={'post': 'first'},
+            content_type='application/json',
+            headers=headers
+        )
+        self.assertEqual(bad_request.json(), {'error': 'Bad request.'})
+
+        queries = metrics.registry.histograms[
+            ('http_request_db_queries', (('method', 'POST'), ('view', 'async-like-unlike')))
+        ]
+        self.assertEqual(queries.count, 4)
+        self.assertGreater(queries.sum, 0)
+
+
+class PostValuesRenderingTestCase(APITestCase):
+    """
+    Checks that post lists built from values and rendered with orjson match the model serializer
+    """
+
+    def setUp(self):
+        """
+        Set ups user, authentication and posts with awkward text and timestamps
+        """
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='test_case_user',
+            email='test@case.email',
+            password='test_case_password'
+        )
+        login_response = self.client.post(
+            '/sign-in/',
+            data={
+                'username': self.user.username,
+                'password': 'test_case_password'
+            },
+            format='json'
+        )
+        self.auth_token = login_response.data['access']
+        texts = [
+            'Plain',
+            'Quotes " and \\ backslash / slash',
+            'Controls \x00\x01\b\t\n\f\r\x1f\x7f',
+            'Unicode \u00e9 \u4e2d\u6587 \U0001f600 \ufeff',
+            'Separators \u2028 and \u2029',
+        ]
+        for number, text in enumerate(texts):
+            post = Post.objects.create(title=text, content=text * 3, user=self.user, likes_count=number)
+            # Whole seconds lose their fraction in isoformat, both kinds must match.
+            created = timezone.now().replace(microsecond=0 if number % 2 else 123456)
+            Post.objects.filter(pk=post.pk).update(created=created - datetime.timedelta(minutes=number))
+
+    def render_with_serializer(self, posts):
+        return JSONRenderer().render(serializers.PostModelSerializer(posts, many=True).data)
+
+    def test_values_rendering_matches_serializer_bytes(self):
+        """
+        Checks values rows rendered with and without orjson against model serializer output
+        """
+
+        expected = self.render_with_serializer(Post.objects.order_by('id'))
+        rows = Post.objects.order_by('id').values(*serializers.PostValuesSerializer.values_fields)
+        self.assertEqual(renderers.FastJSONRenderer().render(serializers.PostValuesSerializer(rows).data), expected)
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual(renderers.FastJSONRenderer().render(serializers.PostValuesSerializer(rows).data), expected)
+
+        for path in ('/api/v1/posts/', '/api/v1/async/posts/', f'/api/v1/users/{self.user.pk}/posts/'):
+            response = self.client.get(f'{path}?page_size=3', HTTP_AUTHORIZATION=f'Bearer {self.auth_token}')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            page = Post.objects.order_by('-created', '-id')[:3]
+            self.assertEqual(
+                response.content,
+                JSONRenderer().render({
+                    'next': response.json()['next'],
+                    'previous': None,
+                    'results': serializers.PostModelSerializer(page, many=True).data,
+                })
+            )
+
+    def test_renderer_falls_back_to_stock_encoding(self):
+        """
+        Checks that values orjson can't encode the same way are rendered by the stock renderer
+        """
+
+        stock = JSONRenderer()
+        fast = renderers.FastJSONRenderer()
+        for data in (
+            {'big': 2 ** 70},
+            {1: 'integer key'},
+            {'created': timezone.now(), 'date': datetime.date(2020, 1, 2)},
+            {'lazy': drf_serializers.CharField().error_messages['blank']},
+            None,
+        ):
+            self.assertEqual(fast.render(data), stock.render(data))
+        self.assertEqual(
+            fast.render({'a': [1]}, 'application/json; indent=2'),
+            stock.render({'a': [1]}, 'application/json; indent=2')
+        )
+
+
+class LikesPartitioningTestCase(APITestCase):
+    """
+    Checks partitioning migration support and partition maintenance
+    """
+
+    def test_partitioning_keeps_uniqueness(self):
+        """
+        Checks that partition keys outside unique constraints are refused on every database
+        """
+
+        state = ProjectState.from_apps(apps)
+        partitioning.PartitionTable('postlikes', key='post').state_forwards('starnavi_blog_api', state)
+        for operation in (
+            partitioning.PartitionTable('postlikes', key='created', method='range'),
+            partitioning.PartitionTable('postlikes', key='created', method='hash'),
+            partitioning.PartitionTable('postlikes', key='missing'),
+        ):
+            with self.assertRaises(ValueError):
+                operation.state_forwards('starnavi_blog_api', state)
+        with self.assertRaises(ValueError):
+            partitioning.PartitionTable('postlikes', key='post', method='list')
+
+    def test_partition_sql(self):
+        """
+        Checks partition names, bounds and month arithmetic
+        """
+
+        quote_name = connection.ops.quote_name
+        self.assertEqual(partitioning.add_months(datetime.date(2020, 11, 1), 3), datetime.date(2021, 2, 1))
+        self.assertEqual(partitioning.add_months(datetime.date(2020, 1, 1), -1), datetime.date(2019, 12, 1))
+        self.assertEqual(
+            partitioning.get_month(
+                datetime.datetime(2020, 3, 1, 1, tzinfo=datetime.timezone(datetime.timedelta(hours=3)))
+            ),
+            datetime.date(2020, 2, 1)
+        )
+        self.assertEqual(
+            partitioning.hash_partitions_sql('likes', 2, quote_name),
+            [
+                'CREATE TABLE "likes_p0" PARTITION OF "likes" FOR VALUES WITH (MODULUS 2, REMAINDER 0)',
+                'CREATE TABLE "likes_p1" PARTITION OF "likes" FOR VALUES WITH (MODULUS 2, REMAINDER 1)',
+            ]
+        )
+        self.assertEqual(
+            partitioning.month_partition_sql('events', datetime.date(2020, 12, 1), quote_name),
+            'CREATE TABLE IF NOT EXISTS "events_p2020_12" PARTITION OF "events" '
+            "FOR VALUES FROM ('2020-12-01') TO ('2021-01-01')"
+        )
+        self.assertEqual(partitioning.get_partition_month('events_p2020_12'), datetime.date(2020, 12, 1))
+        self.assertIsNone(partitioning.get_partition_month('likes_p3'))
+
+    @skipUnless(connection.vendor != 'postgresql', 'Checks the unpartitioned fallback')
+    def test_unpartitioned_fallback(self):
+        """
+        Checks that likes stay a plain table and maintenance has nothing to do outside PostgreSQL
+        """
+
+        out = StringIO()
+        call_command('maintain_partitions', stdout=out)
+        self.assertEqual(
+            out.getvalue().strip(),
+            f'Tables are not partitioned on {connection.vendor}, nothing to maintain'
+        )
+        user = User.objects.create_user(username='test_case_user', password='test_case_password')
+        post = Post.objects.create(title='Test title', content='Test content', user=user)
+        PostLikes.objects.create(user=user, post=post)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            PostLikes.objects.create(user=user, post=post)
+
+    @skipUnless(connection.vendor == 'postgresql', 'Likes are partitioned on PostgreSQL only')
+    def test_likes_are_partitioned(self):
+        """
+        Checks that likes are hash partitioned by post and keep uniqueness and ORM lookups
+        """
+
+        self.assertEqual(partitioning.get_partitioned_tables(connection), {'likes': ('hash', 'post_id')})
+        self.assertEqual(
+            [name for name, *_ in partitioning.get_partitions(connection, 'likes')],
+            [f'likes_p{remainder}' for remainder in range(8)]
+        )
+        user = User.objects.create_user(username='test_case_user', password='test_case_password')
+        posts = Post.objects.bulk_create(
+            Post(title=f'Test title {index}', content='Test content', user=user) for index in range(4)
+        )
+        likes = [PostLikes.objects.create(user=user, post=post) for post in posts]
+        self.assertEqual(PostLikes.objects.get(pk=likes[2].pk).post_id, posts[2].pk)
+        self.assertEqual(len({like.pk for like in likes}), 4)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            PostLikes.objects.create(user=user, post=posts[0])
+        posts[1].delete()
+        self.assertFalse(PostLikes.objects.filter(post_id=posts[1].pk).exists())
+
+        out = StringIO()
+        call_command('maintain_partitions', stdout=out)
+        self.assertIn('likes: partitioned by hash of post_id', out.getvalue())
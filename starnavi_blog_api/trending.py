@@ -0,0 +1,68 @@
+import copy
+import threading
+import time
+from django.conf import settings
+from starnavi_blog_api.models import Post
+
+
+class TrendingCache:
+    """
+    Top ``TRENDING_CACHE_SIZE`` posts by trending score of this worker.
+
+    Posts are read with a single scan of the trending index every
+    ``TRENDING_CACHE_TIMEOUT`` seconds. Likes made through this worker are
+    applied in between, so the list doesn't lag behind its own writes.
+    """
+
+    def __init__(self):
+        self.posts = []
+        self.complete = False
+        self.expires_at = 0
+        self.lock = threading.Lock()
+
+    def get_posts(self, limit):
+        if self.expires_at <= time.monotonic():
+            self.load()
+        with self.lock:
+            return [copy.copy(post) for post in self.posts[:limit]]
+
+    def load(self):
+        size = settings.TRENDING_CACHE_SIZE
+        posts = list(Post.objects.filter(trending_score__gt=0).order_by('-trending_score', '-id')[:size])
+        with self.lock:
+            self.posts = posts
+            # Fewer posts than the cache holds means every post with a score is here.
+            self.complete = len(posts) < size
+            self.expires_at = time.monotonic() + settings.TRENDING_CACHE_TIMEOUT
+
+    def update(self, post):
+        """
+        Moves ``post`` to the place of its new score
+        """
+        with self.lock:
+            self.posts = [cached for cached in self.posts if cached.id != post.id]
+            lowest = self.posts[-1] if self.posts else None
+            fits = (
+                self.complete or
+                lowest is not None and (post.trending_score, post.id) > (lowest.trending_score, lowest.id)
+            )
+            if post.trending_score > 0 and fits:
+                self.posts.append(copy.copy(post))
+                self.posts.sort(key=lambda cached: (cached.trending_score, cached.id), reverse=True)
+            size = settings.TRENDING_CACHE_SIZE
+            if len(self.posts) > size:
+                del self.posts[size:]
+                self.complete = False
+
+    def discard(self, post_id):
+        with self.lock:
+            self.posts = [cached for cached in self.posts if cached.id != post_id]
+
+    def clear(self):
+        with self.lock:
+            self.posts = []
+            self.complete = False
+            self.expires_at = 0
+
+
+trending_posts = TrendingCache()
@@ -1,7 +1,17 @@
 from django.urls import path
-from starnavi_blog_api import views
+from starnavi_blog_api import async_views, views
 
 urlpatterns = [
     path('posts/', views.PostListCreateAPIView.as_view(), name='posts'),
+    path('posts/search/', views.PostSearchAPIView.as_view(), name='posts-search'),
+    path('posts/trending/', views.PostTrendingAPIView.as_view(), name='posts-trending'),
     path('posts/like/', views.PostLikesAPIView.as_view(), name='like-unlike'),
+    path('posts/like/bulk/', views.PostLikesBulkAPIView.as_view(), name='like-unlike-bulk'),
+    path('users/<int:pk>/posts/', views.UserPostListAPIView.as_view(), name='user-posts'),
+    path('users/<int:pk>/follow/', views.FollowAPIView.as_view(), name='follow-unfollow'),
+    path('users/<int:pk>/activity/', views.UserActivityAPIView.as_view(), name='user-activity'),
+    path('timeline/', views.TimelineAPIView.as_view(), name='timeline'),
+    path('analytics/likes/', views.LikesAnalyticsAPIView.as_view(), name='likes-analytics'),
+    path('async/posts/', async_views.AsyncPostListAPIView.as_view(), name='async-posts'),
+    path('async/posts/like/', async_views.AsyncPostLikesAPIView.as_view(), name='async-like-unlike'),
 ]
@@ -1,12 +1,40 @@
-from rest_framework.generics import ListCreateAPIView
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Sum
+from django.utils.cache import get_conditional_response
+from django.contrib.auth.models import User
+from rest_framework.generics import ListAPIView, ListCreateAPIView
 from rest_framework.views import APIView, status
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
-from rest_framework.exceptions import NotFound
-from starnavi_blog_api.models import Post, PostLikes
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
+from rest_framework_simplejwt.views import TokenObtainPairView
+from starnavi_blog_api import activity, routers, search, write_behind
+from starnavi_blog_api import cache as feed_cache
+from starnavi_blog_api.models import DailyLikes, Follow, Post, PostLikes, TimelineEntry
+from starnavi_blog_api.pagination import SearchPagination, TimelinePagination
+from starnavi_blog_api.renderers import FastJSONRenderer
+from starnavi_blog_api.trending import trending_posts
 import starnavi_blog_api.serializers as post_serializers
 
 
+def toggle_like(user, post_id):
+    """
+    Likes or unlikes post for user and brings cached feed pages and trending
+    posts up to date. Returns post with ``liked`` state of the user.
+
+    Raises ``Post.DoesNotExist`` if there is no such post.
+    """
+    deferred = write_behind.is_enabled()
+    toggle = write_behind.toggle if deferred else PostLikes.objects.toggle
+    post = toggle(user, post_id)
+    feed_cache.set_likes_count({post.id: (post.likes_count, post.updated)})
+    if not deferred:
+        trending_posts.update(post)
+    return post
+
+
 class UserCreateAPIView(APIView):
 
     def post(self, request, format=None):
@@ -18,38 +46,270 @@ class UserCreateAPIView(APIView):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class PostListCreateAPIView(ListCreateAPIView):
+class SignInAPIView(TokenObtainPairView):
+    serializer_class = post_serializers.SignInSerializer
+
+
+class UserActivityAPIView(APIView):
+    permission_classes = [IsAuthenticated, ]
+
+    def get(self, request, pk, format=None):
+        if request.user.pk != pk and not request.user.is_staff:
+            raise PermissionDenied('You can only see your own activity')
+        last_login, last_request = activity.get_activity(pk)
+        serializer = post_serializers.UserActivitySerializer({
+            'user': pk,
+            'last_login': last_login,
+            'last_request': last_request,
+        })
+        return Response(serializer.data)
+
+
+class PostValuesListMixin:
+    """
+    Lists posts from ``.values()`` rows through ``PostValuesSerializer``
+    instead of model instances through the model serializer
+    """
+
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset()).values(
+            *post_serializers.PostValuesSerializer.values_fields
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(post_serializers.PostValuesSerializer(page).data)
+        return Response(post_serializers.PostValuesSerializer(queryset).data)
+
+
+class PostListCreateAPIView(PostValuesListMixin, ListCreateAPIView):
 
     queryset = Post.objects.all()
     serializer_class = post_serializers.PostModelSerializer
     permission_classes = [IsAuthenticated, ]
 
+    def list(self, request, *args, **kwargs):
+        url = request.build_absolute_uri()
+        stamp = feed_cache.get_feed_stamp()
+        headers = feed_cache.feed_headers(stamp, url)
+        if routers.is_pinned():
+            # Cached pages and validators may predate the user's own write on a lagging replica.
+            return Response(super().list(request, *args, **kwargs).data, headers=headers)
+        if get_conditional_response(
+            request,
+            etag=headers['ETag'],
+            last_modified=feed_cache.feed_last_modified(stamp)
+        ):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        page = feed_cache.get_feed_page(
+            url,
+            lambda: super(PostListCreateAPIView, self).list(request, *args, **kwargs).data
+        )
+        return Response(page, headers=headers)
+
+    def create(self, request, *args, **kwargs):
+        if not isinstance(request.data, list):
+            return super().create(request, *args, **kwargs)
+        serializer = self.get_serializer(
+            data=request.data,
+            many=True,
+            allow_empty=False,
+            max_length=settings.POSTS_BULK_CREATE_MAX_ITEMS
+        )
+        serializer.is_valid(raise_exception=True)
+        self.perform_bulk_create(serializer)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
+        TimelineEntry.objects.fan_out([serializer.instance])
+
+    def perform_bulk_create(self, serializer):
+        posts = [
+            Post(user=self.request.user, **data)
+            for data in serializer.validated_data
+        ]
+        serializer.instance = Post.objects.bulk_create(
+            posts,
+            batch_size=settings.POSTS_BULK_CREATE_BATCH_SIZE
+        )
+        TimelineEntry.objects.fan_out(serializer.instance)
+        search.index_posts(serializer.instance)
+        feed_cache.invalidate_feed()
+
+
+class PostSearchAPIView(ListAPIView):
+    serializer_class = post_serializers.PostModelSerializer
+    permission_classes = [IsAuthenticated, ]
+    pagination_class = SearchPagination
+
+    def get_queryset(self):
+        serializer = post_serializers.PostSearchQuerySerializer(data=self.request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return search.search_posts(serializer.validated_data['q'])
+
+
+class PostTrendingAPIView(APIView):
+    permission_classes = [IsAuthenticated, ]
+
+    def get(self, request, format=None):
+        serializer = post_serializers.TrendingQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        posts = trending_posts.get_posts(serializer.validated_data['limit'])
+        return Response({'results': post_serializers.PostModelSerializer(posts, many=True).data})
+
+
+class UserPostListAPIView(PostValuesListMixin, ListAPIView):
+    serializer_class = post_serializers.PostModelSerializer
+    permission_classes = [IsAuthenticated, ]
+
+    def get_queryset(self):
+        return Post.objects.filter(user_id=self.kwargs['pk'])
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        # Only an empty page costs the extra lookup telling "no posts" from "no user".
+        if not response.data['results'] and not User.objects.filter(pk=self.kwargs['pk']).exists():
+            raise NotFound('User does not exist')
+        return response
+
+
+class FollowAPIView(APIView):
+    permission_classes = [IsAuthenticated, ]
+
+    def post(self, request, pk, format=None):
+        if request.user.pk == pk:
+            raise ValidationError({'user': 'You can not follow yourself'})
+        try:
+            following = Follow.objects.toggle(request.user, pk)
+        except User.DoesNotExist:
+            raise NotFound('User does not exist')
+        return Response({'user': pk, 'following': following}, status=status.HTTP_201_CREATED)
+
+
+class TimelineAPIView(ListAPIView):
+    serializer_class = post_serializers.PostModelSerializer
+    permission_classes = [IsAuthenticated, ]
+    pagination_class = TimelinePagination
+
+    def get_queryset(self):
+        return TimelineEntry.objects.filter(user=self.request.user)
+
+    def get_pull_queryset(self):
+        author_ids = list(
+            Follow.objects.filter(follower=self.request.user, pull=True).values_list('followee_id', flat=True)
+        )
+        return Post.objects.filter(user_id__in=author_ids)
 
 
 class PostLikesAPIView(APIView):
     permission_classes = [IsAuthenticated, ]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
 
     def post(self, request, format=None):
+        toggle_serializer = post_serializers.PostLikeToggleSerializer(data=request.data)
+        if not toggle_serializer.is_valid():
+            return Response(data={'error': 'Bad request.'}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            post = Post.objects.get(pk=request.data['post'])
+            post = toggle_like(self.request.user, toggle_serializer.validated_data['post'])
         except Post.DoesNotExist:
             raise NotFound('Post does not exist')
-        except ValueError:
-            return Response(data={'error': 'Bad request.'}, status=status.HTTP_400_BAD_REQUEST)
-        post_serializer = post_serializers.PostModelSerializer(post)
-        try:
-            postlike = PostLikes.objects.get(
-                post=request.data['post'],
-                user=self.request.user
-            )
-
-            postlike.delete()
-            return Response(post_serializer.data, status=status.HTTP_201_CREATED)
-        except PostLikes.DoesNotExist:
-            serializer = post_serializers.PostLikesModelSerializer(data=request.data)
-            if serializer.is_valid():
-                serializer.save(user=self.request.user)
-                return Response(post_serializer.data, status=status.HTTP_201_CREATED)
+        data = post_serializers.PostModelSerializer(post).data
+        data['liked'] = post.liked
+        return Response(data, status=status.HTTP_201_CREATED)
+
+
+class PostLikesBulkAPIView(APIView):
+    permission_classes = [IsAuthenticated, ]
+
+    def post(self, request, format=None):
+        serializer = post_serializers.PostLikesBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        operations = serializer.validated_data['operations']
+
+        # Replay operations in order, only the final state of each post is written.
+        states = {}
+        for operation in operations:
+            states[operation['post']] = operation['action'] == 'like'
+        deferred = write_behind.is_enabled()
+        if deferred:
+            posts = write_behind.apply_states(request.user.pk, states)
+        else:
+            posts = PostLikes.objects.apply_states({
+                (request.user.pk, post_id): liked for post_id, liked in states.items()
+            })
+
+        # Reread, so cached counts come with the version of the row they were read from.
+        changed_posts = list(Post.objects.filter(pk__in=[post_id for post_id, (_, delta) in posts.items() if delta]))
+        feed_cache.set_likes_count({
+            post.id: (posts[post.id][0] if deferred else post.likes_count, post.updated)
+            for post in changed_posts
+        })
+        if not deferred:
+            for post in changed_posts:
+                trending_posts.update(post)
+
+        # A post changed by the request started out in the opposite of its final state.
+        liked_posts = {
+            post_id for post_id, (_, delta) in posts.items()
+            if states[post_id] != bool(delta)
+        }
+
+        results = []
+        for operation in operations:
+            post_id = operation['post']
+            result = {'post': post_id, 'action': operation['action']}
+            if post_id in posts:
+                liked = operation['action'] == 'like'
+                result['changed'] = liked != (post_id in liked_posts)
+                result['liked'] = liked
+                if liked:
+                    liked_posts.add(post_id)
+                else:
+                    liked_posts.discard(post_id)
+            else:
+                result['error'] = 'Post does not exist'
+            results.append(result)
+
+        return Response(
+            data={
+                'results': results,
+                'posts': [
+                    {'id': post_id, 'likes': likes_count}
+                    for post_id, (likes_count, _) in sorted(posts.items())
+                ]
+            },
+            status=status.HTTP_200_OK
+        )
+
+
+class LikesAnalyticsAPIView(APIView):
+    permission_classes = [IsAuthenticated, ]
+
+    def get(self, request, format=None):
+        serializer = post_serializers.LikesAnalyticsQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        date_from = serializer.validated_data['date_from']
+        date_to = serializer.validated_data['date_to']
+
+        rollups = {
+            day['date']: day for day in
+            DailyLikes.objects.filter(date__range=(date_from, date_to))
+            .values('date')
+            .annotate(likes=Sum('likes'), unlikes=Sum('unlikes'))
+            .order_by()
+        }
+        days = []
+        for offset in range((date_to - date_from).days + 1):
+            date = date_from + timedelta(days=offset)
+            day = rollups.get(date, {'likes': 0, 'unlikes': 0})
+            days.append({'date': date, 'likes': day['likes'], 'unlikes': day['unlikes']})
 
+        return Response(data={
+            'date_from': date_from,
+            'date_to': date_to,
+            'likes': sum(day['likes'] for day in days),
+            'unlikes': sum(day['unlikes'] for day in days),
+            'days': days,
+        })
@@ -0,0 +1,193 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from starnavi_blog_api import cache as feed_cache
+from starnavi_blog_api.models import LikeIntent, Post, PostLikes
+
+DEFAULTS = {
+    'ENABLED': False,
+    'CACHE_ALIAS': 'default',
+    'BATCH_SIZE': 5000,
+    'INTERVAL': 1,
+    'PENDING_TIMEOUT': 10 * 60,
+}
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, 'LIKES_WRITE_BEHIND', {})}
+
+
+def is_enabled():
+    return get_options()['ENABLED']
+
+
+def get_cache():
+    return caches[get_options()['CACHE_ALIAS']]
+
+
+def pending_key(post_id):
+    return f'likes:pending:{post_id}'
+
+
+def get_pending_deltas(post_ids):
+    """
+    Returns ``{post_id: delta}`` of likes accepted but not applied yet
+    """
+    keys = {pending_key(post_id): post_id for post_id in post_ids}
+    return {keys[key]: delta for key, delta in get_cache().get_many(list(keys)).items()}
+
+
+def add_pending_deltas(deltas):
+    cache = get_cache()
+    timeout = get_options()['PENDING_TIMEOUT']
+    for post_id, delta in deltas.items():
+        key = pending_key(post_id)
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            if not cache.add(key, delta, timeout):
+                cache.incr(key, delta)
+
+
+def set_pending_deltas(deltas):
+    cache = get_cache()
+    cache.set_many(
+        {pending_key(post_id): delta for post_id, delta in deltas.items() if delta},
+        get_options()['PENDING_TIMEOUT']
+    )
+    cache.delete_many([pending_key(post_id) for post_id, delta in deltas.items() if not delta])
+
+
+def get_current_states(user_id, post_ids):
+    """
+    Returns ``{post_id: liked}`` of user counting pending intents
+    """
+    # Intents first, so an intent flushed in between shows up in likes read next.
+    pending = LikeIntent.objects.get_pending_states(user_id, post_ids)
+    liked = set(PostLikes.objects.filter(user_id=user_id, post_id__in=post_ids).values_list('post_id', flat=True))
+    return {post_id: pending.get(post_id, post_id in liked) for post_id in post_ids}
+
+
+def lock_likes(user_id, post_ids):
+    """
+    Locks likes of user on posts until the end of current transaction, so
+    that concurrent requests of the user read and change them one at a time
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT pg_advisory_xact_lock(%s, post_id) FROM unnest(%s::integer[]) AS post_id',
+                [user_id, sorted(post_ids)]
+            )
+    else:
+        list(Post.objects.select_for_update().filter(pk__in=post_ids).order_by('pk').values_list('pk', flat=True))
+
+
+def apply_states(user_id, states):
+    """
+    Records intents bringing likes of user to ``{post_id: liked}`` without
+    touching likes or posts.
+
+    Returns ``{post_id: (projected_likes_count, delta)}`` for every
+    requested post that exists, like ``PostLikesManager.apply_states``.
+    """
+    with transaction.atomic():
+        lock_likes(user_id, states)
+        return _apply_states(user_id, states, get_current_states(user_id, list(states)))
+
+
+def _apply_states(user_id, states, current):
+    likes_counts = dict(Post.objects.filter(pk__in=list(states)).values_list('pk', 'likes_count'))
+    deltas = {
+        post_id: 1 if liked else -1
+        for post_id, liked in states.items()
+        if post_id in likes_counts and liked != current[post_id]
+    }
+    LikeIntent.objects.bulk_create([
+        LikeIntent(user_id=user_id, post_id=post_id, liked=delta > 0, delta=delta)
+        for post_id, delta in deltas.items()
+    ])
+    add_pending_deltas(deltas)
+    pending = get_pending_deltas(likes_counts)
+    return {
+        post_id: (max(0, likes_count + pending.get(post_id, 0)), deltas.get(post_id, 0))
+        for post_id, likes_count in likes_counts.items()
+    }
+
+
+def toggle(user, post_id):
+    """
+    Write-behind counterpart of ``PostLikesManager.toggle``. Returned post
+    carries projected likes count.
+
+    Raises ``Post.DoesNotExist`` if there is no such post.
+    """
+    with transaction.atomic():
+        post = Post.objects.get(pk=post_id)
+        lock_likes(user.pk, [post.pk])
+        current = get_current_states(user.pk, [post.pk])
+        post.liked = not current[post.pk]
+        post.likes_count, _ = _apply_states(user.pk, {post.pk: post.liked}, current)[post.pk]
+    return post
+
+
+def flush(batch_size=None):
+    """
+    Applies a batch of pending intents and returns how many were applied
+    """
+    flushed, posts, deltas = LikeIntent.objects.flush(batch_size or get_options()['BATCH_SIZE'])
+    if not flushed:
+        return 0
+    # Recounted rather than decremented, so a lost cache update heals on the next flush of the post.
+    pending = dict(
+        LikeIntent.objects.filter(post_id__in=list(deltas)).order_by()
+        .values('post_id').annotate(delta=Sum('delta')).values_list('post_id', 'delta')
+    )
+    set_pending_deltas({post_id: pending.get(post_id, 0) for post_id in deltas})
+    feed_cache.set_likes_count({
+        post_id: (max(0, likes_count + pending.get(post_id, 0)), updated)
+        for post_id, likes_count, updated in Post.objects.filter(pk__in=list(posts)).values_list(
+            'pk', 'likes_count', 'updated'
+        )
+    })
+    return flushed
+
+
+def reconcile(fix=False):
+    """
+    Compares likes counts with likes table and projected deltas with
+    pending intents. Returns ``[(post_id, problem)]`` and repairs them when
+    ``fix`` is set.
+    """
+    problems = []
+    likes = PostLikes.objects.filter(post=OuterRef('pk')).order_by().values('post')
+    actual_count = Coalesce(Subquery(likes.annotate(total=Count('pk')).values('total')), 0)
+    mismatched = Post.objects.annotate(actual=actual_count).exclude(likes_count=F('actual'))
+    counts = dict(mismatched.values_list('pk', 'actual'))
+    for post_id, actual in counts.items():
+        problems.append((post_id, f'likes count differs from {actual} likes'))
+
+    expected = dict(
+        LikeIntent.objects.order_by().values('post_id').annotate(delta=Sum('delta')).values_list('post_id', 'delta')
+    )
+    cached = get_pending_deltas(expected)
+    drifted = {
+        post_id: delta for post_id, delta in expected.items()
+        if cached.get(post_id, 0) != delta
+    }
+    for post_id, delta in drifted.items():
+        problems.append((post_id, f'projected delta {cached.get(post_id, 0)} instead of {delta}'))
+
+    if fix:
+        for post_id, actual in counts.items():
+            Post.objects.filter(pk=post_id).update(likes_count=actual)
+        set_pending_deltas(drifted)
+        feed_cache.set_likes_count({
+            post_id: (likes_count + expected.get(post_id, 0), updated)
+            for post_id, likes_count, updated in Post.objects.filter(pk__in=[*counts, *drifted]).values_list(
+                'pk', 'likes_count', 'updated'
+            )
+        })
+    return sorted(problems)